@@ -0,0 +1,285 @@
+"""
+Асинхронные варианты эндпоинтов каталога и корзины для запуска
+под ASGI (config/asgi.py). Подключаются вместо представлений DRF
+настройкой ASYNC_VIEWS.
+DRF не поддерживает асинхронные view, поэтому здесь это функции
+Django: чтение идет через async ORM, аутентификация по JWT
+не обращается к БД, токен DRF загружается через async ORM.
+Изменения корзины выполняются функциями api.cart в потоке,
+так как async ORM не поддерживает транзакции. Ответы совпадают
+с ответами DRF в формате JSON.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django_filters.utils import translate_validation
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from store.models import Cart, Product
+
+from .authentication import (
+    aauthenticate,
+    authenticate_header,
+    user_deleted,
+)
+from .cache import (
+    aget_category_tree,
+    cache_cart_id,
+    forget_cart_id,
+    get_cart_id,
+)
+from .cart import (
+    add_to_cart,
+    apply_cart_batch,
+    clear_cart,
+    remove_from_cart,
+    set_cart_quantity,
+)
+from .conditional import (
+    cart_condition,
+    catalog_condition,
+    prefetch_cart,
+    request_cart,
+)
+from .fast_serializers import PRODUCT_FIELDS, acart_data, product_list
+from .filters import ProductFilter, aget_product_facets
+from .pagination import CatalogPagination
+from .renderers import FastJSONRenderer
+from .response_cache import cache_anonymous_response
+from .serializers import CartBatchActionSerializer, CartItemActionSerializer
+from .views import CartViewSet, absolute_image_urls
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    """Ответ JSON, как у FastJSONRenderer."""
+    if data is None:
+        return HttpResponse(status=status)
+    return HttpResponse(
+        FastJSONRenderer().render(data), status=status,
+        content_type='application/json'
+    )
+
+
+def exception_response(request, exc):
+    """Ответ на исключение DRF в формате exception_handler DRF."""
+    if isinstance(
+        exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)
+    ):
+        exc.auth_header = authenticate_header(request)
+        if exc.auth_header is None:
+            exc.status_code = status.HTTP_403_FORBIDDEN
+    detail = exc.detail
+    if not isinstance(detail, (list, dict)):
+        detail = {'detail': detail}
+    response = json_response(detail, status=exc.status_code)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    return response
+
+
+def async_api_view(*methods, authenticated=False):
+    """
+    Декоратор асинхронного view: допускает методы methods, при
+    authenticated=True требует аутентификацию и отдает исключения
+    DRF ответами JSON. Тело запроса разбирается парсерами DRF
+    (request.drf.data). Как и APIView, view освобождается от проверки
+    CSRF: аутентификация идет по заголовку, а не по cookie.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            try:
+                if request.method not in methods:
+                    raise exceptions.MethodNotAllowed(request.method)
+                if authenticated:
+                    result = await aauthenticate(request)
+                    if result is None:
+                        raise exceptions.NotAuthenticated()
+                    request.user, request.auth = result
+                request.drf = Request(request, parsers=[
+                    parser() for parser in api_settings.DEFAULT_PARSER_CLASSES
+                ])
+                return await view(request, *args, **kwargs)
+            except exceptions.APIException as exc:
+                return exception_response(request, exc)
+
+        return csrf_exempt(wrapper)
+
+    return decorator
+
+
+@async_api_view('GET')
+@cache_anonymous_response
+@catalog_condition
+async def category_list(request):
+    """Асинхронный CategoryListView."""
+    paginator = CatalogPagination()
+    page = await paginator.apaginate_queryset(
+        await aget_category_tree(), request.drf)
+    return json_response(paginator.get_paginated_response(
+        absolute_image_urls(request, page)).data)
+
+
+@async_api_view('GET')
+@cache_anonymous_response
+@catalog_condition
+async def product_list_view(request):
+    """Асинхронный ProductListView: страница продуктов с фасетами."""
+    filterset = ProductFilter(
+        request.GET, queryset=Product.objects.order_by('name'),
+        request=request.drf
+    )
+    if not filterset.is_valid():
+        raise translate_validation(filterset.errors)
+    rows = filterset.qs.values(*PRODUCT_FIELDS)
+    paginator = CatalogPagination()
+    facets = None
+    if paginator.is_first_page(request.drf):
+        facets = await aget_product_facets(rows)
+    page = await paginator.apaginate_queryset(rows, request.drf)
+    data = paginator.get_paginated_response(product_list(page)).data
+    data['facets'] = facets
+    return json_response(data)
+
+
+async def aget_cart(request, create=True):
+    """Асинхронный CartViewSet.get_cart()."""
+    user_id = request.user.pk
+    cart_id = get_cart_id(user_id)
+    if cart_id is not None:
+        return Cart(pk=cart_id, user_id=user_id)
+    if create:
+        try:
+            cart, _ = await Cart.objects.aget_or_create(user_id=user_id)
+        except IntegrityError:
+            raise user_deleted()
+    else:
+        cart = await Cart.objects.filter(user_id=user_id).afirst()
+        if cart is None:
+            return None
+    # Вне транзакции корзина уже сохранена, ждать коммита не нужно
+    cache_cart_id(user_id, cart.pk)
+    return cart
+
+
+async def achange_cart(request, change, *args):
+    """Асинхронный CartViewSet.change_cart()."""
+    cart = await aget_cart(request)
+    try:
+        await sync_to_async(change)(cart, *args)
+    except IntegrityError:
+        forget_cart_id(request.user.pk)
+        cart = await aget_cart(request)
+        await sync_to_async(change)(cart, *args)
+    return cart
+
+
+def validated_item_action(request):
+    serializer = CartItemActionSerializer(data=request.drf.data)
+    serializer.is_valid(raise_exception=True)
+    return (
+        serializer.validated_data['product_id'],
+        serializer.validated_data['quantity'],
+    )
+
+
+def item_not_found():
+    return json_response(
+        {'detail': 'Элемент корзины не найден'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+
+@async_api_view('GET', authenticated=True)
+@prefetch_cart
+@cart_condition
+async def cart_list(request):
+    """Асинхронный CartViewSet.list."""
+    return json_response(await acart_data(request_cart(request)))
+
+
+@async_api_view('POST', authenticated=True)
+async def cart_add_item(request):
+    """Асинхронный CartViewSet.add_item."""
+    product_id, quantity = validated_item_action(request)
+    price = await Product.objects.filter(pk=product_id).values_list(
+        'price', flat=True).afirst()
+    if price is None:
+        return json_response(
+            {'detail': 'Продукт не найден'},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    await achange_cart(request, add_to_cart, product_id, quantity, price)
+    return json_response(
+        {'detail': 'Продукт добавлен в корзину'},
+        status=status.HTTP_201_CREATED
+    )
+
+
+@async_api_view('PUT', authenticated=True)
+async def cart_update_item(request):
+    """Асинхронный CartViewSet.update_item."""
+    product_id, quantity = validated_item_action(request)
+    cart = await aget_cart(request, create=False)
+    if cart is None or not await sync_to_async(set_cart_quantity)(
+        cart, product_id, quantity
+    ):
+        return item_not_found()
+    return json_response({'detail': 'Количество обновлено'})
+
+
+@async_api_view('DELETE', authenticated=True)
+async def cart_remove_item(request):
+    """Асинхронный CartViewSet.remove_item."""
+    product_id = request.drf.data.get('product_id')
+    if not product_id:
+        return json_response(
+            {'detail': 'product_id обязателен'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    cart = await aget_cart(request, create=False)
+    if cart is None or not await sync_to_async(remove_from_cart)(
+        cart, product_id
+    ):
+        return item_not_found()
+    return json_response(None, status=status.HTTP_204_NO_CONTENT)
+
+
+@async_api_view('POST', authenticated=True)
+async def cart_batch(request):
+    """Асинхронный CartViewSet.batch."""
+    serializer = CartBatchActionSerializer(
+        data=request.drf.data, many=True, allow_empty=False,
+        max_length=CartViewSet.batch_max_operations
+    )
+    serializer.is_valid(raise_exception=True)
+    operations = serializer.validated_data
+    product_ids = {operation['product_id'] for operation in operations}
+    missing = product_ids - {
+        pk async for pk in Product.objects.filter(
+            pk__in=product_ids).values_list('pk', flat=True)
+    }
+    if missing:
+        return json_response(
+            {'detail': 'Продукт не найден', 'product_ids': sorted(missing)},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    cart = await achange_cart(request, apply_cart_batch, operations)
+    return json_response(
+        await acart_data(await Cart.objects.aget(pk=cart.pk)))
+
+
+@async_api_view('DELETE', authenticated=True)
+async def cart_clear(request):
+    """Асинхронный CartViewSet.clear_cart."""
+    cart = await aget_cart(request, create=False)
+    if cart is not None:
+        await sync_to_async(clear_cart)(cart)
+    return json_response(None, status=status.HTTP_204_NO_CONTENT)
+
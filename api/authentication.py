@@ -0,0 +1,97 @@
+from asgiref.sync import sync_to_async
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.settings import api_settings
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTStatelessUserAuthentication,
+)
+
+
+def stateless_authenticators():
+    """
+    Аутентификаторы для эндпоинтов, которым нужен только id пользователя.
+    JWTAuthentication заменяется на JWTStatelessUserAuthentication:
+    access-токен проверяется по подписи, пользователь не загружается
+    из БД. Поэтому деактивация пользователя действует на его
+    access-токены только после их истечения (ACCESS_TOKEN_LIFETIME).
+    Остальные классы из настроек сохраняются.
+    """
+    return [
+        JWTStatelessUserAuthentication()
+        if issubclass(auth_class, JWTAuthentication) else auth_class()
+        for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    ]
+
+
+def user_deleted():
+    """
+    Ошибка для пользователя из access-токена, которого уже нет в БД.
+    Такой пользователь обнаруживается по ошибке внешнего ключа при
+    создании его корзины.
+    """
+    return exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+
+
+async def atoken_authenticate(authenticator, request):
+    """
+    TokenAuthentication.authenticate() для асинхронных view:
+    токен с пользователем загружается одним запросом async ORM.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != authenticator.keyword.lower().encode():
+        return None
+    if len(auth) == 1:
+        raise exceptions.AuthenticationFailed(
+            _('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise exceptions.AuthenticationFailed(_(
+            'Invalid token header. '
+            'Token string should not contain spaces.'
+        ))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(_(
+            'Invalid token header. '
+            'Token string should not contain invalid characters.'
+        ))
+    model = authenticator.get_model()
+    try:
+        token = await model.objects.select_related('user').aget(key=key)
+    except model.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    return token.user, token
+
+
+async def aauthenticate(request):
+    """
+    Аутентифицирует запрос асинхронного view классами
+    stateless_authenticators(). JWT проверяется по подписи без БД,
+    токен DRF - через async ORM, прочие классы - в потоке.
+    Возвращает (пользователь, токен) или None.
+    """
+    for authenticator in stateless_authenticators():
+        if isinstance(authenticator, TokenAuthentication):
+            result = await atoken_authenticate(authenticator, request)
+        elif isinstance(authenticator, JWTStatelessUserAuthentication):
+            result = authenticator.authenticate(request)
+        else:
+            result = await sync_to_async(authenticator.authenticate)(request)
+        if result is not None:
+            return result
+    return None
+
+
+def authenticate_header(request):
+    """Заголовок WWW-Authenticate ответа 401, как у APIView."""
+    authenticators = stateless_authenticators()
+    if authenticators:
+        return authenticators[0].authenticate_header(request)
+    return None
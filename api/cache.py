@@ -0,0 +1,173 @@
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+
+from .fast_serializers import acategory_tree, category_tree
+from .metrics import record_cache_lookup
+
+CATEGORY_TREE_VERSION_KEY = 'category_tree:version'
+CATEGORY_TREE_KEY = 'category_tree:v{version}'
+CATEGORY_TREE_HITS_KEY = 'category_tree:hits'
+CATEGORY_TREE_MISSES_KEY = 'category_tree:misses'
+CATALOG_VERSION_KEY = 'catalog:version'
+CART_ID_KEY = 'cart_id:{user_id}'
+
+
+def incr_counter(key):
+    """Атомарно увеличивает счетчик в кэше, создавая его при отсутствии."""
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def version_cache():
+    """
+    Кэш версий (CATALOG_VERSION_CACHE_ALIAS), общий для всех процессов.
+    Сами данные лежат в кэше процесса под ключами с версией, поэтому
+    изменение версии в любом процессе сбрасывает их во всех.
+    """
+    return caches[settings.CATALOG_VERSION_CACHE_ALIAS]
+
+
+def get_category_tree_version():
+    """
+    Возвращает текущую версию дерева категорий.
+    Если ключ версии вытеснен из кэша, начинается новая версия,
+    чтобы не отдать устаревшее дерево.
+    """
+    versions = version_cache()
+    version = versions.get(CATEGORY_TREE_VERSION_KEY)
+    if version is None:
+        versions.add(CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+        version = versions.get(CATEGORY_TREE_VERSION_KEY)
+    return version
+
+
+def _bump_category_tree_version():
+    version_cache().set(
+        CATEGORY_TREE_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_category_tree():
+    """
+    Сбрасывает дерево категорий.
+    Версия повышается сразу и повторно после коммита транзакции,
+    чтобы параллельный запрос не закэшировал данные до коммита.
+    """
+    _bump_category_tree_version()
+    transaction.on_commit(_bump_category_tree_version)
+
+
+def build_category_tree():
+    """
+    Строит дерево категорий с подкатегориями двумя запросами.
+    Ссылки на изображения относительные: абсолютными их делает view.
+    Дерево отсортировано по (name, id) для курсорной пагинации.
+    """
+    return category_tree()
+
+
+def _cached_category_tree(key):
+    tree = cache.get(key)
+    if tree is not None:
+        incr_counter(CATEGORY_TREE_HITS_KEY)
+        record_cache_lookup('category_tree', hit=True)
+        return tree
+    incr_counter(CATEGORY_TREE_MISSES_KEY)
+    record_cache_lookup('category_tree', hit=False)
+    return None
+
+
+def get_category_tree():
+    """
+    Возвращает дерево категорий из кэша.
+    При промахе дерево строится заново и сохраняется без срока жизни:
+    устаревает оно только по сигналам изменения каталога.
+    """
+    key = CATEGORY_TREE_KEY.format(version=get_category_tree_version())
+    tree = _cached_category_tree(key)
+    if tree is None:
+        tree = build_category_tree()
+        cache.set(key, tree, timeout=None)
+    return tree
+
+
+async def aget_category_tree():
+    """Асинхронный вариант get_category_tree()."""
+    key = CATEGORY_TREE_KEY.format(version=get_category_tree_version())
+    tree = _cached_category_tree(key)
+    if tree is None:
+        tree = await acategory_tree()
+        cache.set(key, tree, timeout=None)
+    return tree
+
+
+def category_tree_stats():
+    """Возвращает счетчики попаданий и промахов кэша дерева категорий."""
+    return {
+        'hits': cache.get(CATEGORY_TREE_HITS_KEY, 0),
+        'misses': cache.get(CATEGORY_TREE_MISSES_KEY, 0),
+    }
+
+
+def get_catalog_version():
+    """
+    Возвращает версию каталога - время его последнего изменения в нс.
+    Если ключ вытеснен из кэша, версией становится текущее время.
+    """
+    versions = version_cache()
+    version = versions.get(CATALOG_VERSION_KEY)
+    if version is None:
+        versions.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = versions.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def _bump_catalog_version():
+    version_cache().set(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_catalog():
+    """
+    Отмечает изменение каталога: меняет ETag ответов каталога и ключи
+    кэшированных количеств. Как и для дерева категорий, версия
+    меняется сразу и повторно после коммита.
+    """
+    _bump_catalog_version()
+    transaction.on_commit(_bump_catalog_version)
+
+
+def get_cart_id(user_id):
+    """Возвращает id корзины пользователя из кэша или None."""
+    return cache.get(CART_ID_KEY.format(user_id=user_id))
+
+
+def cache_cart_id(user_id, cart_id):
+    """
+    Запоминает id корзины сразу на CART_ID_CACHE_TIMEOUT секунд.
+    Подходит для корзины, созданной вне транзакции, например
+    асинхронным ORM. Срок ограничен: удаление корзины в другом
+    процессе не сбрасывает кэш этого процесса.
+    """
+    cache.set(
+        CART_ID_KEY.format(user_id=user_id), cart_id,
+        settings.CART_ID_CACHE_TIMEOUT
+    )
+
+
+def remember_cart_id(user_id, cart_id):
+    """
+    Запоминает id корзины пользователя.
+    Запись делается после коммита, чтобы не запомнить корзину
+    из откаченной транзакции.
+    """
+    transaction.on_commit(lambda: cache_cart_id(user_id, cart_id))
+
+
+def forget_cart_id(user_id):
+    """Удаляет id корзины пользователя из кэша."""
+    cache.delete(CART_ID_KEY.format(user_id=user_id))
@@ -0,0 +1,106 @@
+"""
+Изменения корзины, общие для синхронного CartViewSet и асинхронных
+view. Каждая функция выполняется в одной транзакции: асинхронные
+view вызывают их через sync_to_async, так как async ORM
+транзакции не поддерживает.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from store.models import Cart, CartItem
+
+from .serializers import CartBatchActionSerializer
+
+
+def add_to_cart(cart, product_id, quantity, price):
+    """Добавляет количество продукта и меняет итоги корзины."""
+    # Транзакция начинается с записи: SQLite сразу берет блокировку
+    with transaction.atomic():
+        CartItem.objects.add_quantity(cart.pk, product_id, quantity)
+        cart.change_totals(quantity, price * quantity)
+
+
+def set_cart_quantity(cart, product_id, quantity):
+    """
+    Задает количество продукта в корзине.
+    Возвращает False, если продукта в корзине нет.
+    """
+    with transaction.atomic():
+        if not cart.items.filter(
+            product_id=product_id
+        ).update(quantity=quantity):
+            return False
+        # Пересчет по элементам не зависит от параллельных запросов
+        Cart.objects.filter(pk=cart.pk).rebuild_totals()
+    return True
+
+
+def remove_from_cart(cart, product_id):
+    """
+    Удаляет продукт из корзины.
+    Возвращает False, если продукта в корзине нет.
+    """
+    with transaction.atomic():
+        if not cart.items.filter(product_id=product_id).delete()[0]:
+            return False
+        Cart.objects.filter(pk=cart.pk).rebuild_totals()
+    return True
+
+
+def clear_cart(cart):
+    """Удаляет все элементы корзины и обнуляет итоги."""
+    with transaction.atomic():
+        cart.items.all().delete()
+        cart.reset_totals()
+
+
+def apply_cart_batch(cart, operations):
+    """
+    Применяет проверенные CartBatchActionSerializer операции
+    к корзине в одной транзакции.
+    """
+    product_ids = {operation['product_id'] for operation in operations}
+    with transaction.atomic():
+        # Первая запись блокирует корзину от параллельных изменений
+        Cart.objects.filter(pk=cart.pk).update(updated_at=timezone.now())
+        existing = {
+            item.product_id: item
+            for item in cart.items.filter(product_id__in=product_ids)
+        }
+        quantities = {
+            product_id: item.quantity
+            for product_id, item in existing.items()
+        }
+        for operation in operations:
+            product_id = operation['product_id']
+            if operation['action'] == CartBatchActionSerializer.REMOVE:
+                quantities[product_id] = None
+            elif operation['action'] == CartBatchActionSerializer.SET:
+                quantities[product_id] = operation['quantity']
+            else:
+                quantities[product_id] = (
+                    (quantities.get(product_id) or 0)
+                    + operation['quantity']
+                )
+
+        to_create, to_update, to_delete = [], [], []
+        for product_id, quantity in quantities.items():
+            item = existing.get(product_id)
+            if item is None:
+                if quantity is not None:
+                    to_create.append(CartItem(
+                        cart=cart, product_id=product_id,
+                        quantity=quantity
+                    ))
+            elif quantity is None:
+                to_delete.append(item.pk)
+            elif quantity != item.quantity:
+                item.quantity = quantity
+                to_update.append(item)
+        if to_create:
+            CartItem.objects.bulk_create(to_create)
+        if to_update:
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+        if to_delete:
+            CartItem.objects.filter(pk__in=to_delete).delete()
+        Cart.objects.filter(pk=cart.pk).rebuild_totals()
@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_MEMORY_CACHE = 'django.core.cache.backends.locmem.LocMemCache'
+
+
+@register()
+def version_cache_check(app_configs, **kwargs):
+    """
+    Предупреждает, если версии каталога хранятся в памяти процесса:
+    изменения каталога из других процессов (воркеры сервера, команды
+    manage.py) тогда не сбрасывают кэш и ETag и не закрепляют чтение
+    каталога за основной БД.
+    """
+    alias = settings.CATALOG_VERSION_CACHE_ALIAS
+    if settings.CACHES.get(alias, {}).get('BACKEND') != LOCAL_MEMORY_CACHE:
+        return []
+    return [Warning(
+        f'Кэш {alias} хранится в памяти процесса.',
+        hint=(
+            'Укажите общий кэш в VERSION_CACHE_BACKEND: файловый '
+            'на одном сервере, Redis или Memcached на нескольких.'
+        ),
+        id='api.W001',
+    )]
@@ -0,0 +1,90 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.views.decorators.http import condition
+
+from store.models import Cart
+
+from .cache import get_catalog_version
+
+
+def _etag(*parts):
+    """
+    Строгий ETag по версии данных и параметрам представления:
+    полному адресу запроса (с хостом для абсолютных ссылок) и Accept.
+    """
+    return hashlib.md5(
+        '|'.join(str(part) for part in parts).encode()
+    ).hexdigest()
+
+
+def _representation(request):
+    return request.build_absolute_uri(), request.META.get('HTTP_ACCEPT', '')
+
+
+def catalog_etag(request, *args, **kwargs):
+    return _etag('catalog', get_catalog_version(), *_representation(request))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return datetime.fromtimestamp(
+        get_catalog_version() / 1e9, tz=timezone.utc)
+
+
+def request_cart(request):
+    """
+    Возвращает корзину пользователя или None одним запросом
+    и запоминает ее на время обработки запроса.
+    """
+    if not hasattr(request, '_cart'):
+        request._cart = Cart.objects.filter(
+            user_id=request.user.pk).first()
+    return request._cart
+
+
+async def arequest_cart(request):
+    """Асинхронный вариант request_cart()."""
+    if not hasattr(request, '_cart'):
+        request._cart = await Cart.objects.filter(
+            user_id=request.user.pk).afirst()
+    return request._cart
+
+
+def prefetch_cart(view):
+    """
+    Загружает корзину асинхронного view до cart_condition: функции
+    ETag вызываются синхронно и берут уже загруженную корзину.
+    """
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        await arequest_cart(request)
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def cart_etag(request, *args, **kwargs):
+    cart = request_cart(request)
+    if cart is None:
+        return None
+    # Корзина содержит данные продуктов, поэтому зависит и от каталога
+    return _etag(
+        'cart', cart.pk, cart.updated_at, get_catalog_version(),
+        *_representation(request)
+    )
+
+
+def cart_last_modified(request, *args, **kwargs):
+    cart = request_cart(request)
+    if cart is None:
+        return None
+    return max(cart.updated_at, catalog_last_modified(request))
+
+
+# Ответ 304 отдается до обращения к сериализаторам и запросов списков
+catalog_condition = condition(
+    etag_func=catalog_etag, last_modified_func=catalog_last_modified)
+cart_condition = condition(
+    etag_func=cart_etag, last_modified_func=cart_last_modified)
@@ -0,0 +1,165 @@
+"""
+Быстрое чтение для списков каталога и корзины.
+Строит словари из строк .values() в том же виде, что и сериализаторы
+из serializers.py, без создания моделей и полей DRF. Совпадение вывода
+проверяет тест соответствия.
+"""
+from django.core.files.storage import FileSystemStorage, storages
+from django.utils.encoding import filepath_to_uri
+
+from store.models import CartItem, Category, Subcategory
+
+from .timing import timed_phase
+
+PRODUCT_FIELDS = (
+    'id', 'name', 'slug', 'price', 'subcategory__category__name',
+    'subcategory__name', 'image_original', 'image_medium', 'image_thumbnail',
+)
+CART_ITEM_FIELDS = tuple(f'product__{field}' for field in PRODUCT_FIELDS)
+
+
+def media_url():
+    """
+    Возвращает функцию, строящую ссылку на файл по его имени.
+    Для файлового хранилища префикс MEDIA_URL вычисляется один раз,
+    для остальных хранилищ используется их url().
+    """
+    storage = storages['default']
+    if not isinstance(storage, FileSystemStorage):
+        return lambda name: storage.url(name) if name else None
+    prefix = storage.base_url
+
+    def url(name):
+        return prefix + filepath_to_uri(name).lstrip('/') if name else None
+
+    return url
+
+
+def product_data(row, url, prefix=''):
+    """Представление продукта, как у ProductSerializer."""
+    original = row[f'{prefix}image_original']
+    medium = row[f'{prefix}image_medium']
+    thumbnail = row[f'{prefix}image_thumbnail']
+    return {
+        'id': row[f'{prefix}id'],
+        'name': row[f'{prefix}name'],
+        'slug': row[f'{prefix}slug'],
+        'price': f'{row[f"{prefix}price"]:.2f}',
+        'category': row[f'{prefix}subcategory__category__name'],
+        'subcategory': row[f'{prefix}subcategory__name'],
+        'images': {
+            'status': (
+                'pending' if original and not (medium and thumbnail)
+                else 'ready'
+            ),
+            'original': url(original),
+            'medium': url(medium),
+            'thumbnail': url(thumbnail),
+        },
+    }
+
+
+@timed_phase('serialize')
+def product_list(rows):
+    """Представления продуктов из строк .values(*PRODUCT_FIELDS)."""
+    url = media_url()
+    return [product_data(row, url) for row in rows]
+
+
+def empty_cart():
+    """Представление корзины, которой еще нет."""
+    return {'items': [], 'total_items': 0, 'total_sum': 0.0}
+
+
+def cart_item_rows(cart):
+    """Строки элементов корзины для cart_payload() одним запросом."""
+    return CartItem.objects.filter(cart=cart).order_by('pk').values(
+        'quantity', *CART_ITEM_FIELDS)
+
+
+def cart_payload(cart, rows):
+    """Представление корзины из строк cart_item_rows()."""
+    url = media_url()
+    return {
+        'items': [
+            {
+                'product': product_data(row, url, prefix='product__'),
+                'quantity': row['quantity'],
+            }
+            for row in rows
+        ],
+        'total_items': cart.total_items(),
+        # JSONEncoder DRF пишет Decimal из SerializerMethodField числом
+        'total_sum': float(cart.total_sum()),
+    }
+
+
+@timed_phase('serialize')
+def cart_data(cart):
+    """
+    Представление корзины, как у CartSerializer, одним запросом.
+    Если корзины еще нет (None), пустая корзина отдается без запросов.
+    """
+    if cart is None:
+        return empty_cart()
+    return cart_payload(cart, cart_item_rows(cart))
+
+
+async def acart_data(cart):
+    """Асинхронный вариант cart_data()."""
+    if cart is None:
+        return empty_cart()
+    return cart_payload(cart, [row async for row in cart_item_rows(cart)])
+
+
+def category_tree_rows():
+    """Запросы категорий и подкатегорий для category_tree_payload()."""
+    return (
+        Category.objects.values('id', 'name', 'slug', 'image'),
+        Subcategory.objects.order_by('id').values(
+            'id', 'name', 'slug', 'image', 'category_id'),
+    )
+
+
+def category_tree_payload(categories, subcategory_rows):
+    """Дерево категорий из строк category_tree_rows()."""
+    url = media_url()
+    subcategories = {}
+    for row in subcategory_rows:
+        subcategories.setdefault(row['category_id'], []).append({
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'image': url(row['image']),
+        })
+    return [
+        {
+            'id': row['id'],
+            'name': row['name'],
+            'slug': row['slug'],
+            'image': url(row['image']),
+            'subcategories': subcategories.get(row['id'], []),
+        }
+        for row in sorted(
+            categories, key=lambda row: (row['name'], row['id']))
+    ]
+
+
+@timed_phase('serialize')
+def category_tree():
+    """
+    Дерево категорий, как у CategorySerializer, двумя запросами.
+    Подкатегории отсортированы по id, категории - по (name, id)
+    в Python, чтобы порядок совпадал с курсорной пагинацией списка.
+    """
+    categories, subcategories = category_tree_rows()
+    return category_tree_payload(categories, subcategories)
+
+
+async def acategory_tree():
+    """Асинхронный вариант category_tree()."""
+    categories, subcategories = category_tree_rows()
+    return category_tree_payload(
+        [row async for row in categories],
+        [row async for row in subcategories]
+    )
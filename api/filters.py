@@ -0,0 +1,133 @@
+import hashlib
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Value
+from django.db.models.functions import Floor
+from django_filters import rest_framework as filters
+
+from store.models import Product
+
+from .cache import get_catalog_version
+from .pagination import cache_count
+
+FACETS_CACHE_KEY = 'catalog_facets:{version}:{digest}'
+PRICE_HISTOGRAM_STEP = Decimal('100')
+
+
+class ProductFilter(filters.FilterSet):
+    """Фильтр продуктов по категории, подкатегории и диапазону цены."""
+
+    category = filters.CharFilter(field_name='subcategory__category__slug')
+    subcategory = filters.CharFilter(field_name='subcategory__slug')
+    price_min = filters.NumberFilter(field_name='price', lookup_expr='gte')
+    price_max = filters.NumberFilter(field_name='price', lookup_expr='lte')
+
+    class Meta:
+        model = Product
+        fields = ('category', 'subcategory', 'price_min', 'price_max')
+
+
+def _price(value):
+    return f'{value:.2f}'
+
+
+def product_facet_rows(queryset, price_step=PRICE_HISTOGRAM_STEP):
+    """
+    Запрос количества продуктов по подкатегориям и ценовым интервалам
+    шириной price_step: один GROUP BY для collect_product_facets().
+    """
+    return queryset.order_by().values(
+        'subcategory_id', 'subcategory__slug', 'subcategory__name',
+        'subcategory__category_id', 'subcategory__category__slug',
+        'subcategory__category__name',
+        price_bucket=Floor(F('price') / Value(price_step)),
+    ).annotate(count=Count('id'))
+
+
+def collect_product_facets(rows, price_step=PRICE_HISTOGRAM_STEP):
+    """
+    Собирает фасеты по категориям, подкатегориям и ценовым интервалам
+    из строк product_facet_rows().
+    Возвращает (фасеты, общее количество продуктов).
+    """
+    categories, subcategories, buckets = {}, {}, {}
+    for row in rows:
+        count = row['count']
+        category = categories.setdefault(row['subcategory__category_id'], {
+            'id': row['subcategory__category_id'],
+            'slug': row['subcategory__category__slug'],
+            'name': row['subcategory__category__name'],
+            'count': 0,
+        })
+        category['count'] += count
+        subcategory = subcategories.setdefault(row['subcategory_id'], {
+            'id': row['subcategory_id'],
+            'slug': row['subcategory__slug'],
+            'name': row['subcategory__name'],
+            'category': row['subcategory__category__slug'],
+            'count': 0,
+        })
+        subcategory['count'] += count
+        bucket = int(row['price_bucket'])
+        buckets[bucket] = buckets.get(bucket, 0) + count
+
+    facets = {
+        'categories': sorted(
+            categories.values(), key=lambda item: (item['name'], item['id'])),
+        'subcategories': sorted(
+            subcategories.values(),
+            key=lambda item: (item['name'], item['id'])
+        ),
+        'price': [
+            {
+                'min': _price(bucket * price_step),
+                'max': _price((bucket + 1) * price_step),
+                'count': buckets[bucket],
+            }
+            for bucket in sorted(buckets)
+        ],
+    }
+    return facets, sum(buckets.values())
+
+
+def build_product_facets(queryset, price_step=PRICE_HISTOGRAM_STEP):
+    """
+    Считает фасеты запроса продуктов одним GROUP BY запросом.
+    Возвращает (фасеты, общее количество продуктов).
+    """
+    return collect_product_facets(
+        product_facet_rows(queryset, price_step), price_step)
+
+
+def product_facets_key(queryset):
+    digest = hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return FACETS_CACHE_KEY.format(
+        version=get_catalog_version(), digest=digest)
+
+
+def get_product_facets(queryset):
+    """
+    Возвращает фасеты для отфильтрованного запроса продуктов из кэша.
+    Общее количество из того же запроса заменяет COUNT(*) пагинатора.
+    """
+    key = product_facets_key(queryset)
+    facets = cache.get(key)
+    if facets is None:
+        facets, total = build_product_facets(queryset)
+        cache.set(key, facets, settings.CATALOG_COUNT_CACHE_TIMEOUT)
+        cache_count(queryset, total)
+    return facets
+
+
+async def aget_product_facets(queryset):
+    """Асинхронный вариант get_product_facets()."""
+    key = product_facets_key(queryset)
+    facets = cache.get(key)
+    if facets is None:
+        facets, total = collect_product_facets(
+            [row async for row in product_facet_rows(queryset)])
+        cache.set(key, facets, settings.CATALOG_COUNT_CACHE_TIMEOUT)
+        cache_count(queryset, total)
+    return facets
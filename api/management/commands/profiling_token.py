@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.profiling import profiling_token
+
+
+class Command(BaseCommand):
+    """
+    Выдает токен для заголовка X-Profile: запрос с ним профилируется
+    независимо от PROFILING_SAMPLE_RATE.
+    """
+
+    help = 'Выдает токен заголовка X-Profile для профилирования запроса'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'X-Profile: {profiling_token()}')
+        self.stderr.write(
+            f'Токен действует {settings.PROFILING_TOKEN_MAX_AGE} с')
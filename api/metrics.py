@@ -0,0 +1,186 @@
+"""
+Метрики в формате Prometheus: число и длительность запросов по имени
+маршрута, число SQL-запросов, попадания в кэши и глубина очереди
+задач изображений. Включается настройкой METRICS_ENABLED.
+Несколько процессов сервера пишут метрики в общий каталог
+PROMETHEUS_MULTIPROC_DIR, эндпоинт metrics/ суммирует их.
+"""
+from collections import defaultdict
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.models import Count
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+)
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.multiprocess import MultiProcessCollector
+
+from api.timing import unwrap_connections, wrap_connections
+from store.models import ProductImageJob
+
+# Маршрут запросов, не совпавших ни с одним URL
+UNMATCHED_ROUTE = 'unmatched'
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+QUEUE_STATUSES = (ProductImageJob.PENDING, ProductImageJob.PROCESSING)
+
+REQUESTS = Counter(
+    'http_requests', 'Число HTTP-запросов',
+    ('route', 'method', 'status')
+)
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Длительность HTTP-запросов',
+    ('route', 'method')
+)
+REQUEST_QUERIES = Histogram(
+    'http_request_db_queries', 'Число SQL-запросов на HTTP-запрос',
+    ('route',), buckets=QUERY_COUNT_BUCKETS
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups', 'Обращения к кэшам каталога', ('cache', 'result')
+)
+
+
+def record_cache_lookup(cache_name, hit):
+    """Учитывает попадание или промах кэша cache_name."""
+    CACHE_LOOKUPS.labels(cache_name, 'hit' if hit else 'miss').inc()
+
+
+class QueryCounter:
+    """execute_wrapper, считающий SQL-запросы."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Считает запросы, их длительность и число SQL-запросов.
+    Метки - имя маршрута (products-list, cart-add-item), а не путь,
+    чтобы число рядов не росло с числом продуктов и страниц.
+    Под ASGI работает асинхронно.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = perf_counter()
+        wrapped = wrap_connections(counter)
+        try:
+            response = self.get_response(request)
+        finally:
+            unwrap_connections(counter, wrapped)
+        return self.finish(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = perf_counter()
+        # Async ORM выполняет SQL в потоке запроса, а не в цикле событий
+        wrapped = await sync_to_async(wrap_connections)(counter)
+        try:
+            response = await self.get_response(request)
+        finally:
+            unwrap_connections(counter, wrapped)
+        return self.finish(request, response, counter, started)
+
+    @staticmethod
+    def finish(request, response, counter, started):
+        duration = perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match is not None else UNMATCHED_ROUTE
+        REQUESTS.labels(route, request.method, response.status_code).inc()
+        REQUEST_DURATION.labels(route, request.method).observe(duration)
+        REQUEST_QUERIES.labels(route).observe(counter.count)
+        return response
+
+
+class ScrapeCollector:
+    """
+    Метрики, которые считаются в момент сбора: доля попаданий кэшей
+    по суммарным счетчикам всех процессов и очередь задач изображений.
+    """
+
+    def __init__(self, source):
+        self.source = source
+
+    def collect(self):
+        lookups = defaultdict(lambda: {'hit': 0.0, 'miss': 0.0})
+        for metric in self.source.collect():
+            if metric.name != 'cache_lookups':
+                continue
+            for sample in metric.samples:
+                if sample.name == 'cache_lookups_total':
+                    cache_name = sample.labels['cache']
+                    lookups[cache_name][sample.labels['result']] += (
+                        sample.value)
+        ratio = GaugeMetricFamily(
+            'cache_hit_ratio', 'Доля попаданий в кэш', labels=('cache',))
+        for cache_name, counts in sorted(lookups.items()):
+            total = counts['hit'] + counts['miss']
+            ratio.add_metric(
+                (cache_name,), counts['hit'] / total if total else 0.0)
+        yield ratio
+
+        counts = dict.fromkeys(QUEUE_STATUSES, 0)
+        counts.update(
+            ProductImageJob.objects.filter(status__in=QUEUE_STATUSES)
+            .order_by().values('status').annotate(count=Count('id'))
+            .values_list('status', 'count')
+        )
+        queue = GaugeMetricFamily(
+            'image_job_queue_depth', 'Задачи изображений в очереди',
+            labels=('status',)
+        )
+        for status, count in counts.items():
+            queue.add_metric((status,), count)
+        yield queue
+
+
+def metrics_registry():
+    """
+    Реестр для выдачи: при заданном PROMETHEUS_MULTIPROC_DIR - сумма
+    файлов метрик всех процессов, иначе метрики текущего процесса.
+    """
+    if not settings.PROMETHEUS_MULTIPROC_DIR:
+        return REGISTRY
+    registry = CollectorRegistry()
+    MultiProcessCollector(registry, path=settings.PROMETHEUS_MULTIPROC_DIR)
+    return registry
+
+
+def metrics_view(request):
+    """Отдает метрики в текстовом формате Prometheus."""
+    source = metrics_registry()
+    scraped = CollectorRegistry()
+    scraped.register(ScrapeCollector(source))
+    return HttpResponse(
+        generate_latest(source) + generate_latest(scraped),
+        content_type=CONTENT_TYPE_LATEST
+    )
@@ -0,0 +1,324 @@
+import base64
+import hashlib
+import json
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (
+    BasePagination,
+    PageNumberPagination,
+    replace_query_param,
+    remove_query_param,
+)
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+from store.search import RANKED
+
+from .cache import get_catalog_version
+
+COUNT_CACHE_KEY = 'catalog_count:{version}:{digest}'
+
+
+def count_cache_key(queryset):
+    """
+    Ключ кэша количества записей, построенный по SQL запроса
+    и версии каталога.
+    """
+    digest = hashlib.md5(str(queryset.query).encode()).hexdigest()
+    return COUNT_CACHE_KEY.format(
+        version=get_catalog_version(), digest=digest)
+
+
+def cache_count(queryset, count):
+    """Сохраняет известное количество записей запроса."""
+    cache.set(
+        count_cache_key(queryset), count,
+        settings.CATALOG_COUNT_CACHE_TIMEOUT
+    )
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Пагинатор, кэширующий COUNT(*) для запросов к каталогу.
+    Ключ строится по SQL запроса, поэтому разные фильтры считаются
+    отдельно, и сменяется вместе с версией каталога.
+    """
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return len(self.object_list)
+        count = cache.get(count_cache_key(self.object_list))
+        if count is None:
+            count = self.object_list.count()
+            cache_count(self.object_list, count)
+        return count
+
+    async def acount(self):
+        """
+        Асинхронно вычисляет количество записей и запоминает его,
+        чтобы page() не обращался к БД синхронно.
+        """
+        if 'count' not in self.__dict__ and isinstance(
+            self.object_list, QuerySet
+        ):
+            count = cache.get(count_cache_key(self.object_list))
+            if count is None:
+                count = await self.object_list.acount()
+                cache_count(self.object_list, count)
+            self.__dict__['count'] = count
+        return self.count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Курсорная пагинация по ключу (name, id).
+    Страница выбирается условием по ключу вместо OFFSET, поэтому время
+    ответа не зависит от глубины страницы. Работает как с QuerySet,
+    так и с уже отсортированным по (name, id) списком словарей.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    ordering = ('name', 'id')
+    invalid_cursor_message = 'Неверный курсор'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        position, reverse = self.start(request)
+        if isinstance(queryset, QuerySet):
+            items = list(self._page_queryset(queryset, position, reverse))
+        else:
+            items = self._slice_list(queryset, position, reverse)
+        return self.set_page(items, position, reverse)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """Асинхронный вариант paginate_queryset()."""
+        position, reverse = self.start(request)
+        if isinstance(queryset, QuerySet):
+            items = [
+                item async for item
+                in self._page_queryset(queryset, position, reverse)
+            ]
+        else:
+            items = self._slice_list(queryset, position, reverse)
+        return self.set_page(items, position, reverse)
+
+    def start(self, request):
+        """Возвращает позицию курсора и направление выдачи."""
+        self.base_url = request.build_absolute_uri()
+        return self.decode_cursor(request)
+
+    def set_page(self, items, position, reverse):
+        """Запоминает страницу из page_size + 1 записей после курсора."""
+        has_more = len(items) > self.page_size
+        self.page = items[:self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_previous, self.has_next = has_more, True
+        else:
+            self.has_previous, self.has_next = position is not None, has_more
+        return self.page
+
+    def _key(self, item):
+        if isinstance(item, dict):
+            return tuple(item[field] for field in self.ordering)
+        return tuple(getattr(item, field) for field in self.ordering)
+
+    def _page_queryset(self, queryset, position, reverse):
+        name_field, id_field = self.ordering
+        if reverse:
+            queryset = queryset.order_by(f'-{name_field}', f'-{id_field}')
+        else:
+            queryset = queryset.order_by(name_field, id_field)
+        if position is not None:
+            name, pk = position
+            lookup, bound = ('lt', 'lte') if reverse else ('gt', 'gte')
+            # Отдельная граница по name: без нее SQLite не ищет начало
+            # страницы по индексу (name, id), а сканирует его с начала
+            queryset = queryset.filter(
+                Q(**{f'{name_field}__{bound}': name}),
+                Q(**{f'{name_field}__{lookup}': name})
+                | Q(**{name_field: name, f'{id_field}__{lookup}': pk})
+            )
+        return queryset[:self.page_size + 1]
+
+    def _slice_list(self, items, position, reverse):
+        if reverse:
+            end = (
+                len(items) if position is None
+                else bisect_left(items, position, key=self._key)
+            )
+            return items[max(0, end - self.page_size - 1):end][::-1]
+        start = (
+            0 if position is None
+            else bisect_right(items, position, key=self._key)
+        )
+        return items[start:start + self.page_size + 1]
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            name, pk = payload['p']
+            return (str(name), int(pk)), bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, item, reverse):
+        payload = {'p': list(self._key(item))}
+        if reverse:
+            payload['r'] = 1
+        encoded = base64.urlsafe_b64encode(
+            json.dumps(payload, ensure_ascii=False).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+class CatalogPagination(PageNumberPagination):
+    """
+    Пагинация каталога.
+    По умолчанию постраничная с кэшированным количеством записей;
+    при наличии параметра cursor (в том числе пустого) - курсорная.
+    """
+
+    django_paginator_class = CachedCountPaginator
+    keyset_class = KeysetPagination
+
+    def is_first_page(self, request):
+        """
+        Запрошена ли первая страница: без значения курсора (пустой
+        курсор - начало курсорной выдачи) и без номера страницы больше 1.
+        """
+        params = request.query_params
+        if params.get(self.keyset_class.cursor_query_param):
+            return False
+        return (params.get(self.page_query_param) or '1') == '1'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        Асинхронный вариант paginate_queryset(): количество записей
+        и страница загружаются через async ORM, остальное - как
+        в PageNumberPagination.paginate_queryset().
+        """
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return await self.keyset.apaginate_queryset(
+                queryset, request, view)
+        if not isinstance(queryset, QuerySet):
+            return self.paginate_queryset(queryset, request, view)
+        self.keyset = None
+        self.request = request
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        await paginator.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(
+                page_number=page_number, message=str(exc)))
+        if paginator.num_pages > 1 and self.template is not None:
+            self.display_page_controls = True
+        return [row async for row in self.page.object_list]
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SearchPagination(BasePagination):
+    """
+    Курсорная пагинация результатов поиска по ключу (score, id).
+    Выдача идет только вперед: курсор хранит порядок выдачи,
+    релевантность и id последнего продукта страницы. Если порядок
+    выдачи сменился (число совпадений перешло RANK_LIMIT), курсор
+    отклоняется: его score несравним с новыми, и страницы повторили
+    бы или пропустили продукты.
+    """
+
+    cursor_query_param = 'cursor'
+    page_size = api_settings.PAGE_SIZE
+    invalid_cursor_message = 'Неверный курсор'
+    stale_cursor_message = (
+        'Порядок выдачи изменился, начните поиск с первой страницы')
+
+    def paginate_search(self, search, request):
+        """
+        Возвращает страницу пар (score, product_id).
+        search(after, limit) - функция поиска с продолжением после after,
+        возвращающая порядок выдачи и найденные пары.
+        """
+        self.base_url = request.build_absolute_uri()
+        ranking, after = self.decode_cursor(request)
+        self.ranking, found = search(after, self.page_size + 1)
+        if after is not None and ranking != self.ranking:
+            raise NotFound(self.stale_cursor_message)
+        self.has_next = len(found) > self.page_size
+        self.page = found[:self.page_size]
+        return self.page
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, None
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+            score, pk = payload['p']
+            return str(payload['r']), (float(score), int(pk))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        encoded = base64.urlsafe_b64encode(
+            json.dumps({'r': self.ranking, 'p': list(self.page[-1])}).encode()
+        ).decode()
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'ranked': self.ranking == RANKED,
+            'results': data,
+        })
@@ -0,0 +1,229 @@
+"""
+Профилирование живых запросов. Профилируется доля запросов
+PROFILING_SAMPLE_RATE и запросы с подписанным заголовком X-Profile
+(токен выдает команда profiling_token). Для каждого такого запроса
+сохраняются статистика cProfile и свернутые стеки сэмплера,
+по PROFILING_PROFILES_PER_ROUTE последних профилей на маршрут.
+Профили доступны персоналу в админке. Включается настройкой
+PROFILING_ENABLED.
+"""
+import cProfile
+import logging
+import os
+import random
+import sys
+import threading
+from collections import Counter
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signing import BadSignature, TimestampSigner
+from django.db import DatabaseError
+
+from store.models import RequestProfile
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+TOKEN_SALT = 'api.profiling'
+TOKEN_VALUE = 'profile'
+# Маршрут запросов, не совпавших ни с одним URL
+UNMATCHED_ROUTE = 'unmatched'
+# Потоки, в которых сейчас снимается профиль
+_profiled_threads = set()
+# Каталоги sys.path, от которых отсчитываются пути файлов в стеках
+SOURCE_ROOTS = sorted(
+    {os.path.join(path, '') for path in sys.path if path},
+    key=len, reverse=True
+)
+
+
+def profiling_token():
+    """Подписанное значение заголовка X-Profile."""
+    return TimestampSigner(salt=TOKEN_SALT).sign(TOKEN_VALUE)
+
+
+def valid_token(token):
+    try:
+        value = TimestampSigner(salt=TOKEN_SALT).unsign(
+            token, max_age=settings.PROFILING_TOKEN_MAX_AGE)
+    except BadSignature:
+        return False
+    return value == TOKEN_VALUE
+
+
+def short_filename(filename):
+    """Путь к файлу относительно ближайшего каталога sys.path."""
+    for root in SOURCE_ROOTS:
+        if filename.startswith(root):
+            return filename[len(root):]
+    return filename
+
+
+def collapse_stack(frame):
+    """
+    Стек кадра в свернутом формате flame graph: вызовы от корня
+    к листу через ";".
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f'{code.co_qualname} '
+            f'({short_filename(code.co_filename)}:{code.co_firstlineno})'
+        )
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class StackSampler:
+    """
+    Каждые PROFILING_INTERVAL_MS миллисекунд снимает стек потока
+    запроса из отдельного потока и считает одинаковые стеки.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse_stack(frame)] += 1
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def folded(self):
+        """Стеки в формате flamegraph.pl: "стек число" на строку."""
+        return ''.join([
+            f'{stack} {count}\n'
+            for stack, count in self.stacks.most_common()
+        ])
+
+
+class ProfilingMiddleware:
+    """
+    Снимает профиль выбранных запросов. Остальные запросы проходят
+    без профилирования: проверка стоит одного random() и поиска
+    заголовка.
+    Под ASGI работает асинхронно: профиль и стеки снимаются в потоке
+    цикла событий и захватывают код view, но и другие запросы этого
+    цикла. Одновременно в потоке снимается только один профиль.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        trigger = self.trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+        profiler, sampler, started = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = self.stop(profiler, sampler, started)
+        self.save(request, response, trigger, duration, profiler, sampler)
+        return response
+
+    async def __acall__(self, request):
+        trigger = self.trigger(request)
+        if trigger is None:
+            return await self.get_response(request)
+        profiler, sampler, started = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = self.stop(profiler, sampler, started)
+        await sync_to_async(self.save)(
+            request, response, trigger, duration, profiler, sampler)
+        return response
+
+    @staticmethod
+    def trigger(request):
+        if threading.get_ident() in _profiled_threads:
+            return None
+        token = request.META.get(PROFILE_HEADER)
+        if token is not None and valid_token(token):
+            return RequestProfile.HEADER
+        if random.random() < settings.PROFILING_SAMPLE_RATE:
+            return RequestProfile.SAMPLE
+        return None
+
+    @staticmethod
+    def start():
+        thread_id = threading.get_ident()
+        _profiled_threads.add(thread_id)
+        profiler = cProfile.Profile()
+        sampler = StackSampler(
+            thread_id, settings.PROFILING_INTERVAL_MS / 1000)
+        sampler.start()
+        started = perf_counter()
+        profiler.enable()
+        return profiler, sampler, started
+
+    @staticmethod
+    def stop(profiler, sampler, started):
+        """Останавливает профилирование и возвращает длительность."""
+        profiler.disable()
+        duration = perf_counter() - started
+        sampler.stop()
+        _profiled_threads.discard(sampler.thread_id)
+        return duration
+
+    @staticmethod
+    def save(request, response, trigger, duration, profiler, sampler):
+        try:
+            save_profile(
+                request, response, trigger, duration, profiler, sampler)
+        except (DatabaseError, OSError):
+            logger.exception('Не удалось сохранить профиль запроса')
+
+
+def save_profile(request, response, trigger, duration, profiler, sampler):
+    """
+    Сохраняет профиль и удаляет старые профили маршрута сверх
+    PROFILING_PROFILES_PER_ROUTE вместе с их файлами.
+    """
+    match = request.resolver_match
+    route = match.view_name if match is not None else UNMATCHED_ROUTE
+    profile = RequestProfile.objects.create(
+        route=route, method=request.method,
+        path=request.get_full_path()[:2000],
+        status=response.status_code, duration_ms=duration * 1000,
+        trigger=trigger
+    )
+    os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+    profiler.dump_stats(profile.file_path(RequestProfile.PSTATS))
+    profile.file_path(RequestProfile.FOLDED).write_text(sampler.folded())
+    stale = list(
+        RequestProfile.objects.filter(route=route).order_by('-id')
+        .values_list('pk', flat=True)[settings.PROFILING_PROFILES_PER_ROUTE:]
+    )
+    if stale:
+        RequestProfile.objects.filter(pk__in=stale).delete()
+    return profile
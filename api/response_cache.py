@@ -0,0 +1,189 @@
+import asyncio
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+
+from .cache import get_catalog_version, incr_counter
+from .metrics import record_cache_lookup
+
+RESPONSE_CACHE_KEY = 'catalog_response:{version}:{digest}'
+RESPONSE_CACHE_HITS_KEY = 'catalog_response:hits'
+RESPONSE_CACHE_MISSES_KEY = 'catalog_response:misses'
+# Сколько секунд остальные запросы ждут ответ, который строит первый
+REBUILD_LOCK_TIMEOUT = 5
+# Синхронный запрос при ожидании занимает поток WSGI-воркера, поэтому
+# ждет недолго, а затем строит ответ сам, не сохраняя его в кэш
+SYNC_REBUILD_WAIT = 0.25
+REBUILD_POLL_INTERVAL = 0.05
+
+
+def response_cache_key(request):
+    """
+    Ключ ответа: версия каталога, адрес с хостом, параметры запроса
+    в отсортированном порядке и заголовок Accept.
+    """
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.GET.lists() for value in values
+    ))
+    digest = hashlib.md5('|'.join((
+        request.build_absolute_uri(request.path),
+        query,
+        request.META.get('HTTP_ACCEPT', ''),
+    )).encode()).hexdigest()
+    return RESPONSE_CACHE_KEY.format(
+        version=get_catalog_version(), digest=digest)
+
+
+def _store(response_cache, key, response):
+    """Сохраняет отрисованный ответ 200, если он не слишком большой."""
+    if response.status_code != 200 or response.streaming:
+        return
+    if hasattr(response, 'render'):
+        response.render()
+    if len(response.content) > settings.CATALOG_RESPONSE_CACHE_MAX_SIZE:
+        return
+    response_cache.set(key, {
+        'content': response.content,
+        'headers': dict(response.items()),
+    }, settings.CATALOG_RESPONSE_CACHE_TIMEOUT)
+
+
+def _wait(response_cache, key, lock_key):
+    """
+    Ждет, пока другой запрос сохранит ответ или снимет блокировку,
+    не дольше SYNC_REBUILD_WAIT секунд.
+    """
+    deadline = time.monotonic() + SYNC_REBUILD_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(REBUILD_POLL_INTERVAL)
+        entry = response_cache.get(key)
+        if entry is not None or response_cache.get(lock_key) is None:
+            return entry
+    return None
+
+
+async def _await(response_cache, key, lock_key):
+    """Асинхронный вариант _wait(): не занимает цикл событий."""
+    deadline = time.monotonic() + REBUILD_LOCK_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(REBUILD_POLL_INTERVAL)
+        entry = response_cache.get(key)
+        if entry is not None or response_cache.get(lock_key) is None:
+            return entry
+    return None
+
+
+def _cached_response(request, entry):
+    response = HttpResponse(entry['content'])
+    for header, value in entry['headers'].items():
+        response[header] = value
+    # Условный запрос к закэшированному ответу обрабатывается так же,
+    # как во view: совпавший ETag дает 304
+    return get_conditional_response(
+        request,
+        etag=entry['headers'].get('ETag'),
+        last_modified=parse_http_date_safe(
+            entry['headers'].get('Last-Modified', '')),
+        response=response,
+    )
+
+
+def _count_lookup(hit):
+    incr_counter(RESPONSE_CACHE_HITS_KEY if hit else RESPONSE_CACHE_MISSES_KEY)
+    record_cache_lookup('catalog_response', hit=hit)
+
+
+def cache_anonymous_response(view):
+    """
+    Кэширует готовые байты ответов на анонимные GET-запросы.
+    Ответ строит только один запрос на ключ, остальные ждут его.
+    При изменении каталога меняется его версия в ключе, поэтому
+    сохраненные ответы больше не отдаются и вытесняются кэшем.
+    Синхронный запрос ждет не дольше SYNC_REBUILD_WAIT секунд и затем
+    строит ответ без кэша, чтобы не держать поток воркера.
+    Поддерживает и асинхронные view: ожидание ответа другого запроса
+    тогда не блокирует цикл событий.
+    """
+
+    def cacheable(request):
+        return (
+            settings.CATALOG_RESPONSE_CACHE_TIMEOUT
+            and request.method == 'GET'
+            and 'HTTP_AUTHORIZATION' not in request.META
+        )
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if not cacheable(request):
+                return await view(request, *args, **kwargs)
+
+            response_cache = caches[settings.CATALOG_RESPONSE_CACHE_ALIAS]
+            key = response_cache_key(request)
+            entry = response_cache.get(key)
+            if entry is None:
+                lock_key = f'{key}:lock'
+                if response_cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+                    try:
+                        response = await view(request, *args, **kwargs)
+                        _store(response_cache, key, response)
+                    finally:
+                        response_cache.delete(lock_key)
+                    _count_lookup(hit=False)
+                    return response
+                entry = await _await(response_cache, key, lock_key)
+                if entry is None:
+                    _count_lookup(hit=False)
+                    return await view(request, *args, **kwargs)
+            _count_lookup(hit=True)
+            return _cached_response(request, entry)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not cacheable(request):
+            return view(request, *args, **kwargs)
+
+        response_cache = caches[settings.CATALOG_RESPONSE_CACHE_ALIAS]
+        key = response_cache_key(request)
+        entry = response_cache.get(key)
+        if entry is None:
+            lock_key = f'{key}:lock'
+            if response_cache.add(lock_key, 1, REBUILD_LOCK_TIMEOUT):
+                try:
+                    response = view(request, *args, **kwargs)
+                    _store(response_cache, key, response)
+                finally:
+                    response_cache.delete(lock_key)
+                _count_lookup(hit=False)
+                return response
+            entry = _wait(response_cache, key, lock_key)
+            if entry is None:
+                _count_lookup(hit=False)
+                return view(request, *args, **kwargs)
+        _count_lookup(hit=True)
+        return _cached_response(request, entry)
+
+    return wrapper
+
+
+def response_cache_stats():
+    """Возвращает попадания, промахи и долю попаданий кэша ответов."""
+    hits = cache.get(RESPONSE_CACHE_HITS_KEY, 0)
+    misses = cache.get(RESPONSE_CACHE_MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else 0.0,
+    }
@@ -36,8 +36,12 @@ class ProductSerializer(serializers.ModelSerializer):
                   'category', 'subcategory', 'images')
 
     def get_images(self, obj):
-        """Возвращает ссылки на изображения."""
+        """
+        Возвращает ссылки на изображения.
+        Пока производные изображения создаются, status равен pending.
+        """
         return {
+            'status': 'pending' if obj.images_pending else 'ready',
             'original': (
                 obj.image_original.url if obj.image_original else None
             ),
@@ -59,6 +63,26 @@ class CartItemActionSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1)
 
 
+class CartBatchActionSerializer(CartItemActionSerializer):
+    """
+    Сериализатор одной операции пакетного изменения корзины.
+    add - добавить количество, set - задать количество, remove - удалить.
+    """
+
+    ADD = 'add'
+    SET = 'set'
+    REMOVE = 'remove'
+
+    action = serializers.ChoiceField(choices=(ADD, SET, REMOVE))
+    quantity = serializers.IntegerField(min_value=1, required=False)
+
+    def validate(self, attrs):
+        if attrs['action'] != self.REMOVE and 'quantity' not in attrs:
+            raise serializers.ValidationError(
+                {'quantity': 'Обязательное поле.'})
+        return attrs
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     """
     Сериализатор для модели CartItem.
@@ -90,7 +114,7 @@ class CartSerializer(serializers.ModelSerializer):
         """
         Возвращает общее количество товаров в корзине.
         """
-        return sum(item.quantity for item in obj.items.all())
+        return obj.total_items()
 
     def get_total_sum(self, obj):
         """
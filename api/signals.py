@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from store.models import Cart, Category, Product, Subcategory
+from store.signals import catalog_changed
+
+from .cache import (
+    forget_cart_id,
+    invalidate_catalog,
+    invalidate_category_tree,
+)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+@receiver(catalog_changed)
+def category_tree_changed(sender, **kwargs):
+    """Сбрасывает кэш дерева категорий при изменении каталога."""
+    # Изменения только продуктов дерево не затрагивают
+    if sender is not Product:
+        invalidate_category_tree()
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(catalog_changed)
+def catalog_version_changed(sender, **kwargs):
+    """Меняет версию каталога при любом его изменении."""
+    invalidate_catalog()
+
+
+@receiver(post_delete, sender=Cart)
+def cart_deleted(sender, instance, **kwargs):
+    """Удаляет из кэша id удаленной корзины."""
+    forget_cart_id(instance.user_id)
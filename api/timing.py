@@ -0,0 +1,200 @@
+"""
+Замер времени обработки запросов: число и время SQL-запросов,
+время сериализации и рендеринга. Результаты отдаются в заголовке
+Server-Timing, медленные запросы пишутся в лог с отпечатками SQL.
+Включается настройкой SERVER_TIMING_ENABLED.
+"""
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+# Сколько самых долгих отпечатков SQL писать в лог
+SLOW_LOG_FINGERPRINTS = 5
+PLACEHOLDER_LIST_RE = re.compile(
+    r'\bIN\s*\(\s*%s(?:\s*,\s*%s)*\s*\)', re.IGNORECASE)
+NUMBER_RE = re.compile(r'\b\d+\b')
+WHITESPACE_RE = re.compile(r'\s+')
+
+_current_timing = ContextVar('request_timing', default=None)
+
+
+def sql_fingerprint(sql):
+    """
+    Приводит SQL к виду без значений: списки параметров IN
+    сворачиваются, числа в тексте запроса заменяются на "?".
+    """
+    sql = PLACEHOLDER_LIST_RE.sub('IN (...)', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    return WHITESPACE_RE.sub(' ', sql).strip()
+
+
+class RequestTiming:
+    """Время фаз и SQL-запросов одного HTTP-запроса."""
+
+    def __init__(self):
+        self.phases = {}
+        # (sql, длительность) каждого запроса; отпечатки считаются
+        # только для медленных запросов, чтобы не тратить время
+        self.queries = []
+        self.sql_time = 0.0
+        self.slowest_query = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = perf_counter() - started
+            self.queries.append((sql, duration))
+            self.sql_time += duration
+            if duration > self.slowest_query:
+                self.slowest_query = duration
+
+    def add_phase(self, phase, duration):
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+
+    def fingerprints(self):
+        """Отпечатки SQL по убыванию суммарного времени."""
+        totals, counts = Counter(), Counter()
+        for sql, duration in self.queries:
+            fingerprint = sql_fingerprint(sql)
+            totals[fingerprint] += duration
+            counts[fingerprint] += 1
+        return [
+            (fingerprint, counts[fingerprint], duration)
+            for fingerprint, duration in totals.most_common()
+        ]
+
+    def server_timing(self, total):
+        """Значение заголовка Server-Timing, длительности в мс."""
+        phases = ''.join([
+            f'{phase};dur={duration * 1000:.1f}, '
+            for phase, duration in self.phases.items()
+        ])
+        return (
+            f'db;dur={self.sql_time * 1000:.1f};'
+            f'desc="{len(self.queries)} queries", '
+            f'db-slowest;dur={self.slowest_query * 1000:.1f}, '
+            f'{phases}total;dur={total * 1000:.1f}'
+        )
+
+
+def timed_phase(phase):
+    """
+    Декоратор: добавляет время вызова к фазе phase текущего запроса.
+    Без включенного замера функция вызывается напрямую.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            timing = _current_timing.get()
+            if timing is None:
+                return func(*args, **kwargs)
+            started = perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timing.add_phase(phase, perf_counter() - started)
+
+        return wrapper
+
+    return decorator
+
+
+def wrap_connections(wrapper):
+    """
+    То же, что connection.execute_wrapper(), без контекстных менеджеров
+    на каждое подключение. Подключения свои у каждого потока, поэтому
+    вызывается в потоке, где выполняются SQL-запросы.
+    """
+    wrapped = connections.all(initialized_only=False)
+    for connection in wrapped:
+        connection.execute_wrappers.append(wrapper)
+    return wrapped
+
+
+def unwrap_connections(wrapper, wrapped):
+    for connection in wrapped:
+        connection.execute_wrappers.remove(wrapper)
+
+
+class ServerTimingMiddleware:
+    """
+    Считает SQL-запросы всех подключений через execute_wrapper
+    и время фаз, помеченных timed_phase, и добавляет их в заголовок
+    Server-Timing. Запросы дольше SERVER_TIMING_SLOW_MS миллисекунд
+    пишутся в лог вместе с отпечатками SQL. Под ASGI работает
+    асинхронно и не занимает поток на время запроса.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        started = perf_counter()
+        wrapped = wrap_connections(timing)
+        try:
+            response = self.get_response(request)
+        finally:
+            unwrap_connections(timing, wrapped)
+            _current_timing.reset(token)
+        return self.finish(request, response, timing, started)
+
+    async def __acall__(self, request):
+        timing = RequestTiming()
+        token = _current_timing.set(timing)
+        started = perf_counter()
+        # Async ORM выполняет SQL в потоке запроса, а не в цикле событий
+        wrapped = await sync_to_async(wrap_connections)(timing)
+        try:
+            response = await self.get_response(request)
+        finally:
+            unwrap_connections(timing, wrapped)
+            _current_timing.reset(token)
+        return self.finish(request, response, timing, started)
+
+    def finish(self, request, response, timing, started):
+        total = perf_counter() - started
+        response['Server-Timing'] = timing.server_timing(total)
+        if total * 1000 >= settings.SERVER_TIMING_SLOW_MS:
+            self.log_slow_request(request, timing, total)
+        return response
+
+    @staticmethod
+    def log_slow_request(request, timing, total):
+        lines = [
+            f'{count}x {duration * 1000:.1f} мс: {fingerprint}'
+            for fingerprint, count, duration
+            in timing.fingerprints()[:SLOW_LOG_FINGERPRINTS]
+        ]
+        logger.warning(
+            'Медленный запрос %s %s: %.1f мс, SQL: %d запросов, %.1f мс\n%s',
+            request.method, request.get_full_path(), total * 1000,
+            len(timing.queries), timing.sql_time * 1000, '\n'.join(lines)
+        )
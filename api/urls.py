@@ -1,17 +1,64 @@
+from django.conf import settings
 from django.urls import include, path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 from rest_framework.routers import DefaultRouter
 
-from .views import CartViewSet, CategoryListView, ProductListView
+from . import async_views
+from .views import (
+    CartViewSet,
+    CategoryListView,
+    ProductListView,
+    ProductSearchView,
+)
 
 v1_router = DefaultRouter()
-v1_router.register(r'cart', CartViewSet, basename='cart')
+
+if settings.ASYNC_VIEWS:
+    # Асинхронные варианты с теми же адресами и именами маршрутов
+    catalog_urls = [
+        path(
+            'categories/', async_views.category_list,
+            name='categories-list'
+        ),
+        path(
+            'products/', async_views.product_list_view,
+            name='products-list'
+        ),
+    ]
+    cart_urls = [
+        path('cart/', async_views.cart_list, name='cart-list'),
+        path('cart/add/', async_views.cart_add_item, name='cart-add-item'),
+        path(
+            'cart/update/', async_views.cart_update_item,
+            name='cart-update-item'
+        ),
+        path(
+            'cart/remove/', async_views.cart_remove_item,
+            name='cart-remove-item'
+        ),
+        path('cart/batch/', async_views.cart_batch, name='cart-batch'),
+        path('cart/clear/', async_views.cart_clear, name='cart-clear-cart'),
+    ]
+else:
+    catalog_urls = [
+        path(
+            'categories/', CategoryListView.as_view(),
+            name='categories-list'
+        ),
+        path('products/', ProductListView.as_view(), name='products-list'),
+    ]
+    cart_urls = []
+    v1_router.register(r'cart', CartViewSet, basename='cart')
 
 urlpatterns = [
     path('auth/', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
-    path('categories/', CategoryListView.as_view(), name='categories-list'),
-    path('products/', ProductListView.as_view(), name='products-list'),
+    path(
+        'products/search/', ProductSearchView.as_view(),
+        name='products-search'
+    ),
+    *catalog_urls,
+    *cart_urls,
     path('schema/', SpectacularAPIView.as_view(), name='schema'),
     path(
         'swagger/', SpectacularSwaggerView.as_view(url_name='schema'),
@@ -19,3 +66,7 @@ urlpatterns = [
     ),
     path('', include(v1_router.urls)),
 ]
+
+if settings.AUTH_JWT_ENABLED:
+    # auth/jwt/create/, auth/jwt/refresh/, auth/jwt/verify/
+    urlpatterns += [path('auth/', include('djoser.urls.jwt'))]
@@ -1,37 +1,149 @@
+from django.db import IntegrityError
+from django.utils.decorators import method_decorator
 from rest_framework import generics, status, viewsets
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from store.models import Cart, CartItem, Category, Product
+from store.models import Cart, Category, Product
+from store.search import search_products
 
+from .authentication import stateless_authenticators, user_deleted
+from .cache import (
+    forget_cart_id,
+    get_cart_id,
+    get_category_tree,
+    remember_cart_id,
+)
+from .cart import (
+    add_to_cart,
+    apply_cart_batch,
+    clear_cart,
+    remove_from_cart,
+    set_cart_quantity,
+)
+from .conditional import cart_condition, catalog_condition, request_cart
+from .fast_serializers import PRODUCT_FIELDS, cart_data, product_list
+from .filters import ProductFilter, get_product_facets
+from .pagination import CatalogPagination, SearchPagination
+from .response_cache import cache_anonymous_response
 from .serializers import (
+    CartBatchActionSerializer,
     CartItemActionSerializer,
-    CartSerializer,
     CategorySerializer,
     ProductSerializer,
 )
 
 
+def absolute_image_urls(request, categories):
+    """Делает ссылки на изображения в дереве категорий абсолютными."""
+
+    def absolute(url):
+        return request.build_absolute_uri(url) if url else url
+
+    return [
+        {
+            **category,
+            'image': absolute(category['image']),
+            'subcategories': [
+                {**subcategory, 'image': absolute(subcategory['image'])}
+                for subcategory in category['subcategories']
+            ],
+        }
+        for category in categories
+    ]
+
+
+@method_decorator(cache_anonymous_response, name='dispatch')
+@method_decorator(catalog_condition, name='get')
 class CategoryListView(generics.ListAPIView):
-    """Эндпоинт для просмотра списка категорий с подкатегориями."""
+    """
+    Эндпоинт для просмотра списка категорий с подкатегориями.
+    Дерево категорий берется из кэша и не обращается к ORM при попадании.
+    """
 
     queryset = Category.objects.all().order_by('name')
     serializer_class = CategorySerializer
-    pagination_class = PageNumberPagination
+    pagination_class = CatalogPagination
     ordering = ['name']
 
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(get_category_tree())
+        return self.get_paginated_response(
+            absolute_image_urls(request, page))
+
 
+@method_decorator(cache_anonymous_response, name='dispatch')
+@method_decorator(catalog_condition, name='get')
 class ProductListView(generics.ListAPIView):
-    """Эндпоинт для просмотра списка продуктов."""
+    """
+    Эндпоинт для просмотра списка продуктов.
+    Фильтры: category и subcategory (slug), price_min и price_max.
+    """
 
-    queryset = Product.objects.all().order_by('name')
+    queryset = Product.objects.select_related(
+        'subcategory__category').order_by('name')
     serializer_class = ProductSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = CatalogPagination
+    filterset_class = ProductFilter
     ordering = ['name']
 
+    def list(self, request, *args, **kwargs):
+        """
+        Возвращает страницу продуктов вместе с фасетами: количеством
+        продуктов по категориям, подкатегориям и ценовым интервалам.
+        Фасеты не меняются от страницы к странице, поэтому считаются
+        только для первой; на остальных страницах facets равно null.
+        """
+        rows = self.filter_queryset(self.get_queryset()).values(
+            *PRODUCT_FIELDS)
+        facets = None
+        if self.paginator.is_first_page(request):
+            facets = get_product_facets(rows)
+        page = self.paginate_queryset(rows)
+        response = self.get_paginated_response(product_list(page))
+        response.data['facets'] = facets
+        return response
+
+
+@method_decorator(catalog_condition, name='get')
+class ProductSearchView(generics.GenericAPIView):
+    """
+    Эндпоинт поиска продуктов по названию.
+    GET /api/v1/products/search/?q=
+    Ищет по названию и его латинской транслитерации, результаты
+    отсортированы по релевантности и разбиты на страницы курсором.
+    Для слишком общих запросов (больше 1000 совпадений на SQLite)
+    релевантность не считается: сначала идут названия, начинающиеся
+    с первого слова запроса, затем остальные, внутри групп - по id.
+    Поле ranked ответа показывает, ранжирована ли выдача. Курсор
+    из выдачи с другим порядком отклоняется ответом 404.
+    """
+
+    queryset = Product.objects.select_related('subcategory__category')
+    serializer_class = ProductSerializer
+    pagination_class = SearchPagination
+    search_param = 'q'
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            raise ValidationError({self.search_param: 'Пустой запрос'})
+        found = self.paginator.paginate_search(
+            lambda after, limit: search_products(query, after, limit),
+            request
+        )
+        rows = {
+            row['id']: row for row in self.get_queryset().filter(
+                pk__in=[product_id for _, product_id in found]
+            ).values(*PRODUCT_FIELDS)
+        }
+        return self.paginator.get_paginated_response(product_list(
+            rows[product_id] for _, product_id in found
+            if product_id in rows
+        ))
+
 
 class CartViewSet(viewsets.ViewSet):
     """
@@ -40,23 +152,70 @@ class CartViewSet(viewsets.ViewSet):
     """
 
     permission_classes = [IsAuthenticated]
+    batch_max_operations = 500
+
+    def get_authenticators(self):
+        # Корзине нужен только id пользователя, в режиме JWT он берется
+        # из access-токена без запроса к БД
+        return stateless_authenticators()
 
-    def get_cart(self, request):
+    def get_cart(self, request, create=True):
         """
-        Получить или создать корзину для текущего пользователя.
+        Возвращает корзину текущего пользователя.
+        Id уже созданной корзины берется из кэша без запроса к БД.
+        Корзина создается только при первом изменении (create=True),
+        при create=False для пользователя без корзины возвращается None.
+        Пользователь из JWT мог быть удален: тогда корзина не создается
+        и запрос получает ответ 401.
         """
-        cart, _ = Cart.objects.get_or_create(user=request.user)
+        user_id = request.user.pk
+        cart_id = get_cart_id(user_id)
+        if cart_id is not None:
+            return Cart(pk=cart_id, user_id=user_id)
+        if create:
+            try:
+                cart, _ = Cart.objects.get_or_create(user_id=user_id)
+            except IntegrityError:
+                raise user_deleted()
+        else:
+            cart = Cart.objects.filter(user_id=user_id).first()
+            if cart is None:
+                return None
+        remember_cart_id(user_id, cart.pk)
         return cart
 
+    def change_cart(self, request, change, *args):
+        """
+        Применяет change(cart, *args) к корзине пользователя, создавая
+        ее при необходимости, и возвращает корзину. Корзина из кэша
+        могла быть удалена в другом процессе: тогда запись не проходит
+        проверку внешнего ключа, id корзины забывается и изменение
+        повторяется один раз с новой корзиной.
+        """
+        cart = self.get_cart(request)
+        try:
+            change(cart, *args)
+        except IntegrityError:
+            forget_cart_id(request.user.pk)
+            cart = self.get_cart(request)
+            change(cart, *args)
+        return cart
+
+    @method_decorator(cart_condition)
     def list(self, request):
         """
         GET /api/cart/
         Выводит содержимое корзины с подсчетом общего количества товаров
-        и суммы.
+        и суммы. Пустая корзина отдается без создания записи в БД.
         """
-        cart = self.get_cart(request)
-        serializer = CartSerializer(cart)
-        return Response(serializer.data)
+        return self.cart_response(request_cart(request))
+
+    def cart_response(self, cart):
+        """
+        Отдает корзину с элементами, загруженными одним запросом.
+        Для None отдается пустая корзина.
+        """
+        return Response(cart_data(cart))
 
     @action(detail=False, methods=['post'], url_path='add')
     def add_item(self, request):
@@ -70,21 +229,15 @@ class CartViewSet(viewsets.ViewSet):
         if serializer.is_valid():
             product_id = serializer.validated_data['product_id']
             quantity = serializer.validated_data['quantity']
-            try:
-                product = Product.objects.get(pk=product_id)
-            except Product.DoesNotExist:
+            price = Product.objects.filter(pk=product_id).values_list(
+                'price', flat=True).first()
+            if price is None:
                 return Response(
                     {'detail': 'Продукт не найден'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            cart = self.get_cart(request)
-            cart_item, created = CartItem.objects.get_or_create(
-                cart=cart, product=product,
-                defaults={'quantity': quantity}
-            )
-            if not created:
-                cart_item.quantity += quantity
-                cart_item.save()
+            self.change_cart(
+                request, add_to_cart, product_id, quantity, price)
             return Response(
                 {'detail': 'Продукт добавлен в корзину'},
                 status=status.HTTP_201_CREATED
@@ -102,16 +255,14 @@ class CartViewSet(viewsets.ViewSet):
         if serializer.is_valid():
             product_id = serializer.validated_data['product_id']
             quantity = serializer.validated_data['quantity']
-            cart = self.get_cart(request)
-            try:
-                cart_item = cart.items.get(product_id=product_id)
-            except CartItem.DoesNotExist:
+            cart = self.get_cart(request, create=False)
+            if cart is None or not set_cart_quantity(
+                cart, product_id, quantity
+            ):
                 return Response(
                     {'detail': 'Элемент корзины не найден'},
                     status=status.HTTP_404_NOT_FOUND
                 )
-            cart_item.quantity = quantity
-            cart_item.save()
             return Response(
                 {'detail': 'Количество обновлено'},
                 status=status.HTTP_200_OK
@@ -131,23 +282,53 @@ class CartViewSet(viewsets.ViewSet):
                 {'detail': 'product_id обязателен'},
                 status=status.HTTP_400_BAD_REQUEST
             )
-        cart = self.get_cart(request)
-        try:
-            cart_item = cart.items.get(product_id=product_id)
-        except CartItem.DoesNotExist:
+        cart = self.get_cart(request, create=False)
+        if cart is None or not remove_from_cart(cart, product_id):
             return Response(
                 {'detail': 'Элемент корзины не найден'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        cart_item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        """
+        POST /api/cart/batch/
+        Применяет список операций к корзине в одной транзакции
+        и возвращает получившуюся корзину.
+        Ожидает: [{"action": "add"|"set"|"remove",
+                   "product_id": <id>, "quantity": <int>}, ...]
+        """
+        serializer = CartBatchActionSerializer(
+            data=request.data, many=True, allow_empty=False,
+            max_length=self.batch_max_operations
+        )
+        if not serializer.is_valid():
+            return Response(
+                serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        operations = serializer.validated_data
+        product_ids = {operation['product_id'] for operation in operations}
+        missing = product_ids - set(
+            Product.objects.filter(pk__in=product_ids).values_list(
+                'pk', flat=True)
+        )
+        if missing:
+            return Response(
+                {'detail': 'Продукт не найден',
+                 'product_ids': sorted(missing)},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        cart = self.change_cart(request, apply_cart_batch, operations)
+        return self.cart_response(Cart.objects.get(pk=cart.pk))
+
     @action(detail=False, methods=['delete'], url_path='clear')
     def clear_cart(self, request):
         """
         DELETE /api/cart/clear/
         Полностью очищает корзину.
         """
-        cart = self.get_cart(request)
-        cart.items.all().delete()
+        cart = self.get_cart(request, create=False)
+        if cart is not None:
+            clear_cart(cart)
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,179 @@
+"""
+Бенчмарк пропускной способности WSGI и ASGI при 100 и 1000
+одновременных соединений (BENCH_CONNECTIONS).
+Запуск: pytest benchmarks/bench_asgi.py -s
+Серверы не запускаются: запросы идут прямо в обработчики Django.
+WSGI - представления DRF в пуле из BENCH_WSGI_THREADS потоков, как
+у gunicorn с рабочими потоками; ASGI - асинхронные представления
+(ASYNC_VIEWS) в одном цикле событий, как у uvicorn. Каждое
+соединение делает BENCH_REQUESTS_PER_CONNECTION запросов к списку
+продуктов и корзине. Еще один прогон ASGI идет с включенными
+middleware метрик, Server-Timing и профилирования (доля профилируемых
+запросов BENCH_PROFILING_SAMPLE_RATE).
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import reload
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import clear_url_caches
+from rest_framework.authtoken.models import Token
+
+import api.urls
+import config.urls
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+CONNECTIONS = [
+    int(count) for count in os.getenv(
+        'BENCH_CONNECTIONS', '100,1000').split(',')
+]
+WSGI_THREADS = int(os.getenv('BENCH_WSGI_THREADS', 32))
+REQUESTS_PER_CONNECTION = int(os.getenv('BENCH_REQUESTS_PER_CONNECTION', 4))
+PROFILING_SAMPLE_RATE = float(os.getenv('BENCH_PROFILING_SAMPLE_RATE', 0.01))
+PRODUCTS = 200
+USERS = 20
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(
+    django_db_modify_db_settings_parallel_suffix, tmp_path_factory
+):
+    # Тестовая БД SQLite в файле: запросы идут из нескольких потоков
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database.setdefault('TEST', {})['NAME'] = str(
+            tmp_path_factory.mktemp('db') / 'bench.sqlite3')
+
+
+@pytest.fixture
+def tokens(transactional_db, settings):
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    category = Category.objects.create(name='Бенчмарк')
+    subcategory = Subcategory.objects.create(name='ASGI', category=category)
+    products = Product.objects.bulk_create(
+        Product(
+            name=f'Продукт {i}', slug=f'bench-asgi-{i}', price=10,
+            subcategory=subcategory
+        )
+        for i in range(PRODUCTS)
+    )
+    tokens = []
+    for i in range(USERS):
+        user = User.objects.create_user(username=f'bench-asgi-{i}')
+        cart = Cart.objects.create(user=user)
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product=product, quantity=1)
+            for product in products[i:i + 5]
+        )
+        Cart.objects.filter(pk=cart.pk).rebuild_totals()
+        tokens.append(Token.objects.create(user=user).key)
+    return tokens
+
+
+@pytest.fixture
+def views(settings):
+    """Переключает адреса API между view DRF и асинхронными."""
+
+    def use(asynchronous):
+        settings.ASYNC_VIEWS = asynchronous
+        reload(api.urls)
+        reload(config.urls)
+        clear_url_caches()
+
+    yield use
+    use(False)
+
+
+def requests_for(number, tokens):
+    """Пути и заголовки запросов соединения number."""
+    token = tokens[number % len(tokens)]
+    return [
+        ('/api/v1/cart/', {'Authorization': f'Token {token}'})
+        if request % 2 else
+        (f'/api/v1/products/?page={(number + request) % 5 + 1}', {})
+        for request in range(REQUESTS_PER_CONNECTION)
+    ]
+
+
+def run_wsgi(connections, tokens):
+    def serve(number):
+        client = Client()
+        timings, errors = [], 0
+        try:
+            for path, headers in requests_for(number, tokens):
+                started = time.perf_counter()
+                errors += client.get(path, headers=headers).status_code != 200
+                timings.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        return timings, errors
+
+    with ThreadPoolExecutor(max_workers=WSGI_THREADS) as executor:
+        return list(executor.map(serve, range(connections)))
+
+
+def run_asgi(connections, tokens):
+    async def serve(number):
+        client = AsyncClient()
+        timings, errors = [], 0
+        for path, headers in requests_for(number, tokens):
+            started = time.perf_counter()
+            response = await client.get(path, headers=headers)
+            errors += response.status_code != 200
+            timings.append(time.perf_counter() - started)
+        return timings, errors
+
+    async def serve_all():
+        return await asyncio.gather(*map(serve, range(connections)))
+
+    return asyncio.run(serve_all())
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def measure(label, run, connections, tokens):
+    # Прогрев: соединения с БД, кэши количества и фасетов
+    run(len(tokens), tokens)
+    started = time.perf_counter()
+    results = run(connections, tokens)
+    elapsed = time.perf_counter() - started
+    timings = [timing for result, _ in results for timing in result]
+    errors = sum(errors for _, errors in results)
+    print(
+        f'\n{label} {connections} соединений: '
+        f'{len(timings)} запросов за {elapsed:.2f} с '
+        f'({len(timings) / elapsed:.0f} запр/с), '
+        f'p50 {percentile(timings, 0.5) * 1000:.1f} мс, '
+        f'p99 {percentile(timings, 0.99) * 1000:.1f} мс, '
+        f'ошибок {errors}'
+    )
+    assert errors == 0
+
+
+@pytest.mark.parametrize('connections', CONNECTIONS)
+@pytest.mark.parametrize('server', ['wsgi', 'asgi'])
+def test_throughput(tokens, views, server, connections):
+    views(server == 'asgi')
+    run = run_asgi if server == 'asgi' else run_wsgi
+    measure(server.upper(), run, connections, tokens)
+
+
+def test_asgi_diagnostics(tokens, views, settings, tmp_path):
+    settings.SERVER_TIMING_ENABLED = True
+    settings.METRICS_ENABLED = True
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_SAMPLE_RATE = PROFILING_SAMPLE_RATE
+    settings.PROFILING_DIR = str(tmp_path)
+    views(True)
+    measure('ASGI с диагностикой', run_asgi, CONNECTIONS[0], tokens)
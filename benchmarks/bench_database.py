@@ -0,0 +1,142 @@
+"""
+Бенчмарк профилей БД: параллельные добавления в корзину и чтение
+каталога из нескольких потоков.
+Запуск: pytest benchmarks/bench_database.py -s
+На SQLite сравниваются журнал по умолчанию с новым соединением
+на каждый запрос и WAL с постоянными соединениями. С DB_ENGINE=postgresql -
+новое соединение на запрос и CONN_MAX_AGE с проверкой соединений.
+Число потоков и операций задают DB_BENCH_THREADS и DB_BENCH_OPERATIONS.
+"""
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, connection
+from rest_framework.test import APIClient
+
+from store.models import Category, Product, Subcategory
+
+User = get_user_model()
+THREADS = int(os.getenv('DB_BENCH_THREADS', 8))
+OPERATIONS = int(os.getenv('DB_BENCH_OPERATIONS', 100))
+# Каждая WRITE_EVERY-я операция потока - запись в корзину
+WRITE_EVERY = 4
+PRODUCTS = 200
+
+# Исходные PRAGMA SQLite: журнал отката и полная синхронизация;
+# режим журнала хранится в файле БД, поэтому задается явно
+SQLITE_DEFAULT_PRAGMAS = {'journal_mode': 'delete', 'synchronous': 'full'}
+# Профили (название, PRAGMA, CONN_MAX_AGE): сначала исходный, затем
+# настроенный. PRAGMA None - SQLITE_PRAGMAS из настроек
+PROFILES = {
+    'sqlite': (
+        ('rollback journal', SQLITE_DEFAULT_PRAGMAS, 0),
+        ('WAL', None, 600),
+    ),
+    'postgresql': (
+        ('per-request', None, 0),
+        ('persistent', None, 600),
+    ),
+}
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(
+    django_db_modify_db_settings_parallel_suffix, tmp_path_factory
+):
+    # Тестовая БД SQLite в файле, как в tests/conftest.py: общий кэш
+    # памяти не допускает параллельной записи из потоков
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database.setdefault('TEST', {})['NAME'] = str(
+            tmp_path_factory.mktemp('db') / 'bench.sqlite3')
+
+
+@pytest.fixture
+def catalog(transactional_db, settings):
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    category = Category.objects.create(name='Бенчмарк')
+    subcategory = Subcategory.objects.create(name='БД', category=category)
+    products = Product.objects.bulk_create(
+        Product(
+            name=f'Продукт {i}', slug=f'bench-db-{i}', price=10,
+            subcategory=subcategory
+        )
+        for i in range(PRODUCTS)
+    )
+    users = [
+        User.objects.create_user(username=f'bench-db-{i}', password='pass')
+        for i in range(THREADS)
+    ]
+    return products, users
+
+
+def worker(user, products):
+    """Выполняет смесь чтений каталога и записей в корзину."""
+    client = APIClient()
+    client.force_authenticate(user=user)
+    timings, errors = [], 0
+    try:
+        for number in range(OPERATIONS):
+            started = time.perf_counter()
+            if number % WRITE_EVERY == 0:
+                product = products[number % len(products)]
+                status = client.post(
+                    '/api/v1/cart/add/',
+                    {'product_id': product.pk, 'quantity': 1}
+                ).status_code
+                errors += status != 201
+            else:
+                status = client.get(
+                    f'/api/v1/products/?page={number % 5 + 1}'
+                ).status_code
+                errors += status != 200
+            timings.append(time.perf_counter() - started)
+            # Тестовый клиент не закрывает соединения после запроса,
+            # поэтому CONN_MAX_AGE применяется здесь, как в обработчике
+            close_old_connections()
+    finally:
+        connection.close()
+    return timings, errors
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+@pytest.mark.parametrize('tuned', [False, True], ids=['baseline', 'tuned'])
+def test_mixed_workload(catalog, settings, tuned):
+    products, users = catalog
+    name, pragmas, max_age = PROFILES[connection.vendor][tuned]
+    if pragmas is not None:
+        settings.SQLITE_PRAGMAS = pragmas
+    # settings_dict общий для соединений всех потоков
+    original_max_age = connection.settings_dict['CONN_MAX_AGE']
+    connection.settings_dict['CONN_MAX_AGE'] = max_age
+    # Новое соединение применяет режим журнала до запуска потоков
+    connection.close()
+    connection.ensure_connection()
+    try:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            results = list(executor.map(
+                worker, users, [products] * THREADS))
+        elapsed = time.perf_counter() - started
+    finally:
+        connection.settings_dict['CONN_MAX_AGE'] = original_max_age
+    timings = [timing for result, _ in results for timing in result]
+    errors = sum(errors for _, errors in results)
+    print(
+        f'\n{connection.vendor} {name}: {len(timings)} операций '
+        f'за {elapsed:.2f} с ({len(timings) / elapsed:.0f} оп/с), '
+        f'p50 {percentile(timings, 0.5) * 1000:.1f} мс, '
+        f'p99 {percentile(timings, 0.99) * 1000:.1f} мс, '
+        f'ошибок {errors}'
+    )
+    if tuned:
+        assert errors == 0
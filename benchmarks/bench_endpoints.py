@@ -0,0 +1,253 @@
+"""
+Бенчмарк эндпоинтов с бюджетами на задержку и число SQL-запросов.
+Запуск: pytest benchmarks/bench_endpoints.py -s
+Каталог заполняется на 1 000, 10 000 и 100 000 продуктов
+(BENCH_CATALOG_SIZES), корзины - на 1, 20 и 200 строк. Для каждого
+эндпоинта считаются p50 и p99 задержки и наибольшее число запросов
+к БД; превышение бюджетов из benchmarks/budgets.json роняет тест.
+Результаты пишутся в BENCH_RESULTS (по умолчанию
+benchmarks/results/endpoints.json) с сортированными ключами,
+чтобы их можно было сравнивать между коммитами через diff.
+"""
+import base64
+import json
+import os
+import platform
+import time
+from pathlib import Path
+
+import django
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.settings import api_settings
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Category, Product, Subcategory
+from store.signals import catalog_changed
+
+User = get_user_model()
+BENCH_DIR = Path(__file__).resolve().parent
+CATALOG_SIZES = [
+    int(size) for size in os.getenv(
+        'BENCH_CATALOG_SIZES', '1000,10000,100000').split(',')
+]
+CART_LINES = (1, 20, 200)
+REPEATS = int(os.getenv('BENCH_REPEATS', 100))
+BUDGETS_PATH = Path(os.getenv(
+    'BENCH_BUDGETS', BENCH_DIR / 'budgets.json'))
+RESULTS_PATH = Path(os.getenv(
+    'BENCH_RESULTS', BENCH_DIR / 'results' / 'endpoints.json'))
+CATEGORIES = 20
+SUBCATEGORIES_PER_CATEGORY = 10
+BATCH_SIZE = 5000
+
+
+@pytest.fixture(scope='module')
+def results():
+    """Собирает результаты всех размеров и пишет их в JSON в конце."""
+    collected = {}
+    yield collected
+    RESULTS_PATH.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_PATH.write_text(json.dumps({
+        'environment': {
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'repeats': REPEATS,
+        },
+        'results': collected,
+    }, ensure_ascii=False, indent=2, sort_keys=True) + '\n')
+    print(f'\nРезультаты: {RESULTS_PATH}')
+
+
+@pytest.fixture
+def catalog(db, request, settings):
+    """
+    Каталог заданного размера и пользователи с корзинами на 1, 20
+    и 200 строк. Данные удаляются откатом тестовой транзакции.
+    """
+    # Измеряется работа view, а не кэш готовых ответов
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    size = request.param
+    categories = Category.objects.bulk_create(
+        Category(name=f'Категория {i}', slug=f'bench-category-{i}')
+        for i in range(CATEGORIES)
+    )
+    subcategories = Subcategory.objects.bulk_create(
+        Subcategory(
+            name=f'Подкатегория {i}', slug=f'bench-subcategory-{i}',
+            category=categories[i % CATEGORIES]
+        )
+        for i in range(CATEGORIES * SUBCATEGORIES_PER_CATEGORY)
+    )
+    for start in range(0, size, BATCH_SIZE):
+        Product.objects.bulk_create(
+            Product(
+                name=f'Продукт {i:06d}', slug=f'bench-product-{i}',
+                price=10 + i % 990,
+                subcategory=subcategories[i % len(subcategories)],
+                image_original=f'products/original/{i}.jpg',
+                image_medium=f'products/medium/{i}.jpg',
+                image_thumbnail=f'products/thumbnail/{i}.jpg',
+            )
+            for i in range(start, min(start + BATCH_SIZE, size))
+        )
+    # bulk_create не вызывает сигналы: кэши каталога сбрасываются явно
+    catalog_changed.send(sender=Category)
+    product_ids = list(
+        Product.objects.order_by('pk').values_list('pk', flat=True))
+    carts = {}
+    for lines in CART_LINES:
+        user = User.objects.create_user(username=f'bench-{lines}')
+        cart = Cart.objects.create(user=user)
+        fill_cart(cart, product_ids[:lines])
+        carts[lines] = user
+    return size, product_ids, carts
+
+
+def fill_cart(cart, product_ids):
+    CartItem.objects.bulk_create(
+        CartItem(cart=cart, product_id=product_id, quantity=1)
+        for product_id in product_ids
+    )
+    Cart.objects.filter(pk=cart.pk).rebuild_totals()
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def measure(call, prepare=None):
+    """
+    Вызывает эндпоинт REPEATS раз и возвращает p50 и p99 в мс
+    и наибольшее число SQL-запросов. prepare выполняется перед каждым
+    вызовом и не входит в замер. Первый вызов прогревает кэши
+    (количество записей, дерево категорий) и не учитывается.
+    """
+    timings, queries = [], 0
+    for repeat in range(REPEATS + 1):
+        if prepare is not None:
+            prepare()
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = call()
+            timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code < 300, response.content
+        if repeat:
+            queries = max(queries, len(captured))
+        else:
+            timings.clear()
+        # Журнал запросов ограничен и иначе переполнится за прогон
+        connection.queries_log.clear()
+    return {
+        'p50_ms': round(percentile(timings, 0.5), 2),
+        'p99_ms': round(percentile(timings, 0.99), 2),
+        'queries': queries,
+    }
+
+
+def keyset_cursor(product_id):
+    """Курсор KeysetPagination, указывающий на заданный продукт."""
+    name = Product.objects.values_list('name', flat=True).get(pk=product_id)
+    return base64.urlsafe_b64encode(json.dumps(
+        {'p': [name, product_id]}, ensure_ascii=False).encode()).decode()
+
+
+def catalog_endpoints(size, product_ids):
+    client = APIClient()
+    last_page = -(-size // api_settings.PAGE_SIZE)
+    middle = keyset_cursor(product_ids[len(product_ids) // 2])
+    return {
+        'categories': lambda: client.get('/api/v1/categories/'),
+        'products.first_page': lambda: client.get('/api/v1/products/'),
+        'products.deep_page': lambda: client.get(
+            f'/api/v1/products/?page={last_page}'),
+        'products.cursor_deep': lambda: client.get(
+            f'/api/v1/products/?cursor={middle}'),
+        'products.filtered': lambda: client.get(
+            '/api/v1/products/?category=bench-category-1&price_max=500'),
+    }
+
+
+def cart_endpoints(user, product_ids):
+    """
+    Действия CartViewSet. Изменяющие действия возвращают корзину
+    в исходное состояние, поэтому каждый повтор измеряет одно и то же.
+    """
+    client = APIClient()
+    client.force_authenticate(user=user)
+    cart = Cart.objects.get(user=user)
+    lines = list(cart.items.values_list('product_id', flat=True))
+    new_id = product_ids[-1]
+
+    def add():
+        return client.post(
+            '/api/v1/cart/add/', {'product_id': new_id, 'quantity': 1})
+
+    def restore():
+        cart.items.all().delete()
+        fill_cart(cart, lines)
+
+    return {
+        'cart.list': (lambda: client.get('/api/v1/cart/'), None),
+        'cart.add': (add, restore),
+        'cart.update': (lambda: client.put(
+            '/api/v1/cart/update/',
+            {'product_id': lines[0], 'quantity': 2}
+        ), None),
+        'cart.remove': (lambda: client.delete(
+            '/api/v1/cart/remove/', {'product_id': lines[0]}
+        ), restore),
+        'cart.batch': (lambda: client.post('/api/v1/cart/batch/', [
+            {'action': 'add', 'product_id': new_id, 'quantity': 1},
+            {'action': 'set', 'product_id': lines[0], 'quantity': 3},
+            {'action': 'remove', 'product_id': new_id},
+        ], format='json'), None),
+        'cart.clear': (
+            lambda: client.delete('/api/v1/cart/clear/'), restore),
+    }
+
+
+def over_budget(name, result, budget):
+    """Возвращает описания превышенных бюджетов эндпоинта."""
+    return [
+        f'{name}: {metric} {result[metric]} > {budget[metric]}'
+        for metric in ('queries', 'p50_ms', 'p99_ms')
+        if metric in budget and result[metric] > budget[metric]
+    ]
+
+
+@pytest.mark.parametrize(
+    'catalog', CATALOG_SIZES, indirect=True,
+    ids=[f'{size}-products' for size in CATALOG_SIZES]
+)
+def test_endpoint_budgets(catalog, results):
+    size, product_ids, carts = catalog
+    budgets = json.loads(BUDGETS_PATH.read_text())
+    measured, endpoints = {}, {}
+    for name, call in catalog_endpoints(size, product_ids).items():
+        measured[name] = measure(call)
+        endpoints[name] = name
+    for lines, user in carts.items():
+        for name, (call, prepare) in cart_endpoints(
+            user, product_ids
+        ).items():
+            # Бюджет задается для действия без числа строк корзины
+            key = f'{name}.{lines}-lines'
+            measured[key] = measure(call, prepare)
+            endpoints[key] = name
+
+    violations = []
+    for name, result in measured.items():
+        violations += over_budget(
+            name, result, budgets.get(endpoints[name], {}))
+        print(
+            f'\n{size} продуктов, {name}: p50 {result["p50_ms"]} мс, '
+            f'p99 {result["p99_ms"]} мс, запросов {result["queries"]}',
+            end=''
+        )
+    results[f'{size}-products'] = measured
+    assert not violations, '\n'.join(violations)
@@ -0,0 +1,114 @@
+"""
+Бенчмарк поиска продуктов.
+Запуск: pytest benchmarks/bench_search.py -s
+Размер каталога задается переменной SEARCH_BENCH_PRODUCTS
+(по умолчанию 100 000, для проверки на миллионе - 1000000).
+"""
+import os
+import random
+import time
+from itertools import islice
+
+import pytest
+
+from store.models import Category, Product, Subcategory
+from store.search import index_products, search_products
+
+PRODUCTS = int(os.getenv('SEARCH_BENCH_PRODUCTS', 100_000))
+REPEATS = int(os.getenv('SEARCH_BENCH_REPEATS', 20))
+BATCH_SIZE = 5000
+P99_BUDGET_MS = 20
+
+NOUNS = (
+    'Яблоко', 'Яблочный сок', 'Груша', 'Слива', 'Персик', 'Абрикос',
+    'Апельсин', 'Мандарин', 'Лимон', 'Банан', 'Виноград', 'Малина',
+    'Клубника', 'Вишня', 'Черешня', 'Морковь', 'Картофель', 'Капуста',
+    'Свекла', 'Огурец', 'Томат', 'Перец', 'Лук', 'Чеснок', 'Кабачок',
+    'Молоко', 'Кефир', 'Йогурт', 'Творог', 'Сметана', 'Сливки', 'Ряженка',
+    'Сыр', 'Масло', 'Хлеб', 'Батон', 'Булочка', 'Печенье', 'Пряник',
+    'Вафли', 'Шоколад', 'Конфеты', 'Мармелад', 'Зефир', 'Чай', 'Кофе',
+    'Какао', 'Рис', 'Гречка', 'Овсянка', 'Пшено', 'Макароны', 'Мука',
+    'Сахар', 'Соль', 'Колбаса', 'Сосиски', 'Ветчина', 'Курица', 'Говядина',
+    'Свинина', 'Индейка', 'Семга', 'Треска', 'Креветки', 'Яйца', 'Майонез',
+    'Кетчуп', 'Горчица', 'Мед', 'Варенье', 'Орехи', 'Изюм', 'Вода',
+    'Лимонад', 'Квас', 'Пельмени', 'Вареники', 'Блины', 'Мороженое',
+)
+ADJECTIVES = (
+    'зеленый', 'свежий', 'домашний', 'фермерский', 'отборный', 'сладкий',
+    'классический', 'органический', 'твердый', 'цельный', 'копченый',
+    'вареный', 'замороженный', 'сушеный', 'соленый', 'острый', 'нежный',
+    'детский', 'диетический', 'молочный', 'ванильный', 'шоколадный',
+    'ржаной', 'пшеничный', 'черный', 'белый', 'красный', 'желтый',
+    'мелкий', 'крупный',
+)
+SYLLABLES = (
+    'ба', 'ве', 'го', 'да', 'ки', 'ло', 'ми', 'но', 'пу', 'ра', 'си', 'ту',
+    'фа', 'хо', 'це', 'ша', 'ле', 'ро', 'ни', 'ду',
+)
+QUERIES = (
+    'yabloko', 'ябл', 'сыр твердый', 'moloko domashnee', 'shokolad',
+    'гречка', 'tvorog fermerskij', 'кофе 12', 'syr', 'несуществующий',
+    'мол', 'kartofel', 'сок ябл', 'vetchina kopchenaja',
+)
+
+
+def product_names(count):
+    rng = random.Random(0)
+    brands = [
+        ''.join(rng.choice(SYLLABLES) for _ in range(3)).capitalize()
+        for _ in range(2000)
+    ]
+    for number in range(count):
+        yield (
+            f'{rng.choice(NOUNS)} {rng.choice(ADJECTIVES)} '
+            f'{rng.choice(brands)} {number % 1000} {number}'
+        )
+
+
+@pytest.fixture
+def catalog(db):
+    """
+    Заполняет каталог пачками без вызова Product.save().
+    Данные удаляются откатом тестовой транзакции.
+    """
+    category = Category.objects.create(name='Бенчмарк')
+    subcategory = Subcategory.objects.create(name='Поиск', category=category)
+    names = product_names(PRODUCTS)
+    while batch := list(islice(names, BATCH_SIZE)):
+        products = Product.objects.bulk_create(
+            Product(
+                name=name, slug=f'bench-{name}'.replace(' ', '-'),
+                price=10, subcategory=subcategory
+            )
+            for name in batch
+        )
+        index_products(products)
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def test_search_latency(catalog):
+    timings = []
+    by_query = {}
+    for _ in range(REPEATS):
+        for query in QUERIES:
+            after = None
+            # Первая страница и продолжение по курсору
+            for _ in range(2):
+                started = time.perf_counter()
+                _, found = search_products(query, after=after)
+                elapsed = (time.perf_counter() - started) * 1000
+                timings.append(elapsed)
+                by_query[query] = max(by_query.get(query, 0), elapsed)
+                after = found[-1] if found else None
+    p50, p99 = percentile(timings, 0.5), percentile(timings, 0.99)
+    print(
+        f'\nПродуктов: {PRODUCTS}, запросов: {len(timings)}, '
+        f'p50: {p50:.2f} мс, p99: {p99:.2f} мс'
+    )
+    for query, slowest in by_query.items():
+        print(f'{query!r}: {slowest:.2f} мс')
+    assert p99 < P99_BUDGET_MS
@@ -0,0 +1,62 @@
+"""
+Микробенчмарк сериализации списка продуктов: ProductSerializer
+с JSONRenderer против словарей из .values() с FastJSONRenderer.
+Запуск: pytest benchmarks/bench_serializers.py -s
+"""
+import time
+from decimal import Decimal
+
+import pytest
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import PRODUCT_FIELDS, product_list
+from api.renderers import FastJSONRenderer
+from api.serializers import ProductSerializer
+from store.models import Category, Product, Subcategory
+
+REPEATS = 20
+
+
+@pytest.fixture(scope='module')
+def catalog(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        category = Category.objects.create(name='Бенчмарк')
+        subcategory = Subcategory.objects.create(
+            name='Сериализация', category=category)
+        Product.objects.bulk_create(
+            Product(
+                name=f'Продукт {i}', slug=f'bench-product-{i}',
+                price=Decimal('99.90'), subcategory=subcategory,
+                image_original=f'products/original/{i}.jpg',
+                image_medium=f'products/medium/{i}.jpg',
+                image_thumbnail=f'products/thumbnail/{i}.jpg',
+            )
+            for i in range(1000)
+        )
+        yield
+        Category.objects.filter(pk=category.pk).delete()
+
+
+def best_of(render):
+    timings = []
+    for _ in range(REPEATS):
+        started = time.perf_counter()
+        render()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('rows', [10, 100, 1000])
+def test_fast_serializers_are_faster(catalog, rows):
+    queryset = Product.objects.select_related(
+        'subcategory__category').order_by('name')[:rows]
+    slow = best_of(lambda: JSONRenderer().render(
+        ProductSerializer(queryset.all(), many=True).data))
+    fast = best_of(lambda: FastJSONRenderer().render(
+        product_list(queryset.values(*PRODUCT_FIELDS))))
+    print(
+        f'\n{rows} строк: сериализатор {slow:.2f} мс, '
+        f'values() {fast:.2f} мс, ускорение {slow / fast:.1f}x'
+    )
+    assert fast < slow
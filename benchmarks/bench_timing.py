@@ -0,0 +1,73 @@
+"""
+Накладные расходы ServerTimingMiddleware на список продуктов
+и корзину.
+Запуск: pytest benchmarks/bench_timing.py -s
+Запросы с включенным и выключенным замером чередуются, сравниваются
+медианы; бюджет накладных расходов - 2%.
+"""
+import os
+import statistics
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+REPEATS = int(os.getenv('TIMING_BENCH_REPEATS', 3000))
+OVERHEAD_BUDGET = 0.02
+
+
+@pytest.fixture
+def catalog(db, settings):
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    category = Category.objects.create(name='Бенчмарк')
+    subcategory = Subcategory.objects.create(
+        name='Замер', category=category)
+    products = Product.objects.bulk_create(
+        Product(
+            name=f'Продукт {i}', slug=f'bench-timing-{i}', price=10,
+            subcategory=subcategory
+        )
+        for i in range(1000)
+    )
+    user = User.objects.create_user(username='bench-timing')
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create(
+        CartItem(cart=cart, product=product, quantity=1)
+        for product in products[:20]
+    )
+    return user
+
+
+def make_client(settings, enabled, user):
+    # Middleware создается при первом запросе клиента
+    settings.SERVER_TIMING_ENABLED = enabled
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.get('/api/v1/cart/')
+    return client
+
+
+@pytest.mark.parametrize('url', ['/api/v1/products/', '/api/v1/cart/'])
+def test_server_timing_overhead(catalog, settings, url):
+    plain = make_client(settings, False, catalog)
+    timed = make_client(settings, True, catalog)
+    assert 'Server-Timing' in timed.get(url).headers
+    timings = {plain: [], timed: []}
+    for repeat in range(REPEATS):
+        # Порядок чередуется, чтобы прогрев и фон влияли на оба варианта
+        order = (plain, timed) if repeat % 2 else (timed, plain)
+        for client in order:
+            started = time.perf_counter()
+            client.get(url)
+            timings[client].append(time.perf_counter() - started)
+    base = statistics.median(timings[plain])
+    overhead = statistics.median(timings[timed]) / base - 1
+    print(
+        f'\n{url}: без замера {base * 1000:.3f} мс, '
+        f'накладные расходы {overhead:.2%}'
+    )
+    assert overhead < OVERHEAD_BUDGET
@@ -1,4 +1,5 @@
 import os
+from datetime import timedelta
 from pathlib import Path
 
 from dotenv import find_dotenv, load_dotenv
@@ -45,6 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
+    'api.metrics.MetricsMiddleware',
+    'api.timing.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -52,8 +56,37 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'store.replicas.ReplicaMiddleware',
 ]
 
+# Заголовок Server-Timing с числом и временем SQL-запросов, временем
+# сериализации и рендеринга; запросы дольше SERVER_TIMING_SLOW_MS
+# миллисекунд пишутся в лог api.timing с отпечатками SQL
+SERVER_TIMING_ENABLED = os.getenv('SERVER_TIMING_ENABLED', 'False') == 'True'
+SERVER_TIMING_SLOW_MS = int(os.getenv('SERVER_TIMING_SLOW_MS', 500))
+
+# Асинхронные варианты эндпоинтов каталога и корзины для запуска
+# под ASGI (uvicorn config.asgi:application)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# Метрики Prometheus на эндпоинте metrics/. Процессы сервера пишут
+# метрики в файлы каталога PROMETHEUS_MULTIPROC_DIR; эту же
+# переменную окружения читает prometheus_client
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+# Профилирование живых запросов: доля PROFILING_SAMPLE_RATE и запросы
+# с заголовком X-Profile (manage.py profiling_token). Профили хранятся
+# в PROFILING_DIR и показываются в админке
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'False') == 'True'
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+PROFILING_INTERVAL_MS = float(os.getenv('PROFILING_INTERVAL_MS', 5))
+PROFILING_PROFILES_PER_ROUTE = int(
+    os.getenv('PROFILING_PROFILES_PER_ROUTE', 20)
+)
+PROFILING_TOKEN_MAX_AGE = int(os.getenv('PROFILING_TOKEN_MAX_AGE', 3600))
+PROFILING_DIR = os.getenv('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+
 ROOT_URLCONF = 'config.urls'
 
 TEMPLATES = [
@@ -78,13 +111,155 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DB_ENGINE=sqlite (по умолчанию) или postgresql.
+# CONN_MAX_AGE - сколько секунд соединение живет между запросами,
+# 0 - новое соединение на каждый запрос
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('POSTGRES_DB', 'grocery_store'),
+            'USER': os.getenv('POSTGRES_USER', 'postgres'),
+            'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            # Постоянное соединение проверяется перед каждым запросом
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+            },
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
+            # Соединение переиспользуется, и PRAGMA из SQLITE_PRAGMAS
+            # не выполняются заново на каждый запрос
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+        }
+    }
+
+# Реплики для чтения каталога (store.replicas): DB_REPLICAS - хосты
+# PostgreSQL или пути к файлам SQLite через запятую, DB_REPLICA_WEIGHTS -
+# их веса при выборе по кругу (по умолчанию 1)
+DB_REPLICAS = [
+    location for location in os.getenv('DB_REPLICAS', '').split(',')
+    if location
+]
+DB_REPLICA_WEIGHTS = [
+    int(weight) for weight in os.getenv('DB_REPLICA_WEIGHTS', '').split(',')
+    if weight
+]
+DATABASE_REPLICAS = {}
+for number, location in enumerate(DB_REPLICAS):
+    alias = f'replica_{number + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST' if DB_ENGINE == 'postgresql' else 'NAME': location,
+        # В тестах реплика - та же БД, что и основная
+        'TEST': {'MIRROR': 'default'},
     }
+    DATABASE_REPLICAS[alias] = (
+        DB_REPLICA_WEIGHTS[number] if number < len(DB_REPLICA_WEIGHTS)
+        else 1
+    )
+DATABASE_ROUTERS = ['store.replicas.ReplicaRouter']
+# Сколько секунд после изменения каталога он читается с основной БД
+DATABASE_REPLICA_LAG = int(os.getenv('DB_REPLICA_LAG', 5))
+
+# PRAGMA для каждого нового соединения SQLite (store.signals).
+# WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL
+# не теряет согласованность при сбое, busy_timeout - сколько
+# миллисекунд ждать блокировку вместо ошибки "database is locked".
+# cache_size < 0 задается в КиБ
+SQLITE_PRAGMAS = {
+    'journal_mode': os.getenv('SQLITE_JOURNAL_MODE', 'wal'),
+    'synchronous': os.getenv('SQLITE_SYNCHRONOUS', 'normal'),
+    'busy_timeout': int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.getenv('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.getenv('SQLITE_CACHE_SIZE', -64 * 1024)),
+    'temp_store': 'memory',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Для файлового кэша: CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# и CACHE_LOCATION=/путь/к/каталогу
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'grocery_store'),
+    },
+    # Готовые ответы каталога для анонимных запросов. Размер ограничен
+    # числом записей: при переполнении старые записи вытесняются
+    'catalog_responses': {
+        'BACKEND': os.getenv(
+            'CATALOG_RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv(
+            'CATALOG_RESPONSE_CACHE_LOCATION', 'catalog_responses'
+        ),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(
+                os.getenv('CATALOG_RESPONSE_CACHE_MAX_ENTRIES', 1000)
+            ),
+        },
+    },
+    # Версии каталога и дерева категорий и метка чтения с основной БД
+    # (store.replicas). Они общие для всех процессов сервера и команд
+    # manage.py, иначе изменение из другого процесса не сбросит кэш
+    # и не закрепит чтение. Для нескольких серверов укажите Redis
+    # или Memcached
+    'catalog_versions': {
+        'BACKEND': os.getenv(
+            'VERSION_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'VERSION_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'versions')
+        ),
+    },
 }
 
+CATALOG_VERSION_CACHE_ALIAS = 'catalog_versions'
+
+# Время жизни закэшированного количества товаров и категорий, в секундах
+CATALOG_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('CATALOG_COUNT_CACHE_TIMEOUT', 60)
+)
+
+# Сколько секунд id корзины пользователя хранится в кэше
+CART_ID_CACHE_TIMEOUT = int(os.getenv('CART_ID_CACHE_TIMEOUT', 3600))
+
+# Списки админки без фильтров берут число строк из статистики СУБД
+# вместо COUNT(*), если в таблице не меньше стольких строк
+ADMIN_ESTIMATED_COUNT_MIN = int(
+    os.getenv('ADMIN_ESTIMATED_COUNT_MIN', 100000)
+)
+
+# Кэш ответов каталога для анонимных запросов: псевдоним кэша,
+# время жизни в секундах (0 - отключен) и наибольший размер ответа в байтах
+CATALOG_RESPONSE_CACHE_ALIAS = 'catalog_responses'
+CATALOG_RESPONSE_CACHE_TIMEOUT = int(
+    os.getenv('CATALOG_RESPONSE_CACHE_TIMEOUT', 300)
+)
+CATALOG_RESPONSE_CACHE_MAX_SIZE = int(
+    os.getenv('CATALOG_RESPONSE_CACHE_MAX_SIZE', 512 * 1024)
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -125,15 +300,48 @@ STATIC_URL = 'static/'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Создавать производные изображения продуктов сразу при сохранении,
+# а не в фоновой команде process_image_jobs
+PRODUCT_IMAGES_INLINE = os.getenv('PRODUCT_IMAGES_INLINE', 'False') == 'True'
+
+# Задача в обработке дольше PRODUCT_IMAGE_JOB_LEASE секунд считается
+# брошенной упавшим обработчиком и забирается снова. Брошенные задачи
+# и задачи с ошибкой повторяются, пока попыток меньше
+# PRODUCT_IMAGE_JOB_MAX_ATTEMPTS
+PRODUCT_IMAGE_JOB_LEASE = int(os.getenv('PRODUCT_IMAGE_JOB_LEASE', 600))
+PRODUCT_IMAGE_JOB_MAX_ATTEMPTS = int(
+    os.getenv('PRODUCT_IMAGE_JOB_MAX_ATTEMPTS', 3)
+)
+
+# Размеры производных изображений продуктов. После изменения
+# пересоздайте их командой regenerate_product_images
+PRODUCT_IMAGE_SIZES = {
+    'medium': (500, 500),
+    'thumbnail': (100, 100),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Режим JWT: djoser выдает access- и refresh-токены (auth/jwt/...),
+# корзина проверяет access-токен по подписи без запросов к БД.
+# Токены TokenAuthentication продолжают работать на время перехода
+AUTH_JWT_ENABLED = os.getenv('AUTH_JWT_ENABLED', 'False') == 'True'
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
+        *(
+            ['rest_framework_simplejwt.authentication.JWTAuthentication']
+            if AUTH_JWT_ENABLED else []
+        ),
         'rest_framework.authentication.TokenAuthentication',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
     'DEFAULT_FILTER_BACKENDS': ['django_filters.rest_framework.DjangoFilterBackend'],
@@ -142,6 +350,16 @@ REST_FRAMEWORK = {
 
 AUTH_USER_MODEL = 'store.CustomUser'
 
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(
+        minutes=int(os.getenv('JWT_ACCESS_TOKEN_MINUTES', 15))
+    ),
+    'REFRESH_TOKEN_LIFETIME': timedelta(
+        days=int(os.getenv('JWT_REFRESH_TOKEN_DAYS', 7))
+    ),
+    'AUTH_HEADER_TYPES': ('Bearer', 'JWT'),
+}
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'API магазина продуктов',
     'DESCRIPTION': 'Документация API для проекта grocery_store',
@@ -1,12 +1,156 @@
+from django import forms
+from django.conf import settings
 from django.contrib import admin
+from django.contrib.admin.utils import get_last_value_from_parameters
+from django.contrib.admin.widgets import AutocompleteSelect
+from django.core.paginator import Paginator
+from django.db import OperationalError, connections
+from django.db.models import F
+from django.http import FileResponse, Http404
+from django.urls import path, reverse
+from django.utils.functional import cached_property
+from django.utils.html import format_html_join
 
-from .models import Cart, CartItem, Category, CustomUser, Product, Subcategory
+from .models import (
+    Cart,
+    CartItem,
+    Category,
+    CustomUser,
+    Product,
+    ProductImageJob,
+    RequestProfile,
+    Subcategory,
+)
 
 admin.site.empty_value_display = 'Не задано'
 
 
+def estimated_row_count(model, using):
+    """
+    Число строк таблицы модели по статистике СУБД: pg_class
+    в PostgreSQL, sqlite_stat1 (после ANALYZE) в SQLite.
+    Возвращает None, если статистики нет.
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = to_regclass(%s)',
+                [connection.ops.quote_name(table)]
+            )
+        elif connection.vendor == 'sqlite':
+            try:
+                cursor.execute(
+                    'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                    [table]
+                )
+            except OperationalError:
+                # ANALYZE еще не выполнялся
+                return None
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    # reltuples = -1 у таблиц, которые еще не анализировались
+    count = int(float(str(row[0]).split()[0]))
+    return count if count >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор списков админки для больших таблиц.
+    Список без фильтров и поиска берет число строк из статистики
+    СУБД вместо COUNT(*) по всей таблице, если строк не меньше
+    ADMIN_ESTIMATED_COUNT_MIN. Отфильтрованные списки и небольшие
+    таблицы считаются точно.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimated_row_count(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_MIN
+            ):
+                return estimate
+        return super().count
+
+
+class AutocompleteFilter(admin.RelatedFieldListFilter):
+    """
+    Фильтр списка по связанному объекту с поиском через
+    автодополнение админки вместо перечня всех объектов.
+    Загружается только выбранный объект. У админки связанной
+    модели должны быть заданы search_fields.
+    """
+
+    template = 'admin/store/autocomplete_filter.html'
+    media = forms.Media(js=[
+        'admin/js/jquery.init.js', 'store/admin/autocomplete_filter.js'
+    ])
+
+    def __init__(
+        self, field, request, params, model, model_admin, field_path
+    ):
+        super().__init__(
+            field, request, params, model, model_admin, field_path)
+        self.value = get_last_value_from_parameters(
+            self.used_parameters, self.lookup_kwarg)
+        self.admin_site = model_admin.admin_site
+
+    def field_choices(self, field, request, model_admin):
+        return []
+
+    def has_output(self):
+        return True
+
+    def render_widget(self):
+        """Поле автодополнения с выбранным объектом."""
+        choice_field = forms.ModelChoiceField(
+            queryset=self.field.remote_field.model._default_manager.all(),
+            required=False,
+            widget=AutocompleteSelect(self.field, self.admin_site)
+        )
+        return choice_field.widget.render(
+            self.lookup_kwarg, self.value, attrs={
+                'id': f'filter_{self.field_path}',
+                'data-width': '100%',
+                'data-filter-isnull': self.lookup_kwarg_isnull,
+            }
+        )
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Класс администрирования таблиц с сотнями тысяч строк:
+    приблизительное число строк в списке без второго COUNT(*)
+    и скрипты для фильтров AutocompleteFilter.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    @property
+    def media(self):
+        media = super().media
+        if any(
+            isinstance(list_filter, tuple)
+            and issubclass(list_filter[1], AutocompleteFilter)
+            for list_filter in self.list_filter
+        ):
+            media += (
+                AutocompleteSelect(None, self.admin_site).media
+                + AutocompleteFilter.media
+            )
+        return media
+
+
 @admin.register(CustomUser)
-class CustomUserAdmin(admin.ModelAdmin):
+class CustomUserAdmin(LargeTableAdmin):
     """Класс администрирования пользователей."""
 
     list_display = (
@@ -41,25 +185,101 @@ class SubcategoryAdmin(SluggedAdmin):
 
     list_display = ('name', 'category', 'slug')
     list_filter = ('category',)
+    list_select_related = ('category',)
     search_fields = ('name',)
     ordering = ('name',)
 
 
 @admin.register(Product)
-class ProductAdmin(SluggedAdmin):
+class ProductAdmin(SluggedAdmin, LargeTableAdmin):
     """Класс администрирования товаров."""
 
     list_display = ('name', 'subcategory', 'price', 'slug')
-    list_filter = ('subcategory',)
+    list_filter = (('subcategory', AutocompleteFilter),)
+    list_select_related = ('subcategory__category',)
+    autocomplete_fields = ('subcategory',)
     search_fields = ('name',)
     ordering = ('name',)
 
 
+@admin.register(ProductImageJob)
+class ProductImageJobAdmin(LargeTableAdmin):
+    """Класс администрирования задач обработки изображений."""
+
+    list_display = ('product', 'status', 'attempts', 'updated_at')
+    list_filter = ('status',)
+    list_select_related = ('product',)
+    readonly_fields = ('product', 'attempts', 'error', 'created_at')
+    ordering = ('-id',)
+
+
+@admin.register(RequestProfile)
+class RequestProfileAdmin(admin.ModelAdmin):
+    """
+    Класс администрирования профилей запросов.
+    Профили только просматриваются, скачиваются и удаляются.
+    """
+
+    list_display = (
+        'created_at', 'route', 'method', 'status', 'duration_ms',
+        'trigger', 'downloads'
+    )
+    list_filter = ('route', 'trigger')
+    search_fields = ('path',)
+    ordering = ('-id',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    @admin.display(description='Файлы')
+    def downloads(self, obj):
+        return format_html_join(' ', '<a href="{}">{}</a>', (
+            (reverse(
+                'admin:store_requestprofile_download', args=(obj.pk, kind)
+            ), kind)
+            for kind in RequestProfile.FILE_KINDS
+        ))
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:pk>/download/<str:kind>/',
+                self.admin_site.admin_view(self.download),
+                name='store_requestprofile_download'
+            ),
+        ] + super().get_urls()
+
+    def download(self, request, pk, kind):
+        """Отдает файл профиля: pstats или свернутые стеки."""
+        profile = self.get_object(request, pk)
+        if (
+            profile is None
+            or kind not in RequestProfile.FILE_KINDS
+            or not self.has_view_permission(request, profile)
+        ):
+            raise Http404
+        try:
+            stream = profile.file_path(kind).open('rb')
+        except FileNotFoundError:
+            raise Http404
+        return FileResponse(
+            stream, as_attachment=True,
+            filename=f'{profile.route}-{profile.pk}.{kind}'
+        )
+
+
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 0
     fields = ('product', 'quantity', 'get_total')
     readonly_fields = ('get_total',)
+    autocomplete_fields = ('product',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('product')
 
     @admin.display(description='Общая стоимость')
     def get_total(self, obj):
@@ -67,18 +287,62 @@ class CartItemInline(admin.TabularInline):
 
 
 @admin.register(Cart)
-class CartAdmin(admin.ModelAdmin):
-    """Класс администрирования корзины."""
+class CartAdmin(LargeTableAdmin):
+    """
+    Класс администрирования корзины.
+    Итоги хранятся в самой корзине, поэтому список их не считает.
+    """
 
-    list_display = ('user', 'updated_at', 'total_sum')
+    list_display = ('user', 'updated_at', 'items_quantity', 'total_sum')
+    list_select_related = ('user',)
     search_fields = ('user__username', 'user__email')
+    autocomplete_fields = ('user',)
+    readonly_fields = ('items_quantity', 'items_sum')
     inlines = [CartItemInline]
 
+    @admin.display(description='Общая стоимость', ordering='items_sum')
+    def total_sum(self, obj):
+        return obj.total_sum()
+
+    def save_related(self, request, form, formsets, change):
+        """Пересчитывает итоги корзины после изменения ее элементов."""
+        super().save_related(request, form, formsets, change)
+        Cart.objects.filter(pk=form.instance.pk).rebuild_totals()
+
 
 @admin.register(CartItem)
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     """Класс администрирования элемент корзины."""
 
     list_display = ('cart', 'product', 'quantity', 'get_total')
-    list_filter = ('product', 'cart__user')
+    list_filter = (
+        ('product', AutocompleteFilter),
+        ('cart__user', AutocompleteFilter),
+    )
+    list_select_related = ('cart__user', 'product')
     search_fields = ('product__name', 'cart__user__username')
+    autocomplete_fields = ('cart', 'product')
+
+    def get_queryset(self, request):
+        # Стоимость элемента считается в запросе списка
+        return super().get_queryset(request).annotate(
+            annotated_total=F('quantity') * F('product__price'))
+
+    @admin.display(description='Общая стоимость', ordering='annotated_total')
+    def get_total(self, obj):
+        return obj.annotated_total
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        # Элемент мог быть перенесен в другую корзину
+        cart_ids = {obj.cart_id, form.initial.get('cart')}
+        Cart.objects.filter(pk__in=cart_ids - {None}).rebuild_totals()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        Cart.objects.filter(pk=obj.cart_id).rebuild_totals()
+
+    def delete_queryset(self, request, queryset):
+        cart_ids = list(queryset.values_list('cart_id', flat=True))
+        super().delete_queryset(request, queryset)
+        Cart.objects.filter(pk__in=cart_ids).rebuild_totals()
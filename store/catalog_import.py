@@ -0,0 +1,466 @@
+import csv
+import json
+import os
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import (
+    Cart,
+    CartItem,
+    Category,
+    Product,
+    ProductImageJob,
+    Subcategory,
+    make_slug,
+)
+from .search import index_products
+from .signals import catalog_changed
+
+JSON_READ_SIZE = 64 * 1024
+# Цены проверяются валидаторами поля модели: bulk_create их не вызывает
+PRICE_FIELD = Product._meta.get_field('price')
+
+
+def iter_json_array(file):
+    """
+    Потоково читает JSON-массив объектов, не загружая файл целиком.
+    В памяти держится только текущий фрагмент файла.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position >= len(buffer) or (
+            not eof and len(buffer) - position < JSON_READ_SIZE
+        ):
+            buffer = buffer[position:]
+            position = 0
+            if not eof:
+                chunk = file.read(JSON_READ_SIZE)
+                eof = not chunk
+                buffer += chunk
+                continue
+            if not buffer:
+                raise ValueError('Неожиданный конец JSON-массива')
+        if not started:
+            if buffer[position] != '[':
+                raise ValueError('Ожидался JSON-массив')
+            started = True
+            position += 1
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            record, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(JSON_READ_SIZE)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield record
+
+
+def read_records(path, file_format=None):
+    """
+    Читает записи каталога из JSON, NDJSON или CSV файла.
+    Формат определяется по расширению, если не указан явно.
+    """
+    if file_format is None:
+        file_format = os.path.splitext(path)[1].lstrip('.').lower()
+        if file_format == 'jsonl':
+            file_format = 'ndjson'
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            yield from csv.DictReader(file)
+        elif file_format == 'ndjson':
+            for line in file:
+                if line.strip():
+                    yield json.loads(line)
+        elif file_format == 'json':
+            yield from iter_json_array(file)
+        else:
+            raise ValueError(f'Неизвестный формат файла: {file_format}')
+
+
+class CatalogImporter:
+    """
+    Массовый импорт каталога пачками bulk_create(update_conflicts=True).
+    Принимает записи фикстур Django (store.category, store.subcategory,
+    store.product) и плоские строки с полями category, subcategory,
+    name, price и необязательными image, category_image,
+    subcategory_image. Slug вычисляются без обращения к save(),
+    изображения продуктов ставятся в очередь process_image_jobs.
+    Записи с неверной ценой и записи, чей slug совпал со slug записи
+    с другим названием ('Молоко 2.5%' и 'Молоко 2,5%'), пропускаются
+    вместе с вложенными записями и попадают в skipped.
+    """
+
+    def __init__(self, batch_size=1000):
+        self.batch_size = batch_size
+        self.categories = {}
+        self.subcategories = {}
+        self.products = {}
+        # Кэши slug и id родителей: их мало по сравнению с продуктами
+        self.category_slugs = {}
+        self.category_ids = {}
+        self.subcategory_slugs = {}
+        self.subcategory_ids = {}
+        self.counts = {
+            'categories': 0, 'subcategories': 0, 'products': 0,
+            'skipped': 0,
+        }
+        # Пропущенные записи: (чья запись, название, причина)
+        self.skipped = []
+        self.skipped_category_names = set()
+        self.skipped_category_ids = set()
+        self.skipped_subcategory_keys = set()
+        self.skipped_subcategory_ids = set()
+
+    def add(self, record):
+        """Добавляет запись в очередь и сохраняет полную пачку."""
+        model = record.get('model')
+        if model == 'store.category':
+            fields = record['fields']
+            self.categories[fields['name']] = Category(
+                id=record.get('pk'), name=fields['name'],
+                image=fields.get('image') or ''
+            )
+        elif model == 'store.subcategory':
+            fields = record['fields']
+            self.subcategories[(fields['category'], fields['name'])] = (
+                Subcategory(
+                    id=record.get('pk'), category_id=fields['category'],
+                    name=fields['name'], image=fields.get('image') or ''
+                )
+            )
+        elif model == 'store.product':
+            fields = record['fields']
+            price = self.clean_price(fields['name'], fields['price'])
+            if price is not None:
+                self.queue_product(Product(
+                    id=record.get('pk'),
+                    subcategory_id=fields['subcategory'],
+                    name=fields['name'], price=price,
+                    image_original=fields.get('image_original') or '',
+                    image_medium=fields.get('image_medium') or None,
+                    image_thumbnail=fields.get('image_thumbnail') or None,
+                ))
+        elif model is None:
+            self.add_row(record)
+        else:
+            raise ValueError(f'Неизвестная модель: {model}')
+        if (
+            len(self.products) >= self.batch_size
+            or len(self.categories) + len(self.subcategories)
+            >= self.batch_size
+        ):
+            self.flush()
+
+    def add_row(self, row):
+        """Раскладывает плоскую строку на категорию, подкатегорию и продукт."""
+        price = self.clean_price(row['name'], row['price'])
+        if price is None:
+            return
+        category_name = row['category']
+        if (
+            category_name not in self.category_ids
+            and category_name not in self.skipped_category_names
+        ):
+            self.categories.setdefault(category_name, Category(
+                name=category_name, image=row.get('category_image') or ''))
+        product = Product(
+            name=row['name'], price=price,
+            image_original=row.get('image') or ''
+        )
+        product.category_name = category_name
+        product.subcategory_name = row['subcategory']
+        product.subcategory_image = row.get('subcategory_image') or ''
+        self.queue_product(product)
+
+    def clean_price(self, name, price):
+        """
+        Возвращает цену, прошедшую проверки поля Product.price, или None,
+        пропуская продукт с неверной ценой.
+        """
+        try:
+            return PRICE_FIELD.clean(price, None)
+        except ValidationError as error:
+            self.skip('продукта', name, ' '.join(error.messages))
+            return None
+
+    def queue_product(self, product):
+        # Повтор продукта в пачке заменяет предыдущий: один upsert на ключ
+        key = product.id or (
+            getattr(product, 'category_name', None),
+            getattr(product, 'subcategory_name', None),
+            product.name,
+        )
+        self.products[key] = product
+
+    def flush(self):
+        """Сохраняет накопленные записи одной транзакцией."""
+        with transaction.atomic():
+            self.flush_categories()
+            self.resolve_row_subcategories()
+            self.flush_subcategories()
+            self.flush_products()
+
+    def flush_categories(self):
+        categories = list(self.categories.values())
+        self.categories = {}
+        if not categories:
+            return
+        for category in categories:
+            category.slug = make_slug(category.name)
+        categories, skipped = self.drop_slug_collisions(
+            Category, categories, 'категории', ('slug',))
+        for category in skipped:
+            if category.id:
+                self.skipped_category_ids.add(category.id)
+            else:
+                self.skipped_category_names.add(category.name)
+        if not categories:
+            return
+        with_ids = [category for category in categories if category.id]
+        without_ids = [category for category in categories if not category.id]
+        if with_ids:
+            Category.objects.bulk_create(
+                with_ids, update_conflicts=True, unique_fields=['id'],
+                update_fields=['name', 'slug', 'image']
+            )
+        if without_ids:
+            Category.objects.bulk_create(
+                without_ids, update_conflicts=True, unique_fields=['name'],
+                update_fields=['slug']
+            )
+        for category in categories:
+            self.category_ids[category.name] = category.id
+            self.category_slugs[category.id] = category.slug
+        self.counts['categories'] += len(categories)
+
+    def resolve_row_subcategories(self):
+        """Ставит в очередь подкатегории, указанные в плоских строках."""
+        for key, product in list(self.products.items()):
+            if product.subcategory_id:
+                continue
+            if product.category_name in self.skipped_category_names:
+                del self.products[key]
+                self.skip(
+                    'продукта', product.name,
+                    f'пропущена категория "{product.category_name}"'
+                )
+                continue
+            category_id = self.category_ids[product.category_name]
+            key = (category_id, product.subcategory_name)
+            if (
+                key not in self.subcategory_ids
+                and key not in self.skipped_subcategory_keys
+            ):
+                self.subcategories.setdefault(key, Subcategory(
+                    category_id=category_id, name=product.subcategory_name,
+                    image=product.subcategory_image
+                ))
+
+    def flush_subcategories(self):
+        subcategories = []
+        for subcategory in self.subcategories.values():
+            if subcategory.category_id in self.skipped_category_ids:
+                self.skip_subcategory(
+                    subcategory, 'пропущена ее категория')
+            else:
+                subcategories.append(subcategory)
+        self.subcategories = {}
+        if not subcategories:
+            return
+        self.load_slugs(
+            Category, self.category_slugs,
+            {subcategory.category_id for subcategory in subcategories}
+        )
+        for subcategory in subcategories:
+            subcategory.slug = (
+                f'{self.category_slugs[subcategory.category_id]}-'
+                f'{make_slug(subcategory.name)}'
+            )
+        subcategories, skipped = self.drop_slug_collisions(
+            Subcategory, subcategories, 'подкатегории',
+            ('category_id', 'slug')
+        )
+        for subcategory in skipped:
+            self.skip_subcategory(subcategory)
+        if not subcategories:
+            return
+        with_ids = [item for item in subcategories if item.id]
+        without_ids = [item for item in subcategories if not item.id]
+        if with_ids:
+            Subcategory.objects.bulk_create(
+                with_ids, update_conflicts=True, unique_fields=['id'],
+                update_fields=['category', 'name', 'slug', 'image']
+            )
+        if without_ids:
+            Subcategory.objects.bulk_create(
+                without_ids, update_conflicts=True,
+                unique_fields=['category', 'slug'], update_fields=['name']
+            )
+        for subcategory in subcategories:
+            self.subcategory_ids[
+                (subcategory.category_id, subcategory.name)
+            ] = subcategory.id
+            self.subcategory_slugs[subcategory.id] = subcategory.slug
+        self.counts['subcategories'] += len(subcategories)
+
+    def flush_products(self):
+        products = []
+        for product in self.products.values():
+            if not product.subcategory_id:
+                key = (
+                    self.category_ids[product.category_name],
+                    product.subcategory_name
+                )
+                if key in self.skipped_subcategory_keys:
+                    self.skip(
+                        'продукта', product.name,
+                        f'пропущена подкатегория "{product.subcategory_name}"'
+                    )
+                    continue
+                product.subcategory_id = self.subcategory_ids[key]
+            elif product.subcategory_id in self.skipped_subcategory_ids:
+                self.skip(
+                    'продукта', product.name, 'пропущена его подкатегория')
+                continue
+            products.append(product)
+        self.products = {}
+        if not products:
+            return
+        self.load_slugs(
+            Subcategory, self.subcategory_slugs,
+            {product.subcategory_id for product in products}
+        )
+        for product in products:
+            product.slug = (
+                f'{self.subcategory_slugs[product.subcategory_id]}-'
+                f'{make_slug(product.name)}'
+            )
+        products, _ = self.drop_slug_collisions(
+            Product, products, 'продукта', ('slug',))
+        if not products:
+            return
+
+        groups = {}
+        for product in products:
+            key = (bool(product.id), bool(product.image_original))
+            groups.setdefault(key, []).append(product)
+        for (has_id, has_image), batch in groups.items():
+            update_fields = ['subcategory', 'name', 'price']
+            if has_id:
+                update_fields.append('slug')
+            if has_image:
+                # Пустые поля изображений не затирают загруженные ранее
+                update_fields += [
+                    'image_original', 'image_medium', 'image_thumbnail']
+            Product.objects.bulk_create(
+                batch, update_conflicts=True,
+                unique_fields=['id'] if has_id else ['slug'],
+                update_fields=update_fields
+            )
+        index_products(products)
+        product_ids = [product.id for product in products]
+        Cart.objects.filter(
+            pk__in=CartItem.objects.filter(
+                product_id__in=product_ids).values('cart')
+        ).rebuild_totals()
+        self.queue_images(
+            product for product in products
+            if product.image_original
+            and not (product.image_medium and product.image_thumbnail)
+        )
+        self.counts['products'] += len(products)
+
+    def skip(self, label, name, reason):
+        self.skipped.append((label, name, reason))
+        self.counts['skipped'] += 1
+
+    def skip_subcategory(self, subcategory, reason=None):
+        if subcategory.id:
+            self.skipped_subcategory_ids.add(subcategory.id)
+        else:
+            self.skipped_subcategory_keys.add(
+                (subcategory.category_id, subcategory.name))
+        if reason is not None:
+            self.skip('подкатегории', subcategory.name, reason)
+
+    def drop_slug_collisions(self, model, objects, label, unique_fields):
+        """
+        Оставляет один upsert на уникальный ключ со slug (иначе
+        PostgreSQL отклонит пачку) и пропускает объекты, чей ключ занят
+        объектом с другим названием в пачке или в БД: upsert по ключу
+        слил бы их в один, а upsert по id нарушил бы уникальность.
+        Возвращает оставшиеся и пропущенные объекты.
+        """
+        by_key, skipped = {}, []
+
+        def drop(obj, owner_name):
+            skipped.append(obj)
+            self.skip(
+                label, obj.name,
+                f'slug {obj.slug} уже занят записью "{owner_name}"'
+            )
+
+        for obj in objects:
+            key = tuple(getattr(obj, field) for field in unique_fields)
+            other = by_key.get(key)
+            if other is not None and other.name != obj.name:
+                drop(obj, other.name)
+                continue
+            by_key[key] = obj
+        existing = model.objects.filter(
+            slug__in={obj.slug for obj in by_key.values()}
+        ).values_list(*unique_fields, 'id', 'name')
+        for *key, pk, name in existing:
+            obj = by_key.get(tuple(key))
+            if obj is None:
+                continue
+            if obj.id:
+                taken = obj.id != pk
+            else:
+                taken = obj.name != name
+            if taken:
+                del by_key[tuple(key)]
+                drop(obj, name)
+        return list(by_key.values()), skipped
+
+    def queue_images(self, products):
+        """Ставит продукты без производных изображений в очередь."""
+        product_ids = {product.id for product in products}
+        if not product_ids:
+            return
+        product_ids -= set(ProductImageJob.objects.filter(
+            product_id__in=product_ids, status=ProductImageJob.PENDING
+        ).values_list('product_id', flat=True))
+        ProductImageJob.objects.bulk_create(
+            ProductImageJob(product_id=product_id)
+            for product_id in product_ids
+        )
+
+    @staticmethod
+    def load_slugs(model, slugs, ids):
+        """Догружает slug родителей, которых еще нет в кэше."""
+        missing = ids - slugs.keys()
+        if missing:
+            slugs.update(
+                model.objects.filter(pk__in=missing).values_list('pk', 'slug')
+            )
+
+    def run(self, records):
+        """Импортирует поток записей и сообщает об изменении каталога."""
+        for record in records:
+            self.add(record)
+        self.flush()
+        catalog_changed.send(sender=self.__class__)
+        return self.counts
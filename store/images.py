@@ -0,0 +1,143 @@
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+from .models import Product, ProductImageJob
+from .signals import catalog_changed
+
+
+def image_sizes():
+    """Возвращает размеры среднего изображения и миниатюры из настроек."""
+    sizes = settings.PRODUCT_IMAGE_SIZES
+    return tuple(sizes['medium']), tuple(sizes['thumbnail'])
+
+
+def images_hash(data, sizes):
+    """Хеш содержимого оригинала вместе с размерами производных."""
+    return hashlib.sha256(repr(sizes).encode() + data).hexdigest()
+
+
+def encode_image(img, image_format):
+    """Кодирует изображение в байты в заданном формате."""
+    buffer = BytesIO()
+    img.save(buffer, format=image_format)
+    return buffer.getvalue()
+
+
+def render_derivatives(data, sizes, known_hash=None):
+    """
+    Создает среднее изображение и миниатюру из байтов оригинала.
+    Возвращает (хеш, среднее изображение, миниатюра); если хеш совпал
+    с known_hash, изображение не декодируется и вместо байтов - None.
+    Оригинал декодируется один раз: thumbnail() включает draft-режим
+    JPEG и reduce(), миниатюра уменьшается из среднего изображения.
+    Функция не обращается к Django и может выполняться в отдельном
+    процессе.
+    """
+    digest = images_hash(data, sizes)
+    if digest == known_hash:
+        return digest, None, None
+    medium_size, thumbnail_size = sizes
+    img = Image.open(BytesIO(data))
+    image_format = img.format
+    img.thumbnail(medium_size)
+    medium = encode_image(img, image_format)
+    img.thumbnail(thumbnail_size)
+    thumbnail = encode_image(img, image_format)
+    return digest, medium, thumbnail
+
+
+def read_original(product):
+    """Читает оригинал изображения продукта из хранилища."""
+    with product.image_original.open('rb') as original:
+        return original.read()
+
+
+def store_derivatives(product, digest, medium, thumbnail):
+    """
+    Сохраняет производные изображения в хранилище и заполняет поля
+    продукта, не записывая их в БД.
+    """
+    name = os.path.basename(product.image_original.name)
+    for field, content in (
+        (product.image_medium, medium),
+        (product.image_thumbnail, thumbnail),
+    ):
+        old_name = field.name
+        field.save(name, ContentFile(content), save=False)
+        # Старый файл удаляется после записи нового
+        if old_name and old_name != field.name:
+            field.storage.delete(old_name)
+    product.images_hash = digest
+
+
+def save_derivatives(product, digest, medium, thumbnail):
+    """
+    Сохраняет производные изображения и записывает их имена
+    одним UPDATE, не вызывая Product.save().
+    """
+    store_derivatives(product, digest, medium, thumbnail)
+    Product.objects.filter(pk=product.pk).update(
+        image_medium=product.image_medium.name,
+        image_thumbnail=product.image_thumbnail.name,
+        images_hash=product.images_hash
+    )
+
+
+def fail_job(job, error):
+    """Отмечает задачу как завершившуюся ошибкой."""
+    job.status = ProductImageJob.FAILED
+    job.error = (
+        f'Ошибка при обработке изображений для {job.product_id}: {error}'
+    )
+    job.save(update_fields=('status', 'error', 'updated_at'))
+
+
+def finish_job(job, render):
+    """
+    Получает производные изображения вызовом render
+    и сохраняет их, отмечая задачу выполненной.
+    """
+    try:
+        save_derivatives(job.product, *render())
+    except Exception as error:
+        fail_job(job, error)
+        return
+    job.status = ProductImageJob.DONE
+    job.error = ''
+    job.save(update_fields=('status', 'error', 'updated_at'))
+
+
+def process_jobs(jobs, workers=0):
+    """
+    Выполняет забранные из очереди задачи.
+    При workers > 0 изображения обрабатываются пулом процессов,
+    файлы и БД обновляются в текущем процессе.
+    """
+    sizes = image_sizes()
+    if not workers:
+        for job in jobs:
+            finish_job(job, lambda job=job: render_derivatives(
+                read_original(job.product), sizes))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            submitted = []
+            for job in jobs:
+                try:
+                    future = executor.submit(
+                        render_derivatives, read_original(job.product), sizes)
+                except Exception as error:
+                    fail_job(job, error)
+                else:
+                    submitted.append((job, future.result))
+            for job, result in submitted:
+                finish_job(job, result)
+    if jobs:
+        # Ссылки на изображения в ответах API изменились
+        catalog_changed.send(sender=Product)
+    return jobs
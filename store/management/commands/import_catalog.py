@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.catalog_import import CatalogImporter, read_records
+
+
+class Command(BaseCommand):
+    """
+    Массовый импорт категорий, подкатегорий и продуктов.
+    Файлы читаются потоком и сохраняются пачками upsert-запросов.
+    """
+
+    help = 'Импортирует каталог из JSON, NDJSON или CSV файлов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='+',
+            help='Файлы каталога, импортируются в указанном порядке'
+        )
+        parser.add_argument(
+            '--format', choices=('json', 'ndjson', 'csv'),
+            help='Формат файлов, по умолчанию - по расширению'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество записей в одном INSERT'
+        )
+
+    def handle(self, *args, **options):
+        importer = CatalogImporter(batch_size=options['batch_size'])
+        started = time.monotonic()
+        try:
+            counts = importer.run(
+                record
+                for path in options['paths']
+                for record in read_records(path, options['format'])
+            )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Ошибка импорта: {error!r}')
+        elapsed = time.monotonic() - started
+        for label, name, reason in importer.skipped:
+            self.stderr.write(self.style.WARNING(
+                f'Пропущена запись {label} "{name}": {reason}'))
+        rate = counts['products'] / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Категорий: {counts["categories"]}, '
+            f'подкатегорий: {counts["subcategories"]}, '
+            f'продуктов: {counts["products"]}, '
+            f'пропущено: {counts["skipped"]}, '
+            f'{elapsed:.1f} с, {rate:.0f} продуктов/с'
+        ))
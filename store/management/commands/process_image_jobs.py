@@ -0,0 +1,47 @@
+import os
+import time
+
+from django.core.management.base import BaseCommand
+
+from store.images import process_jobs
+from store.models import ProductImageJob
+
+
+class Command(BaseCommand):
+    """
+    Обработчик очереди задач на создание изображений продуктов.
+    Забирает задачи пачками и обрабатывает их пулом процессов.
+    """
+
+    help = 'Создает средние изображения и миниатюры продуктов из очереди'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Количество процессов, 0 - обработка в текущем процессе'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Количество задач, забираемых за раз'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выйти, когда очередь опустеет'
+        )
+        parser.add_argument(
+            '--sleep', type=float, default=2.0,
+            help='Пауза между проверками пустой очереди, в секундах'
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            jobs = ProductImageJob.objects.claim(limit=options['batch_size'])
+            if not jobs:
+                if options['once']:
+                    return
+                time.sleep(options['sleep'])
+                continue
+            process_jobs(jobs, workers=options['workers'])
+            failed = sum(job.status == ProductImageJob.FAILED for job in jobs)
+            self.stdout.write(
+                f'Обработано задач: {len(jobs)}, с ошибкой: {failed}')
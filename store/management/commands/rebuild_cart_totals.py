@@ -0,0 +1,61 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.models import Cart
+
+CENT = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    """
+    Проверяет и пересчитывает сохраненные итоги корзин.
+    Итоги сверяются с агрегатами по элементам корзин,
+    пересчитываются только расходящиеся корзины.
+    """
+
+    help = 'Проверяет и пересчитывает сохраненные итоги корзин'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Только проверить итоги, завершиться с ошибкой при расхождении'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Количество корзин в одном UPDATE'
+        )
+
+    def handle(self, *args, **options):
+        stale_ids = list(self.find_stale())
+        if options['check']:
+            if stale_ids:
+                raise CommandError(
+                    f'Итоги расходятся у корзин: {len(stale_ids)}')
+            self.stdout.write(self.style.SUCCESS('Итоги корзин сходятся'))
+            return
+
+        batch_size = options['batch_size']
+        for start in range(0, len(stale_ids), batch_size):
+            Cart.objects.filter(
+                pk__in=stale_ids[start:start + batch_size]
+            ).rebuild_totals()
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано корзин: {len(stale_ids)}'))
+
+    def find_stale(self):
+        """Возвращает id корзин с расходящимися итогами."""
+        rows = Cart.objects.with_totals().values_list(
+            'pk', 'items_quantity', 'items_sum',
+            'annotated_total_items', 'annotated_total_sum'
+        ).order_by('pk')
+        for pk, quantity, total, actual_quantity, actual_total in (
+            rows.iterator()
+        ):
+            # Суммы сравниваются после округления до копеек
+            actual_total = Decimal(actual_total or 0).quantize(CENT)
+            if (
+                quantity != (actual_quantity or 0)
+                or total.quantize(CENT) != actual_total
+            ):
+                yield pk
@@ -0,0 +1,121 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+
+from store.images import (
+    image_sizes,
+    read_original,
+    render_derivatives,
+    store_derivatives,
+)
+from store.models import Product
+from store.signals import catalog_changed
+
+
+class Command(BaseCommand):
+    """
+    Пересоздает производные изображения всех продуктов.
+    Продукты читаются потоком, изображения обрабатываются пулом процессов,
+    актуальные по хешу оригинала и размеров пропускаются.
+    """
+
+    help = 'Пересоздает средние изображения и миниатюры продуктов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Количество процессов, 0 - обработка в текущем процессе'
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=200,
+            help='Количество продуктов, обрабатываемых и сохраняемых за раз'
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересоздать изображения, даже если они актуальны'
+        )
+
+    def handle(self, *args, **options):
+        self.sizes = image_sizes()
+        self.force = options['force']
+        self.rendered = self.skipped = self.failed = 0
+        products = Product.objects.exclude(image_original='').only(
+            'id', 'image_original', 'image_medium', 'image_thumbnail',
+            'images_hash'
+        ).order_by('pk').iterator(chunk_size=options['chunk_size'])
+
+        started = time.monotonic()
+        executor = (
+            ProcessPoolExecutor(max_workers=options['workers'])
+            if options['workers'] else None
+        )
+        try:
+            while chunk := list(islice(products, options['chunk_size'])):
+                self.process_chunk(chunk, executor)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        elapsed = time.monotonic() - started
+
+        rate = self.rendered / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересоздано: {self.rendered}, актуальных: {self.skipped}, '
+            f'с ошибкой: {self.failed}, {elapsed:.1f} с, '
+            f'{rate:.1f} изобр./с'
+        ))
+
+    def is_up_to_date(self, product):
+        """Производные изображения есть в хранилище и хеш известен."""
+        return bool(product.images_hash) and all(
+            field and field.storage.exists(field.name)
+            for field in (product.image_medium, product.image_thumbnail)
+        )
+
+    def process_chunk(self, products, executor):
+        """Обрабатывает пачку продуктов и сохраняет ее одним bulk_update."""
+        submitted = []
+        for product in products:
+            known_hash = (
+                None if self.force or not self.is_up_to_date(product)
+                else product.images_hash
+            )
+            try:
+                data = read_original(product)
+            except OSError as error:
+                self.report_error(product, error)
+                continue
+            if executor is None:
+                result = partial(
+                    render_derivatives, data, self.sizes, known_hash)
+            else:
+                result = executor.submit(
+                    render_derivatives, data, self.sizes, known_hash
+                ).result
+            submitted.append((product, result))
+
+        updated = []
+        for product, result in submitted:
+            try:
+                digest, medium, thumbnail = result()
+            except Exception as error:
+                self.report_error(product, error)
+                continue
+            if medium is None:
+                self.skipped += 1
+                continue
+            store_derivatives(product, digest, medium, thumbnail)
+            updated.append(product)
+        Product.objects.bulk_update(
+            updated, ['image_medium', 'image_thumbnail', 'images_hash'])
+        if updated:
+            catalog_changed.send(sender=Product)
+        self.rendered += len(updated)
+
+    def report_error(self, product, error):
+        self.failed += 1
+        self.stderr.write(
+            f'Ошибка при обработке изображений для {product.pk}: {error}')
@@ -0,0 +1,48 @@
+# Generated by Django 5.0.9 on 2026-10-17 04:19
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_cart_totals(apps, schema_editor):
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    totals = CartItem.objects.filter(
+        cart=OuterRef('pk')
+    ).values('cart').annotate(
+        quantity_total=Sum('quantity'),
+        sum_total=Sum(
+            F('quantity') * F('product__price'),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ),
+    )
+    Cart.objects.update(
+        items_quantity=Coalesce(Subquery(totals.values('quantity_total')), 0),
+        items_sum=Coalesce(
+            Subquery(totals.values('sum_total')), Value(Decimal('0.00')),
+            output_field=models.DecimalField(max_digits=12, decimal_places=2)
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_category_product_name_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='items_quantity',
+            field=models.PositiveIntegerField(default=0, help_text='Обновляется автоматически'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='items_sum',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), help_text='Обновляется автоматически', max_digits=12),
+        ),
+        migrations.RunPython(fill_cart_totals, migrations.RunPython.noop),
+    ]
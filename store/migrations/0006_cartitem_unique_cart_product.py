@@ -0,0 +1,35 @@
+# Generated by Django 5.0.9 on 2026-10-17 04:21
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_duplicate_items(apps, schema_editor):
+    """Сливает повторяющиеся элементы корзины, суммируя количество."""
+    CartItem = apps.get_model('store', 'CartItem')
+    duplicates = CartItem.objects.values('cart', 'product').annotate(
+        items=Count('id'), keep_id=Min('id'), total=Sum('quantity')
+    ).filter(items__gt=1)
+    for duplicate in duplicates.iterator():
+        CartItem.objects.filter(pk=duplicate['keep_id']).update(
+            quantity=duplicate['total'])
+        CartItem.objects.filter(
+            cart=duplicate['cart'], product=duplicate['product']
+        ).exclude(pk=duplicate['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_cart_items_quantity_items_sum'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            merge_duplicate_items, migrations.RunPython.noop
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
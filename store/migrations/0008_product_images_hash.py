@@ -0,0 +1,18 @@
+# Generated by Django 5.0.9 on 2026-10-17 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_productimagejob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='images_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Хеш оригинала и размеров производных изображений', max_length=64),
+        ),
+    ]
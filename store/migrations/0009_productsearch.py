@@ -0,0 +1,116 @@
+# Generated by Django 5.0.9 on 2026-10-17 04:28
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+from unidecode import unidecode
+
+SQLITE_INDEX = (
+    "CREATE VIRTUAL TABLE store_productsearch_fts USING fts5("
+    "name, translit, content='store_productsearch', "
+    "content_rowid='product_id', prefix='2 3', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER store_productsearch_ai AFTER INSERT ON "
+    "store_productsearch BEGIN "
+    "INSERT INTO store_productsearch_fts(rowid, name, translit) "
+    "VALUES (new.product_id, new.name, new.translit); END",
+    "CREATE TRIGGER store_productsearch_ad AFTER DELETE ON "
+    "store_productsearch BEGIN "
+    "INSERT INTO store_productsearch_fts("
+    "store_productsearch_fts, rowid, name, translit) "
+    "VALUES ('delete', old.product_id, old.name, old.translit); END",
+    "CREATE TRIGGER store_productsearch_au AFTER UPDATE ON "
+    "store_productsearch BEGIN "
+    "INSERT INTO store_productsearch_fts("
+    "store_productsearch_fts, rowid, name, translit) "
+    "VALUES ('delete', old.product_id, old.name, old.translit); "
+    "INSERT INTO store_productsearch_fts(rowid, name, translit) "
+    "VALUES (new.product_id, new.name, new.translit); END",
+)
+SQLITE_DROP = (
+    'DROP TRIGGER IF EXISTS store_productsearch_ai',
+    'DROP TRIGGER IF EXISTS store_productsearch_ad',
+    'DROP TRIGGER IF EXISTS store_productsearch_au',
+    'DROP TABLE IF EXISTS store_productsearch_fts',
+)
+POSTGRESQL_INDEX = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX store_productsearch_name_trgm ON store_productsearch '
+    'USING gin (name gin_trgm_ops)',
+    'CREATE INDEX store_productsearch_translit_trgm ON store_productsearch '
+    'USING gin (translit gin_trgm_ops)',
+)
+POSTGRESQL_DROP = (
+    'DROP INDEX IF EXISTS store_productsearch_name_trgm',
+    'DROP INDEX IF EXISTS store_productsearch_translit_trgm',
+)
+# Копия store.search.TRANSLIT_RULES на момент миграции: дальнейшие
+# изменения правил не должны менять результат этой миграции
+TRANSLIT_RULES = (
+    (re.compile(r"'"), ''),
+    (re.compile(r'kh'), 'h'),
+    (re.compile(r't[sz]'), 'c'),
+    (re.compile(r'[yj]e'), 'e'),
+    (re.compile(r'[yj](?=[aeiou])'), 'i'),
+    (re.compile(r'(?<=[aeiou])[yj]'), 'i'),
+    (re.compile(r'w'), 'v'),
+)
+
+
+def transliterate(text):
+    text = unidecode(text).lower()
+    for pattern, replacement in TRANSLIT_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, ()):
+            schema_editor.execute(statement)
+    return run
+
+
+def index_existing_products(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    ProductSearch = apps.get_model('store', 'ProductSearch')
+    batch = []
+    for pk, name in Product.objects.values_list('pk', 'name').iterator():
+        batch.append(ProductSearch(
+            product_id=pk, name=name.lower(), translit=transliterate(name)))
+        if len(batch) >= 1000:
+            ProductSearch.objects.bulk_create(batch)
+            batch = []
+    ProductSearch.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_product_images_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSearch',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='store.product')),
+                ('name', models.CharField(max_length=255)),
+                ('translit', models.CharField(max_length=512)),
+            ],
+            options={
+                'verbose_name': 'поисковая запись продукта',
+                'verbose_name_plural': 'Поисковые записи продуктов',
+                'default_related_name': 'search_entry',
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor({
+                'sqlite': SQLITE_INDEX, 'postgresql': POSTGRESQL_INDEX}),
+            run_for_vendor({
+                'sqlite': SQLITE_DROP, 'postgresql': POSTGRESQL_DROP}),
+        ),
+        migrations.RunPython(
+            index_existing_products, migrations.RunPython.noop),
+    ]
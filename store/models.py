@@ -1,16 +1,39 @@
-import os
+from datetime import timedelta
 from decimal import Decimal
-from io import BytesIO
+from functools import lru_cache
+from pathlib import Path
 
+from django.conf import settings
 from django.contrib.auth.models import AbstractUser
-from django.core.files.base import ContentFile
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import (
+    IntegrityError,
+    connections,
+    models,
+    router,
+    transaction,
+)
+from django.db.models import (
+    DecimalField,
+    F,
+    OuterRef,
+    Q,
+    Subquery,
+    Sum,
+    Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
-from PIL import Image
 from unidecode import unidecode
 
 
+@lru_cache(maxsize=65536)
+def make_slug(name):
+    """Транслитерирует название в slug. Результат кэшируется."""
+    return slugify(unidecode(name))
+
+
 class CustomUser(AbstractUser):
     """Модель пользователя, наследуемая от AbstractUser."""
 
@@ -30,6 +53,9 @@ class Category(models.Model):
     class Meta:
         verbose_name = 'категория'
         verbose_name_plural = 'Категории'
+        indexes = [
+            models.Index(fields=('name', 'id'), name='category_name_id_idx'),
+        ]
 
     def __str__(self):
         return self.name
@@ -43,7 +69,7 @@ class Category(models.Model):
             .values_list('name', flat=True)
             .first()
         ):
-            self.slug = slugify(unidecode(self.name))
+            self.slug = make_slug(self.name)
         super().save(*args, **kwargs)
 
 
@@ -78,15 +104,16 @@ class Subcategory(models.Model):
 
         if not self.category.slug:
             self.category.save()
-        self.slug = f'{self.category.slug}-{slugify(unidecode(self.name))}'
+        self.slug = f'{self.category.slug}-{make_slug(self.name)}'
         super().save(*args, **kwargs)
 
 
 class Product(models.Model):
     """Модель продукта с изображениями в 3-х размерах."""
 
+    # Отдельный индекс не нужен: subcategory_id - префикс составных
     subcategory = models.ForeignKey(
-        Subcategory, on_delete=models.CASCADE
+        Subcategory, on_delete=models.CASCADE, db_index=False
     )
     name = models.CharField(max_length=255)
     slug = models.SlugField(
@@ -109,67 +136,299 @@ class Product(models.Model):
         blank=True, null=True,
         help_text='Генерируется автоматически'
     )
+    images_hash = models.CharField(
+        max_length=64, blank=True, editable=False,
+        help_text='Хеш оригинала и размеров производных изображений'
+    )
 
     class Meta:
         verbose_name = 'продукт'
         verbose_name_plural = 'Продукты'
         default_related_name = 'products'
+        indexes = [
+            models.Index(fields=('name', 'id'), name='product_name_id_idx'),
+            models.Index(
+                fields=('subcategory', 'price'),
+                name='product_subcat_price_idx'
+            ),
+            models.Index(
+                fields=('subcategory', 'name'),
+                name='product_subcat_name_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        """Запоминает цену из БД, чтобы при сохранении заметить ее смену."""
+        instance = super().from_db(db, field_names, values)
+        if 'price' in field_names:
+            instance._loaded_price = instance.price
+        return instance
+
     def save(self, *args, **kwargs):
         """
         Переопределенный метод сохранения для авто-генерации slug
-        и создания изображений в 3-х размерах.
+        и постановки в очередь создания изображений в 3-х размерах.
+        При смене цены пересчитывает итоги корзин с этим продуктом.
         """
         if not self.subcategory.slug:
             self.subcategory.save()
-        self.slug = f'{self.subcategory.slug}-{slugify(unidecode(self.name))}'
-        super().save(*args, **kwargs)
+        self.slug = f'{self.subcategory.slug}-{make_slug(self.name)}'
+        loaded_price = getattr(self, '_loaded_price', None)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if (
+                loaded_price is not None
+                and Decimal(str(self.price)) != loaded_price
+            ):
+                Cart.objects.filter(
+                    pk__in=CartItem.objects.filter(
+                        product=self).values('cart')
+                ).rebuild_totals()
+        self._loaded_price = Decimal(str(self.price))
 
         if self.image_original and (
             not self.image_medium or not self.image_thumbnail
         ):
-            try:
-                img = Image.open(self.image_original.path)
-                medium_size = (500, 500)
-                thumb_size = (100, 100)
-
-                # Создание среднего изображения
-                img_medium = img.copy()
-                img_medium.thumbnail(medium_size)
-                temp_medium = BytesIO()
-                img_medium.save(temp_medium, format=img.format)
-                temp_medium.seek(0)
-                medium_name = os.path.basename(self.image_original.name)
-                self.image_medium.save(medium_name, ContentFile(
-                    temp_medium.read()), save=False)
-
-                # Создание миниатюры
-                img_thumb = img.copy()
-                img_thumb.thumbnail(thumb_size)
-                temp_thumb = BytesIO()
-                img_thumb.save(temp_thumb, format=img.format)
-                temp_thumb.seek(0)
-                thumb_name = os.path.basename(self.image_original.name)
-                self.image_thumbnail.save(
-                    thumb_name, ContentFile(temp_thumb.read()), save=False)
-
-                super().save(update_fields=['image_medium', 'image_thumbnail'])
-            except Exception as e:
-                raise RuntimeError(
-                    f'Ошибка при обработке изображений для {self.pk}: {e}'
-                )
+            ProductImageJob.enqueue(self)
+
+    @property
+    def images_pending(self):
+        """Производные изображения еще не созданы фоновой задачей."""
+        return bool(self.image_original) and not (
+            self.image_medium and self.image_thumbnail
+        )
+
+
+class ProductSearch(models.Model):
+    """
+    Поисковая запись продукта: название и его транслитерация.
+    На SQLite по этой таблице строится FTS5-индекс,
+    на PostgreSQL - триграммный GIN-индекс.
+    """
+
+    product = models.OneToOneField(
+        Product, on_delete=models.CASCADE, primary_key=True
+    )
+    name = models.CharField(max_length=255)
+    translit = models.CharField(max_length=512)
+
+    class Meta:
+        verbose_name = 'поисковая запись продукта'
+        verbose_name_plural = 'Поисковые записи продуктов'
+        default_related_name = 'search_entry'
+
+    def __str__(self):
+        return self.name
+
+
+class ProductImageJobQuerySet(models.QuerySet):
+    """QuerySet задач обработки изображений."""
+
+    def claimable(self, now):
+        """
+        Задачи, которые можно забрать: задачи в очереди, а пока попыток
+        меньше PRODUCT_IMAGE_JOB_MAX_ATTEMPTS - завершившиеся ошибкой
+        и брошенные упавшим обработчиком (в обработке дольше
+        PRODUCT_IMAGE_JOB_LEASE секунд).
+        """
+        expired = now - timedelta(seconds=settings.PRODUCT_IMAGE_JOB_LEASE)
+        retry = Q(status=ProductImageJob.FAILED) | Q(
+            status=ProductImageJob.PROCESSING, updated_at__lt=expired)
+        return self.filter(
+            Q(status=ProductImageJob.PENDING)
+            | retry & Q(attempts__lt=settings.PRODUCT_IMAGE_JOB_MAX_ATTEMPTS)
+        )
+
+    def claim(self, limit=None, ids=None):
+        """
+        Забирает задачи из очереди, переводя их в статус обработки.
+        Один UPDATE повторяет условие выборки, поэтому задачу, которую
+        между выборкой и UPDATE забрал другой обработчик, он не
+        изменит. Свои задачи отбираются по времени этого UPDATE.
+        """
+        now = timezone.now()
+        candidates = self.claimable(now).order_by('id')
+        if ids is not None:
+            candidates = candidates.filter(pk__in=ids)
+        candidate_ids = list(candidates.values_list('pk', flat=True)[:limit])
+        if not candidate_ids:
+            return []
+        self.claimable(now).filter(pk__in=candidate_ids).update(
+            status=ProductImageJob.PROCESSING,
+            attempts=F('attempts') + 1,
+            updated_at=now
+        )
+        return list(
+            self.filter(
+                pk__in=candidate_ids, status=ProductImageJob.PROCESSING,
+                updated_at=now
+            ).select_related('product').order_by('id')
+        )
+
+
+class ProductImageJob(models.Model):
+    """
+    Задача на создание среднего изображения и миниатюры продукта.
+    Задачи выполняет команда process_image_jobs.
+    """
+
+    PENDING = 'pending'
+    PROCESSING = 'processing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (PROCESSING, 'Обрабатывается'),
+        (DONE, 'Готово'),
+        (FAILED, 'Ошибка'),
+    )
+
+    product = models.ForeignKey(
+        Product, on_delete=models.CASCADE
+    )
+    status = models.CharField(
+        max_length=20, choices=STATUS_CHOICES, default=PENDING
+    )
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = ProductImageJobQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'задача обработки изображений'
+        verbose_name_plural = 'Задачи обработки изображений'
+        default_related_name = 'image_jobs'
+        indexes = [
+            models.Index(fields=('status', 'id'), name='image_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.product} ({self.get_status_display()})'
+
+    @classmethod
+    def enqueue(cls, product):
+        """
+        Ставит продукт в очередь на обработку изображений.
+        При PRODUCT_IMAGES_INLINE задача выполняется сразу.
+        """
+        job, _ = cls.objects.get_or_create(
+            product=product, status=cls.PENDING)
+        if settings.PRODUCT_IMAGES_INLINE:
+            from .images import process_jobs
+
+            process_jobs(cls.objects.claim(ids=[job.pk]))
+        return job
+
+
+class RequestProfile(models.Model):
+    """
+    Профиль HTTP-запроса, снятый ProfilingMiddleware.
+    Данные хранятся в файлах каталога PROFILING_DIR: статистика
+    cProfile (.pstats) и свернутые стеки сэмплера (.folded).
+    """
+
+    SAMPLE = 'sample'
+    HEADER = 'header'
+    TRIGGER_CHOICES = (
+        (SAMPLE, 'Выборка'),
+        (HEADER, 'Заголовок'),
+    )
+    PSTATS = 'pstats'
+    FOLDED = 'folded'
+    FILE_KINDS = (PSTATS, FOLDED)
+
+    route = models.CharField(max_length=200)
+    method = models.CharField(max_length=10)
+    path = models.CharField(max_length=2000)
+    status = models.PositiveSmallIntegerField()
+    duration_ms = models.FloatField()
+    trigger = models.CharField(max_length=20, choices=TRIGGER_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = 'профиль запроса'
+        verbose_name_plural = 'Профили запросов'
+        indexes = [
+            models.Index(fields=('route', 'id'), name='request_profile_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.method} {self.route} #{self.pk}'
+
+    def file_path(self, kind):
+        """Путь к файлу профиля вида kind (PSTATS или FOLDED)."""
+        return Path(settings.PROFILING_DIR) / f'{self.pk}.{kind}'
+
+
+def cart_totals(prefix=''):
+    """
+    Выражения для подсчета количества товаров и стоимости корзины в БД.
+    prefix - путь от модели запроса до элементов корзины.
+    """
+    return {
+        'annotated_total_items': Sum(f'{prefix}quantity'),
+        'annotated_total_sum': Sum(
+            F(f'{prefix}quantity') * F(f'{prefix}product__price'),
+            output_field=DecimalField(max_digits=12, decimal_places=2)
+        ),
+    }
+
+
+class CartQuerySet(models.QuerySet):
+    """QuerySet корзин с подсчетом итогов на стороне БД."""
+
+    def with_totals(self):
+        """Добавляет к корзинам количество товаров и общую стоимость."""
+        return self.annotate(**cart_totals('items__'))
+
+    def rebuild_totals(self):
+        """
+        Пересчитывает сохраненные итоги корзин одним UPDATE
+        с подзапросами к элементам корзины.
+        """
+        totals = CartItem.objects.filter(
+            cart=OuterRef('pk')
+        ).values('cart').annotate(**cart_totals())
+        return self.update(
+            updated_at=timezone.now(),
+            items_quantity=Coalesce(
+                Subquery(totals.values('annotated_total_items')), 0
+            ),
+            items_sum=Coalesce(
+                Subquery(totals.values('annotated_total_sum')),
+                Value(Decimal('0.00')),
+                output_field=models.DecimalField(
+                    max_digits=12, decimal_places=2)
+            )
+        )
 
 
 class Cart(models.Model):
-    """Модель корзины, привязанная к пользователю."""
+    """
+    Модель корзины, привязанная к пользователю.
+    Количество товаров и общая стоимость хранятся в самой корзине
+    и обновляются вместе с изменением ее элементов.
+    """
 
     user = models.OneToOneField(
         CustomUser, on_delete=models.CASCADE
     )
     updated_at = models.DateTimeField(auto_now=True)
+    items_quantity = models.PositiveIntegerField(
+        default=0, help_text='Обновляется автоматически'
+    )
+    items_sum = models.DecimalField(
+        max_digits=12, decimal_places=2, default=Decimal('0.00'),
+        help_text='Обновляется автоматически'
+    )
+
+    objects = CartQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'корзина'
@@ -179,9 +438,75 @@ class Cart(models.Model):
     def __str__(self):
         return f'Корзина пользователя {self.user}'
 
+    def total_items(self):
+        """Возвращает общее количество товаров в корзине."""
+        return self.items_quantity
+
     def total_sum(self):
         """Возвращает общую стоимость корзины."""
-        return sum(item.get_total() for item in self.items.all())
+        return self.items_sum
+
+    def change_totals(self, quantity, amount):
+        """
+        Изменяет сохраненные итоги корзины на заданные величины
+        одним UPDATE, без гонок между параллельными запросами.
+        """
+        Cart.objects.filter(pk=self.pk).update(
+            items_quantity=F('items_quantity') + quantity,
+            items_sum=F('items_sum') + amount,
+            updated_at=timezone.now()
+        )
+
+    def reset_totals(self):
+        """Обнуляет сохраненные итоги корзины."""
+        Cart.objects.filter(pk=self.pk).update(
+            items_quantity=0, items_sum=Decimal('0.00'),
+            updated_at=timezone.now()
+        )
+
+
+class CartItemManager(models.Manager):
+    """Менеджер элементов корзины с атомарным добавлением количества."""
+
+    def add_quantity(self, cart_id, product_id, quantity):
+        """
+        Добавляет продукт в корзину или увеличивает его количество
+        одним запросом INSERT ... ON CONFLICT DO UPDATE.
+        Для СУБД без upsert используется UPDATE с F() и INSERT.
+        """
+        db = router.db_for_write(self.model)
+        connection = connections[db]
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            return self._add_quantity_fallback(
+                db, cart_id, product_id, quantity)
+
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        table = qn(opts.db_table)
+        cart, product, count = (
+            qn(opts.get_field(name).column)
+            for name in ('cart', 'product', 'quantity')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} ({cart}, {product}, {count}) '
+                f'VALUES (%s, %s, %s) '
+                f'ON CONFLICT ({cart}, {product}) '
+                f'DO UPDATE SET {count} = {table}.{count} + EXCLUDED.{count}',
+                [cart_id, product_id, quantity]
+            )
+
+    def _add_quantity_fallback(self, db, cart_id, product_id, quantity):
+        queryset = self.using(db).filter(cart_id=cart_id, product_id=product_id)
+        if queryset.update(quantity=F('quantity') + quantity):
+            return
+        try:
+            with transaction.atomic(using=db):
+                self.using(db).create(
+                    cart_id=cart_id, product_id=product_id, quantity=quantity)
+        except IntegrityError:
+            # Элемент успел создать параллельный запрос
+            queryset.update(quantity=F('quantity') + quantity)
 
 
 class CartItem(models.Model):
@@ -195,10 +520,18 @@ class CartItem(models.Model):
     )
     quantity = models.PositiveIntegerField(default=1)
 
+    objects = CartItemManager()
+
     class Meta:
         verbose_name = 'элемент корзины'
         verbose_name_plural = 'Элементы корзины'
         default_related_name = 'items'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('cart', 'product'),
+                name='unique_cart_product'
+            )
+        ]
 
     def __str__(self):
         return f'{self.product.name} x {self.quantity}'
@@ -0,0 +1,133 @@
+"""
+Чтение каталога с реплик БД.
+Реплики перечислены в settings.DATABASE_REPLICAS ({алиас: вес}).
+На реплики уходят только запросы чтения моделей каталога внутри
+HTTP-запроса с безопасным методом. Корзина, пользователи и запросы
+вне HTTP (команды, фоновые задачи) всегда работают с основной БД.
+"""
+from contextvars import ContextVar
+from itertools import cycle
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+CATALOG_MODELS = frozenset({
+    'store.Category', 'store.Subcategory', 'store.Product',
+    'store.ProductSearch',
+})
+PRIMARY_PIN_KEY = 'replicas:primary_pin'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Состояние текущего HTTP-запроса: None вне запроса, иначе словарь
+# с флагом primary - читать каталог с основной БД
+_request_state = ContextVar('replica_request_state', default=None)
+_replica_cycles = {}
+
+
+def pin_cache():
+    """
+    Кэш метки чтения с основной БД: общий для процессов, как версии
+    каталога, иначе запись в одном воркере или команде manage.py
+    не закрепит чтение в остальных.
+    """
+    return caches[settings.CATALOG_VERSION_CACHE_ALIAS]
+
+
+def _set_primary_pin():
+    pin_cache().set(PRIMARY_PIN_KEY, True, settings.DATABASE_REPLICA_LAG)
+
+
+def pin_primary():
+    """
+    Направляет чтение каталога на основную БД на DATABASE_REPLICA_LAG
+    секунд, пока реплики догоняют изменение. Отсчет начинается сразу
+    и повторно после коммита транзакции.
+    """
+    if settings.DATABASE_REPLICAS:
+        _set_primary_pin()
+        transaction.on_commit(_set_primary_pin)
+
+
+def next_replica():
+    """
+    Выбирает реплику по кругу с учетом весов: реплика с весом 2
+    получает вдвое больше запросов, чем с весом 1.
+    """
+    replicas = tuple(settings.DATABASE_REPLICAS.items())
+    replica_cycle = _replica_cycles.get(replicas)
+    if replica_cycle is None:
+        replica_cycle = _replica_cycles[replicas] = cycle([
+            alias for alias, weight in replicas for _ in range(weight)])
+    return next(replica_cycle)
+
+
+class ReplicaRouter:
+    """Отправляет чтение каталога на реплики, остальное - на основную БД."""
+
+    def db_for_read(self, model, **hints):
+        state = _request_state.get()
+        if (
+            state is None
+            or model._meta.label not in CATALOG_MODELS
+            or not settings.DATABASE_REPLICAS
+        ):
+            return None
+        if state['primary'] is None:
+            # Проверка метки один раз на запрос, а не на каждый запрос к БД
+            state['primary'] = bool(pin_cache().get(PRIMARY_PIN_KEY))
+        if state['primary']:
+            return None
+        return next_replica()
+
+    def db_for_write(self, model, **hints):
+        # После записи запрос до конца читает свои изменения
+        state = _request_state.get()
+        if state is not None:
+            state['primary'] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+class ReplicaMiddleware:
+    """
+    Включает чтение с реплик на время обработки запроса.
+    Запросы с небезопасными методами целиком работают с основной БД.
+    Под ASGI работает асинхронно: состояние в ContextVar доступно
+    и запросам async ORM, выполняемым в потоке.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _start_request(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+    async def __acall__(self, request):
+        token = _start_request(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _request_state.reset(token)
+
+
+def _start_request(request):
+    return _request_state.set({
+        'primary': None if request.method in SAFE_METHODS else True})
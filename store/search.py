@@ -0,0 +1,189 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from unidecode import unidecode
+
+from .models import ProductSearch
+
+FTS_TABLE = 'store_productsearch_fts'
+# Сколько совпадений ранжируется bm25; более общие запросы
+# упорядочиваются без подсчета bm25 для каждой строки
+RANK_LIMIT = 1000
+# Порядок выдачи: по релевантности или без ранжирования (слишком
+# общий запрос на SQLite, поиск LIKE). score разных порядков несравнимы
+RANKED = 'ranked'
+UNRANKED = 'unranked'
+TOKEN_RE = re.compile(r'\w+')
+NON_WORD_RE = re.compile(r'\W+')
+# Приводят разные варианты латинского написания к одному:
+# "yabloko" и "iabloko" (unidecode) дают одинаковый ключ
+TRANSLIT_RULES = (
+    (re.compile(r"'"), ''),
+    (re.compile(r'kh'), 'h'),
+    (re.compile(r't[sz]'), 'c'),
+    (re.compile(r'[yj]e'), 'e'),
+    (re.compile(r'[yj](?=[aeiou])'), 'i'),
+    (re.compile(r'(?<=[aeiou])[yj]'), 'i'),
+    (re.compile(r'w'), 'v'),
+)
+
+
+def transliterate(text):
+    """Возвращает нормализованную латинскую транслитерацию текста."""
+    text = unidecode(text).lower()
+    for pattern, replacement in TRANSLIT_RULES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def search_entry(product):
+    """Создает поисковую запись для продукта."""
+    return ProductSearch(
+        product_id=product.pk,
+        name=product.name.lower(),
+        translit=transliterate(product.name)
+    )
+
+
+def index_products(products):
+    """Добавляет или обновляет поисковые записи продуктов одним upsert."""
+    entries = [search_entry(product) for product in products]
+    if entries:
+        ProductSearch.objects.bulk_create(
+            entries, update_conflicts=True, unique_fields=['product'],
+            update_fields=['name', 'translit']
+        )
+
+
+def query_tokens(query):
+    """Разбивает запрос на пары (слово, транслитерация слова)."""
+    return [
+        (token, NON_WORD_RE.sub('', transliterate(token)) or token)
+        for token in TOKEN_RE.findall(query.lower())
+    ]
+
+
+def search_products(query, after=None, limit=10):
+    """
+    Ищет продукты по названию и его транслитерации.
+    Возвращает порядок выдачи (RANKED или UNRANKED) и до limit пар
+    (score, product_id), отсортированных по score: чем меньше score,
+    тем выше продукт. after - пара (score, product_id), после которой
+    продолжить выдачу; она имеет смысл только в том же порядке выдачи.
+    """
+    tokens = query_tokens(query)
+    if not tokens:
+        return RANKED, []
+    connection = connections[router.db_for_read(ProductSearch)]
+    if connection.vendor == 'sqlite':
+        return _search_fts(connection, tokens, after, limit)
+    if connection.vendor == 'postgresql':
+        return _search_trigram(connection, tokens, after, limit)
+    return _search_like(connection, tokens, after, limit)
+
+
+def _after_clause(after):
+    if after is None:
+        return '', []
+    score, product_id = after
+    return (
+        'WHERE score > %s OR (score = %s AND id > %s)',
+        [score, score, product_id]
+    )
+
+
+def _fts_term(token, translit, initial=False):
+    # Кириллица ищется в названии, латиница и цифры - в транслитерации,
+    # где латинские названия приведены к тому же виду, что и запрос
+    column, value = ('translit', translit) if token.isascii() else (
+        'name', token)
+    caret = '^' if initial else ''
+    return f'{column} : {caret}"{value}"*'
+
+
+def _search_fts(connection, tokens, after, limit):
+    # Каждое слово ищется по префиксу
+    match = ' AND '.join(_fts_term(*token) for token in tokens)
+    with connection.cursor() as cursor:
+        # bm25 считается не более чем для RANK_LIMIT + 1 совпадений
+        cursor.execute(
+            f'SELECT bm25({FTS_TABLE}), rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s LIMIT %s',
+            [match, RANK_LIMIT + 1]
+        )
+        ranked = cursor.fetchall()
+        if len(ranked) <= RANK_LIMIT:
+            ranked.sort()
+            if after is not None:
+                ranked = [item for item in ranked if item > after]
+            return RANKED, ranked[:limit]
+
+        # Слишком общий запрос: bm25 пришлось бы считать для каждого
+        # совпадения, поэтому выдача не ранжируется. Сначала идут
+        # названия, начинающиеся с первого слова запроса, затем
+        # остальные; внутри группы - по id, в порядке которого FTS5
+        # отдает совпадения без сортировки
+        head = ' AND '.join(
+            [_fts_term(*tokens[0], initial=True)]
+            + [_fts_term(*token) for token in tokens[1:]]
+        )
+        tiers = ((0.0, head), (1.0, f'({match}) NOT ({head})'))
+        found = []
+        for score, tier_match in tiers:
+            after_id = 0
+            if after is not None:
+                if score < after[0]:
+                    continue
+                if score == after[0]:
+                    after_id = after[1]
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'AND rowid > %s ORDER BY rowid LIMIT %s',
+                [tier_match, after_id, limit - len(found)]
+            )
+            found += [
+                (score, product_id) for product_id, in cursor.fetchall()]
+            if len(found) >= limit:
+                break
+        return UNRANKED, found
+
+
+def _search_trigram(connection, tokens, after, limit):
+    table = ProductSearch._meta.db_table
+    conditions = ' AND '.join(
+        '(name ILIKE %s OR translit ILIKE %s)' for _ in tokens)
+    like_params = []
+    for token, translit in tokens:
+        like_params += [f'%{_escape_like(token)}%',
+                        f'%{_escape_like(translit)}%']
+    query = ' '.join(token for token, _ in tokens)
+    translit_query = ' '.join(translit for _, translit in tokens)
+    where, params = _after_clause(after)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT score, id FROM ('
+            f'SELECT -(similarity(name, %s) + similarity(translit, %s)) '
+            f'AS score, product_id AS id FROM {table} WHERE {conditions}'
+            f') AS found {where} ORDER BY score, id LIMIT %s',
+            [query, translit_query, *like_params, *params, limit]
+        )
+        return RANKED, cursor.fetchall()
+
+
+def _search_like(connection, tokens, after, limit):
+    queryset = ProductSearch.objects.using(connection.alias)
+    for token, translit in tokens:
+        queryset = queryset.filter(
+            Q(name__icontains=token) | Q(translit__icontains=translit))
+    if after is not None:
+        queryset = queryset.filter(product_id__gt=after[1])
+    return UNRANKED, [
+        (0.0, product_id) for product_id in
+        queryset.order_by('product_id').values_list(
+            'product_id', flat=True)[:limit]
+    ]
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', r'\%').replace('_', r'\_')
@@ -0,0 +1,63 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import Signal, receiver
+
+from .models import Cart, Category, Product, RequestProfile, Subcategory
+from .replicas import pin_primary
+from .search import index_products
+
+# Каталог изменен в обход save()/delete(), например массовым импортом.
+# sender=Product, если изменились только продукты
+catalog_changed = Signal()
+
+
+@receiver(pre_delete, sender=Product)
+def remember_product_carts(sender, instance, **kwargs):
+    """Запоминает корзины с удаляемым продуктом до каскадного удаления."""
+    instance._cart_ids = list(
+        instance.items.values_list('cart_id', flat=True).distinct()
+    )
+
+
+@receiver(post_delete, sender=Product)
+def rebuild_product_carts(sender, instance, **kwargs):
+    """Пересчитывает итоги корзин, из которых удален продукт."""
+    cart_ids = getattr(instance, '_cart_ids', None)
+    if cart_ids:
+        Cart.objects.filter(pk__in=cart_ids).rebuild_totals()
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Обновляет поисковую запись продукта, в том числе при loaddata."""
+    index_products([instance])
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Subcategory)
+@receiver(post_delete, sender=Subcategory)
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(catalog_changed)
+def catalog_written(sender, **kwargs):
+    """Читает каталог с основной БД, пока реплики догоняют изменение."""
+    pin_primary()
+
+
+@receiver(post_delete, sender=RequestProfile)
+def delete_profile_files(sender, instance, **kwargs):
+    """Удаляет файлы профиля запроса вместе с записью."""
+    for kind in RequestProfile.FILE_KINDS:
+        instance.file_path(kind).unlink(missing_ok=True)
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к новому соединению SQLite."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
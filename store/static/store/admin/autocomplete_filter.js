@@ -0,0 +1,17 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Фильтр AutocompleteFilter: после выбора объекта открывается
+    // первая страница списка, отфильтрованная по нему
+    $(document).on('change', 'select[data-filter-isnull]', function() {
+        const params = new URLSearchParams(window.location.search);
+        for (const name of [this.name, this.dataset.filterIsnull, 'p']) {
+            params.delete(name);
+        }
+        if (this.value) {
+            params.set(this.name, this.value);
+        }
+        window.location.search = params.toString();
+    });
+}
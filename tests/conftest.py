@@ -0,0 +1,37 @@
+import pytest
+from django.core.cache import caches
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Кэш живет дольше тестовой транзакции, поэтому чистим его между тестами
+    for cache in caches.all():
+        cache.clear()
+    yield
+    for cache in caches.all():
+        cache.clear()
+
+
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(
+    django_db_modify_db_settings_parallel_suffix, tmp_path_factory
+):
+    # Тестовая БД SQLite в файле: общий кэш памяти не допускает
+    # параллельной записи из потоков
+    from django.conf import settings
+
+    database = settings.DATABASES['default']
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        directory = tmp_path_factory.mktemp('db')
+        database.setdefault('TEST', {})['NAME'] = str(
+            directory / 'test.sqlite3')
+        # Отдельный файл вместо реплики: тесты маршрутизации включают
+        # его в DATABASE_REPLICAS и запрашивают databases='__all__'
+        settings.DATABASES['replica'] = {
+            **database,
+            'NAME': str(directory / 'replica.sqlite3'),
+            'TEST': {
+                **database['TEST'],
+                'NAME': str(directory / 'test-replica.sqlite3'),
+            },
+        }
@@ -0,0 +1,67 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+@pytest.fixture
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def make_products(db):
+    # Каждый продукт в своей подкатегории и категории, чтобы N+1 был заметен
+    def _make(count):
+        products = []
+        for i in range(count):
+            category = Category.objects.create(name=f'Категория {i}')
+            subcategory = Subcategory.objects.create(
+                name=f'Подкатегория {i}', category=category)
+            products.append(Product.objects.create(
+                name=f'Продукт {i}', price=10, subcategory=subcategory))
+        return products
+    return _make
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [3, 10])
+def test_product_list_constant_queries(
+    client, make_products, django_assert_num_queries, count
+):
+    make_products(count)
+    # COUNT(*) для пагинации и один SELECT с JOIN на подкатегорию и категорию
+    with django_assert_num_queries(2):
+        response = client.get('/api/v1/products/')
+    assert response.status_code == 200
+    assert response.json()['results'][0]['category'] == 'Категория 0'
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [1, 10])
+def test_cart_list_constant_queries(
+    authenticated_client, user, make_products,
+    django_assert_num_queries, count
+):
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.bulk_create(
+        CartItem(cart=cart, product=product, quantity=2)
+        for product in make_products(count)
+    )
+    Cart.objects.filter(pk=cart.pk).rebuild_totals()
+    # Корзина с сохраненными итогами и элементы с продуктами и категориями
+    with django_assert_num_queries(2):
+        response = authenticated_client.get('/api/v1/cart/')
+    assert response.status_code == 200
+    assert response.data['total_items'] == 2 * count
+    assert response.data['total_sum'] == 20 * count
@@ -0,0 +1,106 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from django.core.cache import cache
+
+from api.cache import category_tree_stats
+from store.models import Category, Subcategory
+
+CATEGORIES_URL = '/api/v1/categories/'
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Другой процесс (воркер сервера или команда manage.py) меняет каталог
+OTHER_PROCESS = '''
+import django
+django.setup()
+from api.cache import invalidate_category_tree
+invalidate_category_tree()
+'''
+
+
+def run_other_process(settings, tmp_path):
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'config.settings',
+        'SQLITE_PATH': str(tmp_path / 'other.sqlite3'),
+        'VERSION_CACHE_LOCATION': settings.CACHES[
+            settings.CATALOG_VERSION_CACHE_ALIAS]['LOCATION'],
+    }
+    subprocess.run(
+        [sys.executable, '-c', OTHER_PROCESS],
+        cwd=BASE_DIR, env=env, check=True
+    )
+
+
+@pytest.fixture(params=['locmem', 'filebased'])
+def cache_backend(request, settings, tmp_path):
+    backends = {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'category-tree-tests',
+        },
+        'filebased': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': str(tmp_path / 'cache'),
+        },
+    }
+    settings.CACHES = {**settings.CACHES, 'default': backends[request.param]}
+    # Проверяется кэш дерева, а не кэш готовых ответов
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    cache.clear()
+    yield request.param
+    cache.clear()
+
+
+@pytest.fixture
+def category(db):
+    category = Category.objects.create(name='Фрукты')
+    Subcategory.objects.create(name='Яблоки', category=category)
+    return category
+
+
+@pytest.mark.django_db
+def test_category_tree_hit_skips_orm(
+    client, cache_backend, category, django_assert_num_queries
+):
+    # Промах: COUNT не нужен, категории и подкатегории - два запроса
+    with django_assert_num_queries(2):
+        first = client.get(CATEGORIES_URL).json()
+    with django_assert_num_queries(0):
+        second = client.get(CATEGORIES_URL).json()
+    assert first == second
+    assert first['results'][0]['subcategories'][0]['name'] == 'Яблоки'
+    assert category_tree_stats() == {'hits': 1, 'misses': 1}
+
+
+@pytest.mark.django_db
+def test_category_tree_invalidated_by_signals(client, cache_backend, category):
+    client.get(CATEGORIES_URL)
+    subcategory = Subcategory.objects.create(name='Груши', category=category)
+    names = [
+        sub['name'] for sub in
+        client.get(CATEGORIES_URL).json()['results'][0]['subcategories']
+    ]
+    assert names == ['Яблоки', 'Груши']
+
+    subcategory.delete()
+    category.name = 'Овощи и фрукты'
+    category.save()
+    data = client.get(CATEGORIES_URL).json()['results']
+    assert data[0]['name'] == 'Овощи и фрукты'
+    assert len(data[0]['subcategories']) == 1
+    assert category_tree_stats() == {'hits': 0, 'misses': 3}
+
+
+@pytest.mark.django_db
+def test_category_tree_invalidated_by_other_process(
+    client, settings, tmp_path, cache_backend, category
+):
+    client.get(CATEGORIES_URL)
+    # Изменение без сигналов: о нем сообщает только другой процесс
+    Subcategory.objects.update(name='Груши')
+    run_other_process(settings, tmp_path)
+    data = client.get(CATEGORIES_URL).json()['results']
+    assert data[0]['subcategories'][0]['name'] == 'Груши'
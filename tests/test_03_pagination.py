@@ -0,0 +1,106 @@
+import pytest
+from django.db import connection
+
+from api.fast_serializers import PRODUCT_FIELDS
+from api.pagination import KeysetPagination
+from store.models import Category, Product, Subcategory
+
+PRODUCTS_URL = '/api/v1/products/'
+CATEGORIES_URL = '/api/v1/categories/'
+
+
+@pytest.fixture
+def products(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategories = [
+        Subcategory.objects.create(name=f'Разное {i}', category=category)
+        for i in range(4)
+    ]
+    # Повторяющиеся имена проверяют второй компонент ключа - id
+    return [
+        Product.objects.create(
+            name=f'Продукт {i % 7}', price=10,
+            subcategory=subcategories[i // 7])
+        for i in range(25)
+    ]
+
+
+def walk(client, url, direction):
+    seen = []
+    while url:
+        data = client.get(url).json()
+        seen.extend(item['id'] for item in data['results'])
+        url = data[direction]
+    return seen
+
+
+@pytest.mark.django_db
+def test_product_cursor_pagination_walks_all_rows(client, products):
+    expected = [
+        product.id for product in
+        sorted(products, key=lambda product: (product.name, product.id))
+    ]
+    forward = walk(client, PRODUCTS_URL + '?cursor=', 'next')
+    assert forward == expected
+
+    last_page = client.get(PRODUCTS_URL + '?cursor=').json()
+    while last_page['next']:
+        last_page = client.get(last_page['next']).json()
+    backward_pages = walk(client, last_page['previous'], 'previous')
+    assert sorted(backward_pages) == sorted(expected[:20])
+
+
+@pytest.mark.django_db
+def test_product_cursor_page_has_no_count(
+    client, products, django_assert_num_queries
+):
+    next_url = client.get(PRODUCTS_URL + '?cursor=').json()['next']
+    # Один запрос по индексу (name, id), без COUNT(*) и OFFSET
+    with django_assert_num_queries(1):
+        response = client.get(next_url)
+    assert 'count' not in response.json()
+
+
+@pytest.mark.django_db
+def test_product_page_count_is_cached(
+    client, products, django_assert_num_queries
+):
+    assert client.get(PRODUCTS_URL).json()['count'] == 25
+    with django_assert_num_queries(1):
+        data = client.get(PRODUCTS_URL + '?page=2').json()
+    assert data['count'] == 25
+
+
+@pytest.mark.django_db
+def test_invalid_cursor(client, products):
+    assert client.get(PRODUCTS_URL + '?cursor=bad').status_code == 404
+
+
+@pytest.mark.django_db
+def test_category_cursor_pagination(client):
+    for i in range(12):
+        Category.objects.create(name=f'Категория {i:02}')
+    first = client.get(CATEGORIES_URL + '?cursor=').json()
+    second = client.get(first['next']).json()
+    names = [c['name'] for c in first['results'] + second['results']]
+    assert names == [f'Категория {i:02}' for i in range(12)]
+    assert second['next'] is None
+    assert client.get(second['previous']).json() == first
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='План запроса SQLite')
+@pytest.mark.parametrize('reverse', [False, True])
+def test_product_cursor_page_searches_index(products, reverse):
+    rows = Product.objects.values(*PRODUCT_FIELDS)
+    page = KeysetPagination()._page_queryset(
+        rows, ('Продукт 3', products[3].pk), reverse)
+    # Дальняя страница начинается поиском по индексу, а не сканом
+    plan = [
+        line for line in page.explain().splitlines()
+        if Product._meta.db_table in line
+    ]
+    assert len(plan) == 1
+    assert 'SEARCH' in plan[0]
+    assert 'product_name_id_idx (name' in plan[0]
@@ -0,0 +1,103 @@
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+CART_URL = '/api/v1/cart/'
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+@pytest.fixture
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def products(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Яблоки', category=category)
+    return [
+        Product.objects.create(
+            name=f'Яблоко {i}', price=price, subcategory=subcategory)
+        for i, price in enumerate(['10.50', '3.10'])
+    ]
+
+
+def stored_totals(user):
+    cart = Cart.objects.get(user=user)
+    return cart.items_quantity, cart.items_sum
+
+
+@pytest.mark.django_db
+def test_cart_actions_keep_stored_totals(
+    authenticated_client, user, products
+):
+    apple, pear = products
+    authenticated_client.post(
+        CART_URL + 'add/', {'product_id': apple.id, 'quantity': 2})
+    authenticated_client.post(
+        CART_URL + 'add/', {'product_id': pear.id, 'quantity': 3})
+    authenticated_client.post(
+        CART_URL + 'add/', {'product_id': apple.id, 'quantity': 1})
+    assert stored_totals(user) == (6, Decimal('40.80'))
+
+    authenticated_client.put(
+        CART_URL + 'update/', {'product_id': pear.id, 'quantity': 1})
+    assert stored_totals(user) == (4, Decimal('34.60'))
+
+    authenticated_client.delete(CART_URL + 'remove/', {'product_id': apple.id})
+    assert stored_totals(user) == (1, Decimal('3.10'))
+
+    authenticated_client.delete(CART_URL + 'clear/')
+    assert stored_totals(user) == (0, Decimal('0.00'))
+
+
+@pytest.mark.django_db
+def test_cart_summary_is_read_from_cart(authenticated_client, products):
+    authenticated_client.post(
+        CART_URL + 'add/', {'product_id': products[0].id, 'quantity': 2})
+    data = authenticated_client.get(CART_URL).json()
+    assert data['total_items'] == 2
+    assert data['total_sum'] == 21.0
+
+
+@pytest.mark.django_db
+def test_price_change_and_delete_update_carts(
+    authenticated_client, user, products
+):
+    apple, pear = products
+    authenticated_client.post(
+        CART_URL + 'add/', {'product_id': apple.id, 'quantity': 2})
+    authenticated_client.post(
+        CART_URL + 'add/', {'product_id': pear.id, 'quantity': 1})
+
+    apple = Product.objects.get(pk=apple.pk)
+    apple.price = Decimal('12.00')
+    apple.save()
+    assert stored_totals(user) == (3, Decimal('27.10'))
+
+    apple.delete()
+    assert stored_totals(user) == (1, Decimal('3.10'))
+
+
+@pytest.mark.django_db
+def test_rebuild_cart_totals_command(user, products):
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=products[0], quantity=2)
+    with pytest.raises(CommandError):
+        call_command('rebuild_cart_totals', '--check')
+
+    call_command('rebuild_cart_totals')
+    assert stored_totals(user) == (2, Decimal('21.00'))
+    call_command('rebuild_cart_totals', '--check')
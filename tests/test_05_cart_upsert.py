@@ -0,0 +1,69 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+ADD_ITEM_URL = '/api/v1/cart/add/'
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Яблоки', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+def add_items(user, product, times):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    try:
+        return [
+            client.post(
+                ADD_ITEM_URL, {'product_id': product.id, 'quantity': 1}
+            ).status_code
+            for _ in range(times)
+        ]
+    finally:
+        connection.close()
+
+
+@pytest.mark.django_db
+def test_add_item_query_count(
+    user, product, django_assert_max_num_queries
+):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    client.post(ADD_ITEM_URL, {'product_id': product.id, 'quantity': 1})
+    # Цена продукта, корзина, upsert элемента и итоги корзины,
+    # плюс SAVEPOINT и RELEASE внутри тестовой транзакции
+    with django_assert_max_num_queries(6):
+        client.post(ADD_ITEM_URL, {'product_id': product.id, 'quantity': 2})
+    assert CartItem.objects.get().quantity == 3
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_adds_do_not_lose_updates(user, product):
+    Cart.objects.create(user=user)
+    threads, times = 4, 10
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = executor.map(
+            add_items, [user] * threads, [product] * threads,
+            [times] * threads
+        )
+        statuses = [code for codes in results for code in codes]
+    assert statuses == [201] * threads * times
+
+    cart = Cart.objects.get(user=user)
+    assert cart.items.get().quantity == threads * times
+    assert cart.items_quantity == threads * times
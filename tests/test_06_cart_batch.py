@@ -0,0 +1,86 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+BATCH_URL = '/api/v1/cart/batch/'
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+@pytest.fixture
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def products(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Разное', category=category)
+    return [
+        Product.objects.create(
+            name=f'Продукт {i}', price=10, subcategory=subcategory)
+        for i in range(50)
+    ]
+
+
+@pytest.mark.django_db
+def test_batch_applies_operations_in_order(
+    authenticated_client, user, products
+):
+    first, second, third = products[:3]
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=first, quantity=5)
+    CartItem.objects.create(cart=cart, product=second, quantity=1)
+
+    response = authenticated_client.post(BATCH_URL, [
+        {'action': 'add', 'product_id': first.id, 'quantity': 2},
+        {'action': 'remove', 'product_id': second.id},
+        {'action': 'set', 'product_id': third.id, 'quantity': 4},
+        {'action': 'add', 'product_id': third.id, 'quantity': 1},
+    ], format='json')
+    assert response.status_code == 200
+    quantities = {
+        item['product']['id']: item['quantity']
+        for item in response.data['items']
+    }
+    assert quantities == {first.id: 7, third.id: 5}
+    assert response.data['total_items'] == 12
+    assert response.data['total_sum'] == 120
+
+
+@pytest.mark.django_db
+def test_batch_sync_uses_few_queries(
+    authenticated_client, products, django_assert_max_num_queries
+):
+    operations = [
+        {'action': 'add', 'product_id': product.id, 'quantity': 1}
+        for product in products
+    ]
+    with django_assert_max_num_queries(15):
+        response = authenticated_client.post(
+            BATCH_URL, operations, format='json')
+    assert response.data['total_items'] == len(products)
+
+
+@pytest.mark.django_db
+def test_batch_is_rejected_as_a_whole(authenticated_client, user, products):
+    response = authenticated_client.post(BATCH_URL, [
+        {'action': 'add', 'product_id': products[0].id, 'quantity': 1},
+        {'action': 'add', 'product_id': 0, 'quantity': 1},
+    ], format='json')
+    assert response.status_code == 404
+    assert response.data['product_ids'] == [0]
+
+    response = authenticated_client.post(BATCH_URL, [
+        {'action': 'set', 'product_id': products[0].id},
+    ], format='json')
+    assert response.status_code == 400
+    assert not CartItem.objects.exists()
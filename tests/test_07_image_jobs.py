@@ -0,0 +1,166 @@
+from datetime import timedelta
+from io import BytesIO
+
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.utils import timezone
+from PIL import Image
+
+from store.models import Category, Product, ProductImageJob, Subcategory
+
+
+@pytest.fixture(autouse=True)
+def media_root(settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+
+
+def jpeg_upload(name='apple.jpg', size=(800, 600)):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'red').save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
+
+
+@pytest.fixture
+def subcategory(db):
+    category = Category.objects.create(name='Фрукты')
+    return Subcategory.objects.create(name='Яблоки', category=category)
+
+
+def create_product(subcategory, name='Яблоко'):
+    return Product.objects.create(
+        name=name, price=10, subcategory=subcategory,
+        image_original=jpeg_upload()
+    )
+
+
+@pytest.mark.django_db
+def test_save_queues_job_and_reports_pending(client, subcategory):
+    product = create_product(subcategory)
+    assert not product.image_medium
+    assert ProductImageJob.objects.get().status == ProductImageJob.PENDING
+
+    images = client.get('/api/v1/products/').json()['results'][0]['images']
+    assert images['status'] == 'pending'
+    assert images['medium'] is None
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('workers', ['0', '2'])
+def test_worker_creates_derivatives(client, subcategory, workers):
+    for name in ('Яблоко', 'Груша'):
+        create_product(subcategory, name)
+    call_command('process_image_jobs', '--once', '--workers', workers)
+
+    assert set(
+        ProductImageJob.objects.values_list('status', flat=True)
+    ) == {ProductImageJob.DONE}
+    for product in Product.objects.all():
+        with Image.open(product.image_medium.path) as medium:
+            assert medium.size == (500, 375)
+        with Image.open(product.image_thumbnail.path) as thumbnail:
+            assert thumbnail.size == (100, 75)
+    images = client.get('/api/v1/products/').json()['results'][0]['images']
+    assert images['status'] == 'ready'
+
+
+@pytest.mark.django_db
+def test_inline_mode(settings, subcategory):
+    settings.PRODUCT_IMAGES_INLINE = True
+    product = Product.objects.get(pk=create_product(subcategory).pk)
+    assert product.image_medium and product.image_thumbnail
+    assert ProductImageJob.objects.get().status == ProductImageJob.DONE
+
+
+@pytest.mark.django_db
+def test_broken_original_fails_job(settings, subcategory):
+    Product.objects.create(
+        name='Битое', price=10, subcategory=subcategory,
+        image_original=SimpleUploadedFile('broken.jpg', b'not an image')
+    )
+    call_command('process_image_jobs', '--once', '--workers', '0')
+    job = ProductImageJob.objects.get()
+    assert job.status == ProductImageJob.FAILED
+    assert job.error
+    # Задача повторялась, пока не кончились попытки
+    assert job.attempts == settings.PRODUCT_IMAGE_JOB_MAX_ATTEMPTS
+
+
+@pytest.mark.django_db
+def test_regenerate_product_images(settings, subcategory):
+    settings.PRODUCT_IMAGES_INLINE = True
+    product = create_product(subcategory)
+    product.refresh_from_db()
+    assert product.images_hash
+
+    call_command('regenerate_product_images', '--workers', '0')
+    unchanged = Product.objects.get(pk=product.pk)
+    assert unchanged.image_medium.name == product.image_medium.name
+
+    settings.PRODUCT_IMAGE_SIZES = {'medium': (200, 200), 'thumbnail': (50, 50)}
+    call_command('regenerate_product_images', '--workers', '2')
+    product.refresh_from_db()
+    assert product.images_hash != unchanged.images_hash
+    with Image.open(product.image_medium.path) as medium:
+        assert medium.size == (200, 150)
+    with Image.open(product.image_thumbnail.path) as thumbnail:
+        assert thumbnail.size == (50, 38)
+    assert not unchanged.image_medium.storage.exists(
+        unchanged.image_medium.name)
+
+
+def make_jobs(subcategory, count):
+    category = subcategory.category
+    return [
+        ProductImageJob.objects.create(product=Product.objects.create(
+            name=f'Продукт {i}', price=10,
+            subcategory=Subcategory.objects.create(
+                name=f'Подкатегория {i}', category=category)
+        ))
+        for i in range(count)
+    ]
+
+
+@pytest.mark.django_db
+def test_claim_queries_do_not_grow(subcategory, django_assert_num_queries):
+    make_jobs(subcategory, 5)
+    # Выборка id, UPDATE и задачи с продуктами
+    with django_assert_num_queries(3):
+        jobs = ProductImageJob.objects.claim(limit=4)
+    assert len(jobs) == 4
+    assert {job.status for job in jobs} == {ProductImageJob.PROCESSING}
+    assert {job.attempts for job in jobs} == {1}
+    last = ProductImageJob.objects.get(attempts=0)
+    assert ProductImageJob.objects.claim() == [last]
+    assert ProductImageJob.objects.claim() == []
+
+
+@pytest.mark.django_db
+def test_claim_reclaims_expired_processing(settings, subcategory):
+    stale, fresh = make_jobs(subcategory, 2)
+    ProductImageJob.objects.claim()
+    expired = timezone.now() - timedelta(
+        seconds=settings.PRODUCT_IMAGE_JOB_LEASE + 1)
+    ProductImageJob.objects.filter(pk=stale.pk).update(updated_at=expired)
+    [job] = ProductImageJob.objects.claim()
+    assert job.pk == stale.pk
+    assert job.attempts == 2
+    # Задачу в обработке другой обработчик не забирает
+    assert ProductImageJob.objects.claim(ids=[fresh.pk]) == []
+    # Задача с исчерпанными попытками остается брошенной
+    ProductImageJob.objects.filter(pk=stale.pk).update(
+        updated_at=expired,
+        attempts=settings.PRODUCT_IMAGE_JOB_MAX_ATTEMPTS)
+    assert ProductImageJob.objects.claim() == []
+
+
+@pytest.mark.django_db
+def test_claim_retries_failed(settings, subcategory):
+    settings.PRODUCT_IMAGE_JOB_MAX_ATTEMPTS = 2
+    [job] = make_jobs(subcategory, 1)
+    for attempt in (1, 2):
+        [claimed] = ProductImageJob.objects.claim()
+        assert claimed.attempts == attempt
+        ProductImageJob.objects.filter(pk=job.pk).update(
+            status=ProductImageJob.FAILED)
+    assert ProductImageJob.objects.claim() == []
@@ -0,0 +1,216 @@
+import json
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+
+from store import catalog_import
+from store.models import (
+    Cart,
+    CartItem,
+    Category,
+    Product,
+    ProductImageJob,
+    Subcategory,
+)
+
+User = get_user_model()
+
+ROWS = [
+    {'category': 'Фрукты', 'subcategory': 'Италия', 'name': 'Яблоко',
+     'price': '55.00', 'image': 'products/original/apple.jpg'},
+    {'category': 'Фрукты', 'subcategory': 'Китай', 'name': 'Яблоко',
+     'price': '100.00', 'image': ''},
+    {'category': 'Овощи', 'subcategory': 'Россия', 'name': 'Морковь',
+     'price': '30.50', 'image': ''},
+]
+
+
+def write_csv(path, rows):
+    header = list(rows[0])
+    lines = [','.join(header)] + [
+        ','.join(row[column] for column in header) for row in rows
+    ]
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.django_db
+def test_import_fixtures_matches_loaddata():
+    call_command(
+        'import_catalog', 'fixtures/categories.json',
+        'fixtures/subcategories.json', 'fixtures/products.json',
+        '--batch-size', '5'
+    )
+    imported = list(Product.objects.values_list(
+        'pk', 'slug', 'price', 'image_medium').order_by('pk'))
+    Product.objects.all().delete()
+    Subcategory.objects.all().delete()
+    Category.objects.all().delete()
+
+    call_command(
+        'loaddata', 'fixtures/categories.json',
+        'fixtures/subcategories.json', 'fixtures/products.json'
+    )
+    assert imported == list(Product.objects.values_list(
+        'pk', 'slug', 'price', 'image_medium').order_by('pk'))
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_format', ['csv', 'ndjson', 'json'])
+def test_import_flat_rows(tmp_path, file_format):
+    if file_format == 'csv':
+        path = write_csv(tmp_path / 'catalog.csv', ROWS)
+    elif file_format == 'ndjson':
+        path = tmp_path / 'catalog.ndjson'
+        path.write_text('\n'.join(
+            json.dumps(row, ensure_ascii=False) for row in ROWS))
+    else:
+        path = tmp_path / 'catalog.json'
+        path.write_text(json.dumps(ROWS, ensure_ascii=False))
+    call_command('import_catalog', str(path), '--batch-size', '2')
+
+    assert set(Product.objects.values_list('slug', flat=True)) == {
+        'frukty-italiia-iabloko', 'frukty-kitai-iabloko',
+        'ovoshchi-rossiia-morkov',
+    }
+    assert Subcategory.objects.count() == 3
+    job = ProductImageJob.objects.get()
+    assert job.product.slug == 'frukty-italiia-iabloko'
+
+
+@pytest.mark.django_db
+def test_reimport_updates_prices_and_carts(tmp_path):
+    path = write_csv(tmp_path / 'catalog.csv', ROWS)
+    call_command('import_catalog', path)
+    user = User.objects.create_user(username='testuser', password='pass')
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(
+        cart=cart, product=Product.objects.get(slug='ovoshchi-rossiia-morkov'),
+        quantity=2
+    )
+    Cart.objects.rebuild_totals()
+
+    rows = [dict(row) for row in ROWS]
+    rows[2]['price'] = '40.00'
+    call_command('import_catalog', write_csv(tmp_path / 'new.csv', rows))
+    assert Product.objects.count() == 3
+    assert ProductImageJob.objects.count() == 1
+    cart.refresh_from_db()
+    assert cart.items_sum == Decimal('80.00')
+
+
+def test_iter_json_array_across_chunks(monkeypatch, tmp_path):
+    monkeypatch.setattr(catalog_import, 'JSON_READ_SIZE', 7)
+    records = [{'name': f'Продукт {i}', 'price': i * 1.5} for i in range(20)]
+    path = tmp_path / 'records.json'
+    path.write_text(json.dumps(records, ensure_ascii=False, indent=2))
+    with open(path, encoding='utf-8') as file:
+        assert list(catalog_import.iter_json_array(file)) == records
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('batch_size', ['1', '10'])
+def test_slug_collisions_are_skipped(tmp_path, capsys, batch_size):
+    # Slug всех трех названий - ...-moloko-25
+    rows = [
+        {'category': 'Молочное', 'subcategory': 'Молоко', 'name': name,
+         'price': price, 'image': ''}
+        for name, price in (
+            ('Молоко 2.5%', '80.00'), ('Молоко 2,5%', '90.00'),
+            ('Молоко 25', '100.00'),
+        )
+    ]
+    path = tmp_path / 'catalog.ndjson'
+    path.write_text('\n'.join(
+        json.dumps(row, ensure_ascii=False) for row in rows))
+    call_command('import_catalog', str(path), '--batch-size', batch_size)
+    product = Product.objects.get()
+    assert (product.name, product.price) == ('Молоко 2.5%', Decimal('80'))
+    stderr = capsys.readouterr().err
+    assert 'Пропущена запись продукта "Молоко 2,5%"' in stderr
+    assert 'Пропущена запись продукта "Молоко 25"' in stderr
+
+    # Повторный импорт обновляет продукт и снова пропускает остальные
+    rows[0]['price'] = '85.00'
+    importer = catalog_import.CatalogImporter()
+    counts = importer.run(rows)
+    assert counts['products'] == 1
+    assert counts['skipped'] == 2
+    assert Product.objects.get().price == Decimal('85.00')
+
+
+def write_ndjson(path, rows):
+    path.write_text('\n'.join(
+        json.dumps(row, ensure_ascii=False) for row in rows))
+    return str(path)
+
+
+@pytest.mark.django_db
+def test_invalid_prices_are_skipped(tmp_path, capsys):
+    rows = [
+        {'category': 'Фрукты', 'subcategory': 'Италия', 'name': name,
+         'price': price}
+        for name, price in (
+            ('Яблоко', '55.00'), ('Груша', 'abc'), ('Слива', '0'),
+            ('Вишня', '-5'), ('Киви', 'NaN'), ('Лимон', '1.005'),
+        )
+    ]
+    call_command('import_catalog', write_ndjson(tmp_path / 'c.ndjson', rows))
+    assert list(Product.objects.values_list('name', flat=True)) == [
+        'Яблоко']
+    stderr = capsys.readouterr().err
+    for name in ('Груша', 'Слива', 'Вишня', 'Киви', 'Лимон'):
+        assert f'Пропущена запись продукта "{name}"' in stderr
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('batch_size', ['1', '10'])
+def test_category_slug_collisions_are_skipped(tmp_path, capsys, batch_size):
+    rows = [
+        {'category': category, 'subcategory': subcategory, 'name': name,
+         'price': '10.00'}
+        for category, subcategory, name in (
+            ('Фрукты', 'Италия', 'Яблоко'),
+            # Slug frukty занят категорией "Фрукты"
+            ('Фрукты!', 'Италия', 'Груша'),
+            # Slug frukty-italiia занят подкатегорией "Италия"
+            ('Фрукты', 'Италия!', 'Слива'),
+            ('Фрукты', 'Италия', 'Вишня'),
+        )
+    ]
+    call_command(
+        'import_catalog', write_ndjson(tmp_path / 'c.ndjson', rows),
+        '--batch-size', batch_size
+    )
+    assert list(Category.objects.values_list('name', flat=True)) == [
+        'Фрукты']
+    assert list(Subcategory.objects.values_list('name', flat=True)) == [
+        'Италия']
+    assert set(Product.objects.values_list('name', flat=True)) == {
+        'Яблоко', 'Вишня'}
+    stderr = capsys.readouterr().err
+    assert 'Пропущена запись категории "Фрукты!"' in stderr
+    assert 'Пропущена запись подкатегории "Италия!"' in stderr
+    assert 'Пропущена запись продукта "Груша"' in stderr
+    assert 'Пропущена запись продукта "Слива"' in stderr
+
+
+@pytest.mark.django_db
+def test_fixture_category_slug_collision_skips_children():
+    Category.objects.create(name='Фрукты')
+    records = [
+        {'model': 'store.category', 'pk': 10, 'fields': {'name': 'Фрукты!'}},
+        {'model': 'store.subcategory', 'pk': 20,
+         'fields': {'category': 10, 'name': 'Италия'}},
+        {'model': 'store.product', 'pk': 30,
+         'fields': {'subcategory': 20, 'name': 'Яблоко', 'price': '10'}},
+    ]
+    importer = catalog_import.CatalogImporter()
+    counts = importer.run(records)
+    assert counts['skipped'] == 3
+    assert [label for label, _, _ in importer.skipped] == [
+        'категории', 'подкатегории', 'продукта']
+    assert not Subcategory.objects.exists()
+    assert not Product.objects.exists()
@@ -0,0 +1,147 @@
+import pytest
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+
+from store import search
+from store.models import Category, Product, ProductSearch, Subcategory
+from store.search import search_products, transliterate
+
+SEARCH_URL = '/api/v1/products/search/'
+
+
+@pytest.fixture
+def subcategory(db):
+    category = Category.objects.create(name='Фрукты')
+    return Subcategory.objects.create(name='Россия', category=category)
+
+
+@pytest.fixture
+def products(subcategory):
+    return {
+        name: Product.objects.create(
+            name=name, price=10, subcategory=subcategory)
+        for name in (
+            'Яблоко', 'Яблоко зеленое', 'Груша', 'Сок яблочный', 'Морковь')
+    }
+
+
+def found_names(response):
+    return [product['name'] for product in response.json()['results']]
+
+
+def test_transliteration_variants_match():
+    assert transliterate('Яблоко') == transliterate('yabloko')
+    assert transliterate('Щи') == transliterate('shchi')
+
+
+@pytest.mark.django_db
+def test_search_by_transliteration(client, products):
+    response = client.get(SEARCH_URL, {'q': 'yabloko'})
+    assert response.status_code == 200
+    assert set(found_names(response)) == {'Яблоко', 'Яблоко зеленое'}
+
+
+@pytest.mark.django_db
+def test_search_by_cyrillic_prefix(client, products):
+    names = found_names(client.get(SEARCH_URL, {'q': 'ябл'}))
+    assert set(names) == {'Яблоко', 'Яблоко зеленое', 'Сок яблочный'}
+    # Точное совпадение по короткому названию релевантнее
+    assert names[0] == 'Яблоко'
+
+
+@pytest.mark.django_db
+def test_search_requires_every_word(client, products):
+    names = found_names(client.get(SEARCH_URL, {'q': 'яблоко зел'}))
+    assert names == ['Яблоко зеленое']
+
+
+@pytest.mark.django_db
+def test_empty_query_is_rejected(client, products):
+    assert client.get(SEARCH_URL, {'q': '  '}).status_code == 400
+
+
+@pytest.mark.django_db
+def test_index_follows_product_changes(subcategory):
+    product = Product.objects.create(
+        name='Груша', price=10, subcategory=subcategory)
+    assert [pk for _, pk in search_products('grusha')[1]] == [product.pk]
+
+    product.name = 'Слива'
+    product.save()
+    assert search_products('grusha')[1] == []
+    assert [pk for _, pk in search_products('sliva')[1]] == [product.pk]
+
+    product.delete()
+    assert search_products('sliva')[1] == []
+    assert not ProductSearch.objects.exists()
+
+
+@pytest.fixture
+def cheeses(subcategory):
+    return {
+        Product.objects.create(
+            name=f'Сыр {i}', price=10, subcategory=subcategory).pk
+        for i in range(25)
+    }
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('rank_limit', [1000, 10])
+def test_search_cursor_walks_all_results(
+    client, monkeypatch, cheeses, rank_limit
+):
+    # При 25 совпадениях и RANK_LIMIT=10 выдача не ранжируется
+    monkeypatch.setattr(search, 'RANK_LIMIT', rank_limit)
+    expected = cheeses
+    seen, pages = [], 0
+    url, params = SEARCH_URL, {'q': 'syr'}
+    while url:
+        data = client.get(url, params).json()
+        assert data['ranked'] == (rank_limit > len(expected))
+        seen.extend(product['id'] for product in data['results'])
+        url, params = data['next'], None
+        pages += 1
+    assert pages == 3
+    assert len(seen) == len(expected)
+    assert set(seen) == expected
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('rank_limits', [(1000, 10), (10, 1000)])
+def test_search_cursor_from_other_ranking(
+    client, monkeypatch, cheeses, rank_limits
+):
+    first, second = rank_limits
+    monkeypatch.setattr(search, 'RANK_LIMIT', first)
+    next_url = client.get(SEARCH_URL, {'q': 'syr'}).json()['next']
+    # Число совпадений перешло RANK_LIMIT между страницами
+    monkeypatch.setattr(search, 'RANK_LIMIT', second)
+    response = client.get(next_url)
+    assert response.status_code == 404
+    assert 'первой страницы' in response.json()['detail']
+
+
+@pytest.mark.django_db
+def test_invalid_search_cursor(client, products):
+    response = client.get(SEARCH_URL, {'q': 'ябл', 'cursor': 'broken'})
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db(transaction=True)
+def test_migration_indexes_with_frozen_rules(monkeypatch):
+    before = [('store', '0008_product_images_hash')]
+    executor = MigrationExecutor(connection)
+    executor.migrate(before)
+    apps = executor.loader.project_state(before).apps
+    category = apps.get_model('store', 'Category').objects.create(
+        name='Выпечка', slug='vypechka')
+    subcategory = apps.get_model('store', 'Subcategory').objects.create(
+        name='Хлеб', slug='vypechka-khleb', category=category)
+    apps.get_model('store', 'Product').objects.create(
+        name='Хлеб', slug='vypechka-khleb-khleb', price=10,
+        subcategory=subcategory)
+    # Изменение правил поиска не меняет результат старой миграции
+    monkeypatch.setattr(search, 'TRANSLIT_RULES', ())
+    executor = MigrationExecutor(connection)
+    executor.migrate(executor.loader.graph.leaf_nodes())
+    assert ProductSearch.objects.get().translit == 'hleb'
@@ -0,0 +1,93 @@
+import pytest
+
+from api.pagination import CatalogPagination, KeysetPagination
+from store.models import Category, Product, Subcategory
+
+PRODUCTS_URL = '/api/v1/products/'
+
+
+@pytest.fixture
+def catalog(db):
+    fruits = Category.objects.create(name='Фрукты')
+    vegetables = Category.objects.create(name='Овощи')
+    apples = Subcategory.objects.create(name='Яблоки', category=fruits)
+    pears = Subcategory.objects.create(name='Груши', category=fruits)
+    roots = Subcategory.objects.create(name='Корнеплоды', category=vegetables)
+    for subcategory, name, price in (
+        (apples, 'Антоновка', 50),
+        (apples, 'Гала', 150),
+        (apples, 'Голден', 250),
+        (pears, 'Конференция', 120),
+        (roots, 'Морковь', 40),
+    ):
+        Product.objects.create(
+            name=name, price=price, subcategory=subcategory)
+    return {'fruits': fruits, 'apples': apples}
+
+
+def names(response):
+    return [product['name'] for product in response.json()['results']]
+
+
+@pytest.mark.django_db
+def test_filter_by_category_subcategory_and_price(client, catalog):
+    assert names(client.get(PRODUCTS_URL, {
+        'category': catalog['fruits'].slug
+    })) == ['Антоновка', 'Гала', 'Голден', 'Конференция']
+    assert names(client.get(PRODUCTS_URL, {
+        'subcategory': catalog['apples'].slug, 'price_min': 100,
+        'price_max': 200,
+    })) == ['Гала']
+
+
+@pytest.mark.django_db
+def test_facets_follow_filters(client, catalog):
+    data = client.get(PRODUCTS_URL, {'price_min': 100}).json()
+    assert data['count'] == 3
+    facets = data['facets']
+    assert [
+        (item['name'], item['count']) for item in facets['categories']
+    ] == [('Фрукты', 3)]
+    assert [
+        (item['name'], item['count']) for item in facets['subcategories']
+    ] == [('Груши', 1), ('Яблоки', 2)]
+    assert facets['price'] == [
+        {'min': '100.00', 'max': '200.00', 'count': 2},
+        {'min': '200.00', 'max': '300.00', 'count': 1},
+    ]
+
+
+@pytest.mark.django_db
+def test_facets_replace_count_query(
+    client, catalog, settings, django_assert_num_queries
+):
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    # Один GROUP BY для фасетов и общего количества и SELECT страницы
+    with django_assert_num_queries(2):
+        response = client.get(PRODUCTS_URL, {'category': 'frukty'})
+    assert response.json()['count'] == 4
+    # Повторный запрос берет фасеты и количество из кэша
+    with django_assert_num_queries(1):
+        client.get(PRODUCTS_URL, {'category': 'frukty'})
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params', [{}, {'cursor': ''}])
+def test_facets_only_on_first_page(
+    client, catalog, settings, monkeypatch, django_assert_num_queries,
+    params
+):
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    monkeypatch.setattr(CatalogPagination, 'page_size', 2)
+    monkeypatch.setattr(KeysetPagination, 'page_size', 2)
+    first = client.get(PRODUCTS_URL, params).json()
+    assert first['facets'] is not None
+    next_url = first['next']
+    # Следующая страница не пересчитывает фасеты: без GROUP BY
+    with django_assert_num_queries(1) as context:
+        data = client.get(next_url).json()
+    assert data['facets'] is None
+    assert data['results']
+    assert all(
+        'GROUP BY' not in query['sql']
+        for query in context.captured_queries)
@@ -0,0 +1,128 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from store.models import Cart, Category, Product, Subcategory
+from store.signals import catalog_changed
+
+User = get_user_model()
+
+CATALOG_URLS = ['/api/v1/categories/', '/api/v1/products/']
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Команда импорта или обработчик изображений в другом процессе
+OTHER_PROCESS = '''
+import django
+django.setup()
+from api.cache import invalidate_catalog
+invalidate_catalog()
+'''
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Россия', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+@pytest.fixture
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', CATALOG_URLS)
+def test_catalog_not_modified_without_queries(
+    client, product, django_assert_num_queries, url
+):
+    response = client.get(url)
+    etag = response.headers['ETag']
+    assert not etag.startswith('W/')
+    assert 'Last-Modified' in response.headers
+
+    with django_assert_num_queries(0):
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', CATALOG_URLS)
+def test_catalog_etag_changes_in_other_process(
+    client, settings, tmp_path, product, url
+):
+    etag = client.get(url).headers['ETag']
+    # Изменение без сигналов: о нем сообщает только другой процесс
+    Product.objects.update(price=20)
+    subprocess.run(
+        [sys.executable, '-c', OTHER_PROCESS], cwd=BASE_DIR, check=True,
+        env={
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'config.settings',
+            'SQLITE_PATH': str(tmp_path / 'other.sqlite3'),
+            'VERSION_CACHE_LOCATION': settings.CACHES[
+                settings.CATALOG_VERSION_CACHE_ALIAS]['LOCATION'],
+        }
+    )
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    if url == '/api/v1/products/':
+        # Кэш готовых ответов тоже сменил ключ
+        assert float(response.json()['results'][0]['price']) == 20
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', CATALOG_URLS)
+def test_catalog_etag_changes_with_catalog(client, product, url):
+    etag = client.get(url).headers['ETag']
+
+    product.price = 20
+    product.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+    etag = response.headers['ETag']
+    catalog_changed.send(sender=Product)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.django_db
+def test_etag_depends_on_query(client, product):
+    first = client.get('/api/v1/products/').headers['ETag']
+    second = client.get('/api/v1/products/?page=1').headers['ETag']
+    assert first != second
+
+
+@pytest.mark.django_db
+def test_cart_not_modified_until_changed(
+    authenticated_client, user, product, django_assert_num_queries
+):
+    Cart.objects.create(user=user)
+    etag = authenticated_client.get('/api/v1/cart/').headers['ETag']
+
+    # Только чтение updated_at корзины
+    with django_assert_num_queries(1):
+        response = authenticated_client.get(
+            '/api/v1/cart/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 304
+
+    authenticated_client.post(
+        '/api/v1/cart/add/', {'product_id': product.pk, 'quantity': 1})
+    response = authenticated_client.get(
+        '/api/v1/cart/', HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.data['total_items'] == 1
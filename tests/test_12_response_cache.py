@@ -0,0 +1,115 @@
+import threading
+import time
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import RequestFactory
+from rest_framework.authtoken.models import Token
+
+from api.response_cache import response_cache_key, response_cache_stats
+from store.models import Category, Product, Subcategory
+
+User = get_user_model()
+
+PRODUCTS_URL = '/api/v1/products/'
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Россия', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ['/api/v1/categories/', PRODUCTS_URL])
+def test_anonymous_response_served_from_cache(
+    client, product, django_assert_num_queries, url
+):
+    first = client.get(url)
+    with django_assert_num_queries(0):
+        second = client.get(url)
+    assert second.content == first.content
+    assert second.headers['Content-Type'] == first.headers['Content-Type']
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert response_cache_stats() == {
+        'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+
+@pytest.mark.django_db
+def test_query_string_is_normalized(
+    client, product, django_assert_num_queries
+):
+    client.get(PRODUCTS_URL + '?category=frukty&page=1')
+    with django_assert_num_queries(0):
+        client.get(PRODUCTS_URL + '?page=1&category=frukty')
+    assert client.get(PRODUCTS_URL + '?page=1').json()['count'] == 1
+    assert response_cache_stats()['misses'] == 2
+
+
+@pytest.mark.django_db
+def test_catalog_change_drops_cached_responses(client, product):
+    client.get(PRODUCTS_URL)
+    product.name = 'Груша'
+    product.save()
+    response = client.get(PRODUCTS_URL)
+    assert response.json()['results'][0]['name'] == 'Груша'
+
+
+@pytest.mark.django_db
+def test_authenticated_requests_are_not_cached(client, product):
+    token = Token.objects.create(
+        user=User.objects.create_user(username='user', password='pass'))
+    for _ in range(2):
+        client.get(PRODUCTS_URL, HTTP_AUTHORIZATION=f'Token {token.key}')
+    assert response_cache_stats() == {
+        'hits': 0, 'misses': 0, 'hit_ratio': 0.0}
+
+
+@pytest.mark.django_db
+def test_large_responses_are_not_cached(client, product, settings):
+    settings.CATALOG_RESPONSE_CACHE_MAX_SIZE = 10
+    client.get(PRODUCTS_URL)
+    client.get(PRODUCTS_URL)
+    assert response_cache_stats()['hits'] == 0
+
+
+@pytest.mark.django_db
+def test_waits_for_concurrent_rebuild(
+    client, product, settings, django_assert_num_queries
+):
+    client.get(PRODUCTS_URL)
+    response_cache = caches[settings.CATALOG_RESPONSE_CACHE_ALIAS]
+    key = response_cache_key(RequestFactory().get(PRODUCTS_URL))
+    entry = response_cache.get(key)
+    assert entry is not None
+
+    # Ответ строит другой запрос: ключ заблокирован, запись появится позже
+    response_cache.delete(key)
+    response_cache.add(f'{key}:lock', 1)
+    timer = threading.Timer(0.05, response_cache.set, (key, entry))
+    timer.start()
+    with django_assert_num_queries(0):
+        response = client.get(PRODUCTS_URL)
+    timer.join()
+    assert response.content == entry['content']
+    assert response_cache_stats()['hits'] == 1
+
+
+@pytest.mark.django_db
+def test_sync_request_does_not_wait_for_stuck_rebuild(
+    client, product, settings
+):
+    response_cache = caches[settings.CATALOG_RESPONSE_CACHE_ALIAS]
+    key = response_cache_key(RequestFactory().get(PRODUCTS_URL))
+    # Другой запрос взял блокировку и строит ответ дольше обычного:
+    # синхронный запрос не ждет его до REBUILD_LOCK_TIMEOUT
+    response_cache.add(f'{key}:lock', 1)
+    started = time.monotonic()
+    response = client.get(PRODUCTS_URL)
+    assert time.monotonic() - started < 1
+    assert response.json()['results'][0]['name'] == 'Яблоко'
+    assert response_cache.get(key) is None
+    assert response_cache_stats()['misses'] == 1
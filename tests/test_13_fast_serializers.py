@@ -0,0 +1,105 @@
+import datetime
+from decimal import Decimal
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db.models import Prefetch
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import (
+    PRODUCT_FIELDS,
+    cart_data,
+    category_tree,
+    product_list,
+)
+from api.renderers import FastJSONRenderer
+from api.serializers import (
+    CartSerializer,
+    CategorySerializer,
+    ProductSerializer,
+)
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+
+
+def render_both(slow, fast):
+    return JSONRenderer().render(slow), FastJSONRenderer().render(fast)
+
+
+@pytest.fixture
+def products(db):
+    category = Category.objects.create(
+        name='Фрукты', image='categories/fruits.jpg')
+    subcategory = Subcategory.objects.create(name='Россия', category=category)
+    Subcategory.objects.create(name='Пустая', category=category)
+    Category.objects.create(name='Без подкатегорий')
+    images = [
+        {},
+        {'image_original': 'products/original/яблоко 1.jpg'},
+        {
+            'image_original': 'products/original/pear.jpg',
+            'image_medium': 'products/medium/pear.jpg',
+            'image_thumbnail': 'products/thumbnail/pear.jpg',
+        },
+    ]
+    for i, name in enumerate(('Яблоко', 'Груша "Дюшес"', 'Слива\u2028')):
+        product = Product(
+            name=name, slug=f'product-{i}', subcategory=subcategory,
+            price=Decimal('10.5') * (i + 1), **images[i]
+        )
+        # Без постановки изображений в очередь
+        Product.objects.bulk_create([product])
+    return Product.objects.select_related(
+        'subcategory__category').order_by('name')
+
+
+@pytest.mark.django_db
+def test_product_list_parity(products):
+    slow, fast = render_both(
+        ProductSerializer(products, many=True).data,
+        product_list(products.values(*PRODUCT_FIELDS))
+    )
+    assert slow == fast
+
+
+@pytest.mark.django_db
+def test_cart_parity(products):
+    cart = Cart.objects.create(
+        user=User.objects.create_user(username='user', password='pass'))
+    for quantity, product in enumerate(products, start=1):
+        CartItem.objects.create(cart=cart, product=product, quantity=quantity)
+    Cart.objects.filter(pk=cart.pk).rebuild_totals()
+    cart = Cart.objects.prefetch_related(Prefetch(
+        'items', queryset=CartItem.objects.select_related(
+            'product__subcategory__category').order_by('pk')
+    )).get(pk=cart.pk)
+
+    slow, fast = render_both(CartSerializer(cart).data, cart_data(cart))
+    assert slow == fast
+
+
+@pytest.mark.django_db
+def test_category_tree_parity(products):
+    categories = Category.objects.order_by('name', 'id').prefetch_related(
+        Prefetch('subcategories', queryset=Subcategory.objects.order_by('id'))
+    )
+    slow, fast = render_both(
+        CategorySerializer(categories, many=True).data, category_tree())
+    assert slow == fast
+
+
+def test_renderer_parity_for_other_types():
+    data = {
+        'decimal': Decimal('1.50'),
+        'datetime': datetime.datetime(
+            2024, 1, 2, 3, 4, 5, 6789, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2024, 1, 2),
+        'lazy': gettext_lazy('Продукт'),
+        1: ['вложенный', {'set': {3}}, None, True, 1.5],
+    }
+    assert JSONRenderer().render(data) == FastJSONRenderer().render(data)
+    assert FastJSONRenderer().render(
+        data, 'application/json; indent=4'
+    ) == JSONRenderer().render(data, 'application/json; indent=4')
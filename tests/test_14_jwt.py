@@ -0,0 +1,129 @@
+from importlib import reload
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import clear_url_caches
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+import api.urls
+import config.urls
+from store.models import Cart, CartItem, Category, Product, Subcategory
+
+User = get_user_model()
+
+JWT_AUTHENTICATION = (
+    'rest_framework_simplejwt.authentication.JWTAuthentication')
+TOKEN_AUTHENTICATION = 'rest_framework.authentication.TokenAuthentication'
+
+
+def reload_urls():
+    reload(api.urls)
+    reload(config.urls)
+    clear_url_caches()
+
+
+@pytest.fixture
+def jwt_mode(settings):
+    settings.AUTH_JWT_ENABLED = True
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_AUTHENTICATION_CLASSES': [
+            JWT_AUTHENTICATION, TOKEN_AUTHENTICATION],
+    }
+    reload_urls()
+    yield
+    settings.AUTH_JWT_ENABLED = False
+    reload_urls()
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+@pytest.fixture
+def cart(user):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Россия', category=category)
+    product = Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+    cart = Cart.objects.create(user=user)
+    CartItem.objects.create(cart=cart, product=product, quantity=2)
+    Cart.objects.filter(pk=cart.pk).rebuild_totals()
+    return cart
+
+
+def obtain_tokens(client):
+    response = client.post(
+        '/api/v1/auth/jwt/create/',
+        {'username': 'testuser', 'password': 'pass'}
+    )
+    assert response.status_code == 200
+    return response.json()
+
+
+@pytest.mark.django_db
+def test_jwt_endpoints_disabled_by_default(client, user):
+    response = client.post(
+        '/api/v1/auth/jwt/create/',
+        {'username': 'testuser', 'password': 'pass'}
+    )
+    assert response.status_code == 404
+
+
+@pytest.mark.django_db
+def test_jwt_create_refresh_verify(jwt_mode, client, user):
+    tokens = obtain_tokens(client)
+    response = client.post(
+        '/api/v1/auth/jwt/refresh/', {'refresh': tokens['refresh']})
+    assert response.status_code == 200
+    assert client.post(
+        '/api/v1/auth/jwt/verify/', {'token': response.json()['access']}
+    ).status_code == 200
+    assert client.post(
+        '/api/v1/auth/jwt/verify/', {'token': 'broken'}
+    ).status_code == 401
+
+
+@pytest.mark.django_db
+def test_cart_read_with_jwt_has_no_auth_queries(
+    jwt_mode, client, cart, django_assert_num_queries
+):
+    access = obtain_tokens(client)['access']
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    # Корзина и ее элементы, без запросов пользователя или токена
+    with django_assert_num_queries(2):
+        response = api_client.get('/api/v1/cart/')
+    assert response.status_code == 200
+    assert response.json()['total_items'] == 2
+
+
+@pytest.mark.django_db
+def test_legacy_token_works_in_jwt_mode(jwt_mode, user, cart):
+    token = Token.objects.create(user=user)
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    response = api_client.get('/api/v1/cart/')
+    assert response.status_code == 200
+    assert response.json()['total_items'] == 2
+
+    api_client.credentials(HTTP_AUTHORIZATION='Bearer broken')
+    assert api_client.get('/api/v1/cart/').status_code == 401
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('path', ['/api/v1/cart/add/', '/api/v1/cart/batch/'])
+def test_cart_of_deleted_user(jwt_mode, client, cart, path):
+    access = obtain_tokens(client)['access']
+    product = cart.items.get().product
+    User.objects.all().delete()
+    api_client = APIClient()
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+    item = {'product_id': product.pk, 'quantity': 1}
+    data = item if path.endswith('add/') else [{'action': 'add', **item}]
+    # Токен действителен, но корзину удаленного пользователя не создать
+    response = api_client.post(path, data, format='json')
+    assert response.status_code == 401
+    assert not Cart.objects.exists()
@@ -0,0 +1,121 @@
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from api.cache import cache_cart_id, get_cart_id
+from store.models import Cart, Category, Product, Subcategory
+
+User = get_user_model()
+CART_URL = '/api/v1/cart/'
+
+
+@pytest.fixture
+def user(db):
+    return User.objects.create_user(username='testuser', password='pass')
+
+
+@pytest.fixture
+def authenticated_client(user):
+    client = APIClient()
+    client.force_authenticate(user=user)
+    return client
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Яблоки', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+@pytest.mark.django_db
+def test_empty_cart_read_does_not_write(
+    authenticated_client, django_assert_num_queries
+):
+    # Только поиск корзины, без INSERT
+    with django_assert_num_queries(1):
+        response = authenticated_client.get(CART_URL)
+    assert response.status_code == 200
+    assert response.json() == {
+        'items': [], 'total_items': 0, 'total_sum': 0.0}
+    assert 'ETag' not in response.headers
+    assert not Cart.objects.exists()
+
+
+@pytest.mark.django_db
+def test_changes_without_cart_do_not_create_it(
+    authenticated_client, product
+):
+    response = authenticated_client.put(
+        CART_URL + 'update/', {'product_id': product.pk, 'quantity': 2})
+    assert response.status_code == 404
+    response = authenticated_client.delete(
+        CART_URL + 'remove/', {'product_id': product.pk})
+    assert response.status_code == 404
+    response = authenticated_client.delete(CART_URL + 'clear/')
+    assert response.status_code == 204
+    assert not Cart.objects.exists()
+
+
+@pytest.mark.django_db
+def test_cart_id_is_cached_after_first_add(
+    authenticated_client, user, product, django_assert_max_num_queries,
+    django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        response = authenticated_client.post(
+            CART_URL + 'add/', {'product_id': product.pk, 'quantity': 1})
+    assert response.status_code == 201
+
+    with django_assert_max_num_queries(6) as captured:
+        authenticated_client.post(
+            CART_URL + 'add/', {'product_id': product.pk, 'quantity': 2})
+    table = Cart._meta.db_table
+    assert not [
+        query for query in captured.captured_queries
+        if query['sql'].startswith('SELECT') and f'FROM "{table}"'
+        in query['sql']
+    ]
+    cart = Cart.objects.get(user=user)
+    assert (cart.items_quantity, cart.items_sum) == (3, 30)
+
+
+@pytest.mark.django_db
+def test_deleted_cart_is_forgotten(
+    authenticated_client, user, product, django_capture_on_commit_callbacks
+):
+    with django_capture_on_commit_callbacks(execute=True):
+        authenticated_client.post(
+            CART_URL + 'add/', {'product_id': product.pk, 'quantity': 1})
+    Cart.objects.filter(user=user).delete()
+
+    response = authenticated_client.post(
+        CART_URL + 'add/', {'product_id': product.pk, 'quantity': 1})
+    assert response.status_code == 201
+    assert Cart.objects.get(user=user).items_quantity == 1
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('action', ['add', 'batch'])
+def test_cart_deleted_in_other_process(
+    authenticated_client, user, product, action
+):
+    old_cart_id = Cart.objects.create(user=user).pk
+    Cart.objects.filter(pk=old_cart_id).delete()
+    # Другой процесс удалил корзину, а в кэше этого остался ее id
+    cache_cart_id(user.pk, old_cart_id)
+    if action == 'add':
+        response = authenticated_client.post(
+            CART_URL + 'add/', {'product_id': product.pk, 'quantity': 2})
+        assert response.status_code == 201
+    else:
+        response = authenticated_client.post(CART_URL + 'batch/', [
+            {'action': 'add', 'product_id': product.pk, 'quantity': 2},
+        ], format='json')
+        assert response.status_code == 200
+        assert response.json()['total_items'] == 2
+    cart = Cart.objects.get(user=user)
+    assert cart.pk != old_cart_id
+    assert (cart.items_quantity, cart.items_sum) == (2, 20)
+    assert get_cart_id(user.pk) == cart.pk
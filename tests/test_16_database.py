@@ -0,0 +1,43 @@
+import pytest
+from django.db import connection
+
+
+def pragma(name):
+    with connection.cursor() as cursor:
+        cursor.execute(f'PRAGMA {name}')
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='PRAGMA только для SQLite')
+def test_sqlite_connection_is_tuned(settings):
+    assert pragma('journal_mode') == 'wal'
+    # NORMAL
+    assert pragma('synchronous') == 1
+    assert pragma('busy_timeout') == settings.SQLITE_PRAGMAS['busy_timeout']
+    assert pragma('cache_size') == settings.SQLITE_PRAGMAS['cache_size']
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(
+    connection.vendor != 'sqlite', reason='PRAGMA только для SQLite')
+def test_sqlite_pragmas_apply_to_new_connections(settings):
+    settings.SQLITE_PRAGMAS = {
+        **settings.SQLITE_PRAGMAS, 'busy_timeout': 1234}
+    connection.close()
+    assert pragma('busy_timeout') == 1234
+    # Следующие тесты получат соединение с исходными настройками
+    connection.close()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_connection_is_persistent():
+    # Соединение не закрывается в конце запроса, а проверяется
+    # перед следующим
+    assert connection.settings_dict['CONN_MAX_AGE'] > 0
+    assert connection.settings_dict['CONN_HEALTH_CHECKS']
+    connection.ensure_connection()
+    raw_connection = connection.connection
+    connection.close_if_unusable_or_obsolete()
+    assert connection.connection is raw_connection
@@ -0,0 +1,129 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection, router
+from rest_framework.test import APIClient
+
+from store.models import Cart, Category, Product, Subcategory
+from store.replicas import (
+    PRIMARY_PIN_KEY,
+    ReplicaMiddleware,
+    next_replica,
+    pin_cache,
+)
+
+User = get_user_model()
+BASE_DIR = Path(__file__).resolve().parent.parent
+# Другой процесс (воркер сервера или команда manage.py) меняет каталог
+OTHER_PROCESS = '''
+import django
+django.setup()
+from store.replicas import pin_primary
+pin_primary()
+'''
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'sqlite',
+    reason='Реплика в тестах - отдельный файл SQLite'
+)
+
+
+@pytest.fixture
+def replicas(settings):
+    settings.DATABASE_REPLICAS = {'replica': 1}
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+
+
+def create_product(using, name):
+    category = Category.objects.using(using).create(pk=1, name='Фрукты')
+    subcategory = Subcategory.objects.using(using).create(
+        pk=1, name='Яблоки', category=category)
+    # bulk_create не вызывает сигналы, которые пишут в основную БД
+    Product.objects.using(using).bulk_create([Product(
+        pk=1, name=name, slug='frukty-yabloki-yabloko', price=10,
+        subcategory=subcategory
+    )])
+
+
+@pytest.fixture
+def catalog(replicas):
+    create_product('replica', 'С реплики')
+    create_product('default', 'С основной БД')
+    # Создание каталога в основной БД закрепило чтение за ней
+    pin_cache().delete(PRIMARY_PIN_KEY)
+
+
+def product_name(client):
+    return client.get('/api/v1/products/').json()['results'][0]['name']
+
+
+@pytest.mark.django_db(databases='__all__')
+def test_catalog_reads_go_to_replica(catalog):
+    assert product_name(APIClient()) == 'С реплики'
+
+
+@pytest.mark.django_db(databases='__all__')
+def test_catalog_write_pins_reads_to_primary(catalog):
+    Product.objects.get(pk=1).save()
+    assert product_name(APIClient()) == 'С основной БД'
+
+
+@pytest.mark.django_db(databases='__all__')
+def test_catalog_write_in_other_process_pins_reads(
+    catalog, settings, tmp_path
+):
+    assert product_name(APIClient()) == 'С реплики'
+    subprocess.run(
+        [sys.executable, '-c', OTHER_PROCESS], cwd=BASE_DIR, check=True,
+        env={
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': 'config.settings',
+            'SQLITE_PATH': str(tmp_path / 'other.sqlite3'),
+            'DB_REPLICAS': str(tmp_path / 'other-replica.sqlite3'),
+            'VERSION_CACHE_LOCATION': settings.CACHES[
+                settings.CATALOG_VERSION_CACHE_ALIAS]['LOCATION'],
+        }
+    )
+    assert product_name(APIClient()) == 'С основной БД'
+
+
+@pytest.mark.django_db(databases='__all__')
+def test_cart_stays_on_primary(catalog):
+    user = User.objects.create_user(username='buyer', password='pass')
+    client = APIClient()
+    client.force_authenticate(user=user)
+    response = client.post(
+        '/api/v1/cart/add/', {'product_id': 1, 'quantity': 1})
+    assert response.status_code == 201
+    response = client.get('/api/v1/cart/')
+    assert response.json()['items'][0]['product']['name'] == (
+        'С основной БД')
+    assert not Cart.objects.using('replica').exists()
+
+
+@pytest.mark.django_db(databases='__all__')
+def test_reads_outside_requests_use_primary(catalog):
+    assert router.db_for_read(Product) == 'default'
+    assert Product.objects.get(pk=1).name == 'С основной БД'
+
+
+def test_unsafe_requests_use_primary(replicas, rf):
+    databases = {}
+
+    def view(request):
+        databases[request.method] = router.db_for_read(Product)
+
+    middleware = ReplicaMiddleware(view)
+    middleware(rf.get('/'))
+    middleware(rf.post('/'))
+    assert databases == {'GET': 'replica', 'POST': 'default'}
+
+
+def test_replicas_are_weighted(settings):
+    settings.DATABASE_REPLICAS = {'first': 2, 'second': 1}
+    chosen = [next_replica() for _ in range(6)]
+    assert chosen.count('first') == 4
+    assert chosen.count('second') == 2
@@ -0,0 +1,74 @@
+import logging
+
+import pytest
+from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
+
+from api.timing import sql_fingerprint
+from store.models import Cart, Category, Product, Subcategory
+
+User = get_user_model()
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Яблоки', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+@pytest.fixture
+def server_timing(settings):
+    settings.SERVER_TIMING_ENABLED = True
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+
+
+def metrics(response):
+    return {
+        metric.split(';')[0]: metric
+        for metric in response.headers['Server-Timing'].split(', ')
+    }
+
+
+@pytest.mark.django_db
+def test_disabled_by_default(product):
+    response = APIClient().get('/api/v1/products/')
+    assert 'Server-Timing' not in response.headers
+
+
+@pytest.mark.django_db
+def test_catalog_timing(server_timing, product):
+    response = APIClient().get('/api/v1/products/')
+    found = metrics(response)
+    assert set(found) == {
+        'db', 'db-slowest', 'serialize', 'render', 'total'}
+    # Фасеты с количеством и страница продуктов
+    assert 'desc="2 queries"' in found['db']
+
+
+@pytest.mark.django_db
+def test_cart_timing(server_timing, product):
+    user = User.objects.create_user(username='buyer', password='pass')
+    Cart.objects.create(user=user)
+    client = APIClient()
+    client.force_authenticate(user=user)
+    found = metrics(client.get('/api/v1/cart/'))
+    assert 'desc="2 queries"' in found['db']
+    assert 'serialize' in found
+
+
+@pytest.mark.django_db
+def test_slow_requests_are_logged(server_timing, settings, product, caplog):
+    settings.SERVER_TIMING_SLOW_MS = 0
+    with caplog.at_level(logging.WARNING, logger='api.timing'):
+        APIClient().get('/api/v1/products/search/?q=yabloko')
+    message = caplog.records[-1].getMessage()
+    assert 'GET /api/v1/products/search/?q=' in message
+    assert 'IN (...)' in message
+
+
+def test_sql_fingerprint():
+    assert sql_fingerprint(
+        'SELECT * FROM t WHERE id IN (%s, %s,  %s) LIMIT 21'
+    ) == 'SELECT * FROM t WHERE id IN (...) LIMIT ?'
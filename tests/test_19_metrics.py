@@ -0,0 +1,161 @@
+import os
+import subprocess
+import sys
+from importlib import reload
+from pathlib import Path
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.urls import clear_url_caches
+from prometheus_client.parser import text_string_to_metric_families
+from rest_framework.test import APIClient
+
+import config.urls
+from store.models import Category, Product, ProductImageJob, Subcategory
+
+User = get_user_model()
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def reload_urls():
+    reload(config.urls)
+    clear_url_caches()
+
+
+@pytest.fixture
+def metrics_mode(settings):
+    settings.METRICS_ENABLED = True
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    reload_urls()
+    yield
+    settings.METRICS_ENABLED = False
+    reload_urls()
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Яблоки', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+def scrape(client=None):
+    response = (client or APIClient()).get('/metrics/')
+    assert response.status_code == 200
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for family in text_string_to_metric_families(
+            response.content.decode())
+        for sample in family.samples
+    }
+
+
+def value(samples, name, **labels):
+    return samples.get((name, tuple(sorted(labels.items()))), 0)
+
+
+@pytest.mark.django_db
+def test_disabled_by_default():
+    assert APIClient().get('/metrics/').status_code == 404
+
+
+@pytest.mark.django_db
+def test_requests_by_route(metrics_mode, product):
+    before = scrape()
+    client = APIClient()
+    client.get('/api/v1/products/')
+    client.get('/api/v1/products/')
+    user = User.objects.create_user(username='buyer', password='pass')
+    client.force_authenticate(user=user)
+    client.post(
+        '/api/v1/cart/add/', {'product_id': product.pk, 'quantity': 1})
+    after = scrape()
+
+    def delta(name, **labels):
+        return value(after, name, **labels) - value(before, name, **labels)
+
+    assert delta(
+        'http_requests_total',
+        route='products-list', method='GET', status='200') == 2
+    assert delta(
+        'http_requests_total',
+        route='cart-add-item', method='POST', status='201') == 1
+    assert delta(
+        'http_request_duration_seconds_count',
+        route='products-list', method='GET') == 2
+    # Фасеты с количеством и страница продуктов, затем фасеты из кэша
+    assert delta(
+        'http_request_db_queries_sum', route='products-list') == 3
+    assert delta(
+        'http_request_db_queries_bucket',
+        route='products-list', le='2.0') == 2
+
+
+@pytest.mark.django_db
+def test_unmatched_route_label(metrics_mode):
+    before = scrape()
+    APIClient().get('/api/v1/products/1/unknown/')
+    after = scrape()
+    labels = {'route': 'unmatched', 'method': 'GET', 'status': '404'}
+    assert (
+        value(after, 'http_requests_total', **labels)
+        - value(before, 'http_requests_total', **labels)
+    ) == 1
+
+
+@pytest.mark.django_db
+def test_cache_hit_ratio(metrics_mode, product):
+    client = APIClient()
+    client.get('/api/v1/categories/')
+    client.get('/api/v1/categories/')
+    samples = scrape()
+    hits = value(
+        samples, 'cache_lookups_total', cache='category_tree', result='hit')
+    misses = value(
+        samples, 'cache_lookups_total', cache='category_tree', result='miss')
+    assert hits >= 1 and misses >= 1
+    assert value(
+        samples, 'cache_hit_ratio', cache='category_tree'
+    ) == pytest.approx(hits / (hits + misses))
+
+
+@pytest.mark.django_db
+def test_image_job_queue_depth(metrics_mode, product):
+    ProductImageJob.objects.bulk_create([
+        ProductImageJob(product=product),
+        ProductImageJob(product=product),
+        ProductImageJob(product=product, status=ProductImageJob.DONE),
+    ])
+    samples = scrape()
+    assert value(
+        samples, 'image_job_queue_depth', status='pending') == 2
+    assert value(
+        samples, 'image_job_queue_depth', status='processing') == 0
+
+
+WORKER = """
+import django
+django.setup()
+from api.metrics import REQUESTS
+REQUESTS.labels('products-list', 'GET', 200).inc(3)
+"""
+
+
+@pytest.mark.django_db
+def test_multiprocess_aggregation(metrics_mode, settings, tmp_path):
+    settings.PROMETHEUS_MULTIPROC_DIR = str(tmp_path)
+    env = {
+        **os.environ,
+        'DJANGO_SETTINGS_MODULE': 'config.settings',
+        'PROMETHEUS_MULTIPROC_DIR': str(tmp_path),
+    }
+    for _ in range(2):
+        subprocess.run(
+            [sys.executable, '-c', WORKER],
+            cwd=BASE_DIR, env=env, check=True
+        )
+    samples = scrape()
+    assert value(
+        samples, 'http_requests_total',
+        route='products-list', method='GET', status='200') == 6
@@ -0,0 +1,144 @@
+import pstats
+import sys
+import threading
+import time
+from io import StringIO
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client
+from rest_framework.test import APIClient
+
+from api.profiling import StackSampler, collapse_stack, profiling_token
+from store.models import Category, Product, RequestProfile, Subcategory
+
+User = get_user_model()
+
+
+@pytest.fixture
+def profiling(settings, tmp_path):
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_SAMPLE_RATE = 0
+    settings.PROFILING_DIR = str(tmp_path)
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    return settings
+
+
+@pytest.fixture
+def product(db):
+    category = Category.objects.create(name='Фрукты')
+    subcategory = Subcategory.objects.create(name='Яблоки', category=category)
+    return Product.objects.create(
+        name='Яблоко', price=10, subcategory=subcategory)
+
+
+@pytest.mark.django_db
+def test_disabled_by_default(settings, product):
+    settings.PROFILING_SAMPLE_RATE = 1
+    APIClient().get(
+        '/api/v1/products/', HTTP_X_PROFILE=profiling_token())
+    assert not RequestProfile.objects.exists()
+
+
+@pytest.mark.django_db
+def test_not_sampled(profiling, product):
+    APIClient().get('/api/v1/products/')
+    APIClient().get('/api/v1/products/', HTTP_X_PROFILE='forged')
+    assert not RequestProfile.objects.exists()
+
+
+@pytest.mark.django_db
+def test_sampled_request(profiling, product):
+    profiling.PROFILING_SAMPLE_RATE = 1
+    APIClient().get('/api/v1/products/')
+    profile = RequestProfile.objects.get()
+    assert profile.route == 'products-list'
+    assert profile.status == 200
+    assert profile.trigger == RequestProfile.SAMPLE
+    stats = pstats.Stats(str(profile.file_path(RequestProfile.PSTATS)))
+    assert any(
+        function == 'product_list' for _, _, function in stats.stats)
+    assert profile.file_path(RequestProfile.FOLDED).exists()
+
+
+@pytest.mark.django_db
+def test_signed_header(profiling, product):
+    APIClient().get(
+        '/api/v1/categories/', HTTP_X_PROFILE=profiling_token())
+    profile = RequestProfile.objects.get()
+    assert profile.route == 'categories-list'
+    assert profile.trigger == RequestProfile.HEADER
+
+
+@pytest.mark.django_db
+def test_ring_buffer_per_route(profiling, product):
+    profiling.PROFILING_SAMPLE_RATE = 1
+    profiling.PROFILING_PROFILES_PER_ROUTE = 2
+    client = APIClient()
+    client.get('/api/v1/categories/')
+    first = RequestProfile.objects.get()
+    for _ in range(2):
+        client.get('/api/v1/products/')
+        client.get('/api/v1/categories/')
+    assert RequestProfile.objects.filter(route='products-list').count() == 2
+    remaining = RequestProfile.objects.filter(route='categories-list')
+    assert remaining.count() == 2
+    assert first not in remaining
+    for kind in RequestProfile.FILE_KINDS:
+        assert not first.file_path(kind).exists()
+
+
+def busy(sampler):
+    deadline = time.monotonic() + 1
+    while sum(sampler.stacks.values()) < 3 and time.monotonic() < deadline:
+        sum(range(1000))
+
+
+def test_sampler_collapses_stacks():
+    sampler = StackSampler(threading.get_ident(), 0.001)
+    sampler.start()
+    busy(sampler)
+    sampler.stop()
+    stacks = dict(
+        line.rsplit(' ', 1) for line in sampler.folded().splitlines())
+    # Корень стека - первый вызов, лист - последний
+    leaf = f'test_20_profiling.py:{busy.__code__.co_firstlineno})'
+    assert any(
+        stack.endswith(leaf) and ';busy (' in stack for stack in stacks)
+    assert all(int(count) >= 1 for count in stacks.values())
+    assert collapse_stack(sys._getframe()).endswith(
+        'test_20_profiling.py:'
+        f'{test_sampler_collapses_stacks.__code__.co_firstlineno})'
+    )
+
+
+@pytest.mark.django_db
+def test_admin_download(profiling, product):
+    profiling.PROFILING_SAMPLE_RATE = 1
+    APIClient().get('/api/v1/products/')
+    profiling.PROFILING_SAMPLE_RATE = 0
+    profile = RequestProfile.objects.get()
+    client = Client()
+    url = f'/admin/store/requestprofile/{profile.pk}/download/pstats/'
+    assert client.get(url).status_code == 302
+    admin = User.objects.create_superuser(
+        username='admin', email='admin@example.com', password='pass')
+    client.force_login(admin)
+    changelist = client.get('/admin/store/requestprofile/')
+    assert url.encode() in changelist.content
+    response = client.get(url)
+    assert response.status_code == 200
+    assert b''.join(response.streaming_content) == (
+        profile.file_path(RequestProfile.PSTATS).read_bytes())
+    assert client.get(
+        f'/admin/store/requestprofile/{profile.pk}/download/exe/'
+    ).status_code == 404
+
+
+def test_profiling_token_command():
+    out = StringIO()
+    call_command('profiling_token', stdout=out, stderr=StringIO())
+    header, token = out.getvalue().strip().split(': ')
+    assert header == 'X-Profile'
+    assert token.startswith('profile:')
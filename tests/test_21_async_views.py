@@ -0,0 +1,323 @@
+import json
+import logging
+import pstats
+from importlib import reload
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import AsyncClient
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches
+from prometheus_client import REGISTRY
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+import api.urls
+import config.urls
+from api.cache import cache_cart_id
+from api.response_cache import response_cache_stats
+from store.models import (
+    Cart,
+    CartItem,
+    Category,
+    Product,
+    RequestProfile,
+    Subcategory,
+)
+
+JWT_AUTHENTICATION = (
+    'rest_framework_simplejwt.authentication.JWTAuthentication')
+
+
+def use_async_views(settings, enabled):
+    settings.ASYNC_VIEWS = enabled
+    reload(api.urls)
+    reload(config.urls)
+    clear_url_caches()
+
+
+@pytest.fixture
+def switch_views(settings):
+    """Переключает адреса API между view DRF и асинхронными."""
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 0
+    yield lambda enabled: use_async_views(settings, enabled)
+    use_async_views(settings, False)
+
+
+@pytest.fixture
+def async_views(switch_views):
+    switch_views(True)
+
+
+@pytest.fixture
+def catalog(db):
+    fruits = Category.objects.create(name='Фрукты')
+    apples = Subcategory.objects.create(name='Яблоки', category=fruits)
+    vegetables = Category.objects.create(name='Овощи')
+    carrots = Subcategory.objects.create(name='Морковь', category=vegetables)
+    return [
+        Product.objects.create(
+            name=f'Продукт {i}', price=10 + i * 60,
+            subcategory=apples if i % 2 else carrots
+        )
+        for i in range(15)
+    ]
+
+
+@pytest.fixture
+def token(db, django_user_model):
+    user = django_user_model.objects.create_user(
+        username='buyer', password='pass')
+    return Token.objects.create(user=user)
+
+
+def call(method, path, data=None, token=None, **headers):
+    """Запрос к асинхронному view через AsyncClient."""
+    client = AsyncClient()
+    if token is not None:
+        headers['Authorization'] = f'Token {token.key}'
+    extra = {'headers': headers}
+    if data is not None:
+        extra.update(
+            data=json.dumps(data), content_type='application/json')
+    return async_to_sync(getattr(client, method))(path, **extra)
+
+
+def sync_call(method, path, data=None, token=None, **extra):
+    client = APIClient()
+    if token is not None:
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return getattr(client, method)(path, data, format='json', **extra)
+
+
+CATALOG_PATHS = (
+    '/api/v1/categories/',
+    '/api/v1/products/',
+    '/api/v1/products/?page=2',
+    '/api/v1/products/?cursor=',
+    '/api/v1/products/?category=frukty&price_max=500',
+)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('path', CATALOG_PATHS)
+def test_catalog_matches_drf(switch_views, catalog, path):
+    expected = sync_call('get', path)
+    switch_views(True)
+    response = call('get', path)
+    assert response.status_code == expected.status_code == 200
+    assert response.json() == expected.json()
+    assert response['ETag'] == expected['ETag']
+
+
+@pytest.mark.django_db
+def test_catalog_errors(async_views, catalog):
+    response = call('get', '/api/v1/products/?page=100')
+    assert response.status_code == 404
+    assert 'detail' in response.json()
+    response = call('get', '/api/v1/products/?price_min=abc')
+    assert response.status_code == 400
+    assert 'price_min' in response.json()
+    assert call('post', '/api/v1/products/', {}).status_code == 405
+
+
+@pytest.mark.django_db
+def test_catalog_not_modified(async_views, catalog):
+    etag = call('get', '/api/v1/products/')['ETag']
+    response = call('get', '/api/v1/products/', **{'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db
+def test_response_cache(async_views, settings, catalog):
+    settings.CATALOG_RESPONSE_CACHE_TIMEOUT = 300
+    first = call('get', '/api/v1/categories/')
+    second = call('get', '/api/v1/categories/')
+    assert second.content == first.content
+    assert response_cache_stats()['hits'] == 1
+
+
+@pytest.mark.django_db
+def test_cart_actions(switch_views, catalog, token):
+    apple, pear = catalog[1], catalog[3]
+    switch_views(True)
+    assert call('get', '/api/v1/cart/', token=token).json() == {
+        'items': [], 'total_items': 0, 'total_sum': 0.0}
+    assert not Cart.objects.exists()
+
+    response = call(
+        'post', '/api/v1/cart/add/',
+        {'product_id': apple.pk, 'quantity': 2}, token=token
+    )
+    assert response.status_code == 201
+    response = call(
+        'put', '/api/v1/cart/update/',
+        {'product_id': apple.pk, 'quantity': 3}, token=token
+    )
+    assert response.status_code == 200
+    response = call('post', '/api/v1/cart/batch/', [
+        {'action': 'add', 'product_id': pear.pk, 'quantity': 1},
+        {'action': 'set', 'product_id': apple.pk, 'quantity': 4},
+    ], token=token)
+    assert response.status_code == 200
+    assert response.json()['total_items'] == 5
+    batch = response.json()
+
+    cart_list = call('get', '/api/v1/cart/', token=token)
+    assert cart_list.json() == batch
+    switch_views(False)
+    assert sync_call('get', '/api/v1/cart/', token=token).json() == batch
+    switch_views(True)
+
+    response = call(
+        'delete', '/api/v1/cart/remove/', {'product_id': pear.pk},
+        token=token
+    )
+    assert response.status_code == 204
+    assert CartItem.objects.get().quantity == 4
+    assert call(
+        'delete', '/api/v1/cart/clear/', token=token).status_code == 204
+    cart = Cart.objects.get()
+    assert not cart.items.exists()
+    assert cart.total_items() == 0
+
+
+@pytest.mark.django_db
+def test_cart_errors_match_drf(switch_views, catalog, token):
+    requests = [
+        ('post', '/api/v1/cart/add/', {'quantity': 0}),
+        ('post', '/api/v1/cart/add/', {'product_id': 0, 'quantity': 1}),
+        ('put', '/api/v1/cart/update/',
+         {'product_id': catalog[0].pk, 'quantity': 1}),
+        ('delete', '/api/v1/cart/remove/', {}),
+        ('post', '/api/v1/cart/batch/', [{'action': 'drop'}]),
+        ('post', '/api/v1/cart/batch/',
+         [{'action': 'remove', 'product_id': 0}]),
+    ]
+    expected = [
+        sync_call(method, path, data, token=token)
+        for method, path, data in requests
+    ]
+    switch_views(True)
+    for (method, path, data), sync_response in zip(requests, expected):
+        response = call(method, path, data, token=token)
+        assert response.status_code == sync_response.status_code, path
+        assert response.json() == sync_response.json(), path
+
+
+@pytest.mark.django_db
+def test_cart_authentication(async_views, token):
+    response = call('get', '/api/v1/cart/')
+    assert response.status_code == 401
+    assert response['WWW-Authenticate'] == 'Token'
+    response = call(
+        'get', '/api/v1/cart/', Authorization='Token invalid')
+    assert response.status_code == 401
+    token.user.is_active = False
+    token.user.save()
+    assert call('get', '/api/v1/cart/', token=token).status_code == 401
+
+
+@pytest.mark.django_db
+def test_cart_jwt_without_user_query(async_views, settings, catalog, token):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_AUTHENTICATION_CLASSES': [JWT_AUTHENTICATION],
+    }
+    access = AccessToken.for_user(token.user)
+    with CaptureQueriesContext(connection) as queries:
+        response = call(
+            'get', '/api/v1/cart/', Authorization=f'Bearer {access}')
+    assert response.status_code == 200
+    # Только поиск корзины: пользователь берется из токена
+    assert len(queries) == 1
+
+
+@pytest.mark.django_db
+def test_cart_queries_match_drf(switch_views, catalog, token):
+    cart = Cart.objects.create(user=token.user)
+    CartItem.objects.create(cart=cart, product=catalog[0], quantity=1)
+    with CaptureQueriesContext(connection) as expected:
+        sync_call('get', '/api/v1/cart/', token=token)
+    switch_views(True)
+    with CaptureQueriesContext(connection) as queries:
+        response = call('get', '/api/v1/cart/', token=token)
+    assert response.status_code == 200
+    assert len(queries) == len(expected)
+    etag = response['ETag']
+    response = call(
+        'get', '/api/v1/cart/', token=token, **{'If-None-Match': etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.parametrize('path', ['/api/v1/cart/add/', '/api/v1/cart/batch/'])
+def test_cart_deleted_in_other_process(async_views, catalog, token, path):
+    old_cart_id = Cart.objects.create(user=token.user).pk
+    Cart.objects.filter(pk=old_cart_id).delete()
+    # Другой процесс удалил корзину, а в кэше этого остался ее id
+    cache_cart_id(token.user.pk, old_cart_id)
+    item = {'product_id': catalog[0].pk, 'quantity': 2}
+    data = item if path.endswith('add/') else [{'action': 'add', **item}]
+    assert call('post', path, data, token=token).status_code in (200, 201)
+    cart = Cart.objects.get()
+    assert cart.pk != old_cart_id
+    assert cart.total_items() == 2
+
+
+@pytest.mark.django_db
+def test_diagnostics_without_adaptation(
+    async_views, settings, tmp_path, catalog, caplog
+):
+    settings.DEBUG = True
+    settings.SERVER_TIMING_ENABLED = True
+    settings.METRICS_ENABLED = True
+    settings.PROFILING_ENABLED = True
+    settings.PROFILING_SAMPLE_RATE = 1
+    settings.PROFILING_DIR = str(tmp_path)
+    labels = {'route': 'products-list', 'method': 'GET', 'status': '200'}
+    queries = {'route': 'products-list'}
+
+    def sample(name, labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    before = sample('http_requests_total', labels)
+    queries_before = sample('http_request_db_queries_sum', queries)
+    with caplog.at_level(logging.DEBUG, logger='django.request'):
+        response = call('get', '/api/v1/products/')
+    assert response.status_code == 200
+    # Ни один middleware не переведен в поток
+    assert not [
+        record for record in caplog.records
+        if 'adapted' in record.getMessage()
+    ]
+    # SQL async ORM из потока запроса попадает в замеры
+    assert 'desc="2 queries"' in response.headers['Server-Timing']
+    assert sample('http_requests_total', labels) == before + 1
+    assert sample('http_request_db_queries_sum', queries) == (
+        queries_before + 2)
+    profile = RequestProfile.objects.get()
+    stats = pstats.Stats(str(profile.file_path(RequestProfile.PSTATS)))
+    assert any(
+        filename.endswith('async_views.py')
+        for filename, _, _ in stats.stats
+    )
+
+
+@pytest.mark.django_db(transaction=True)
+def test_cart_jwt_of_deleted_user(async_views, settings, catalog, token):
+    settings.REST_FRAMEWORK = {
+        **settings.REST_FRAMEWORK,
+        'DEFAULT_AUTHENTICATION_CLASSES': [JWT_AUTHENTICATION],
+    }
+    access = AccessToken.for_user(token.user)
+    token.user.delete()
+    response = call(
+        'post', '/api/v1/cart/add/',
+        {'product_id': catalog[0].pk, 'quantity': 1},
+        Authorization=f'Bearer {access}'
+    )
+    assert response.status_code == 401
+    assert not Cart.objects.exists()
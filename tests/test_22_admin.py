@@ -0,0 +1,123 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from store.admin import estimated_row_count
+from store.models import (
+    Cart,
+    CartItem,
+    Category,
+    CustomUser,
+    Product,
+    ProductImageJob,
+    Subcategory,
+)
+
+CHANGELISTS = (
+    '/admin/store/category/',
+    '/admin/store/subcategory/',
+    '/admin/store/product/',
+    '/admin/store/productimagejob/',
+    '/admin/store/customuser/',
+    '/admin/store/cart/',
+    '/admin/store/cartitem/',
+)
+
+
+@pytest.fixture
+def make_rows(db):
+    # Каждая строка со своими связанными объектами, чтобы N+1 был заметен
+    created = []
+
+    def _make(count):
+        for i in range(len(created), len(created) + count):
+            category = Category.objects.create(name=f'Категория {i}')
+            subcategory = Subcategory.objects.create(
+                name=f'Подкатегория {i}', category=category)
+            product = Product.objects.create(
+                name=f'Продукт {i}', price=10 + i, subcategory=subcategory)
+            ProductImageJob.objects.create(product=product)
+            user = CustomUser.objects.create_user(username=f'user{i}')
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, product=product, quantity=2)
+            created.append(product)
+        return created
+
+    return _make
+
+
+def changelist_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return [query['sql'] for query in queries]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', CHANGELISTS)
+def test_changelist_constant_queries(admin_client, make_rows, url):
+    make_rows(2)
+    expected = changelist_queries(admin_client, url)
+    make_rows(10)
+    assert len(changelist_queries(admin_client, url)) == len(expected)
+
+
+@pytest.mark.django_db
+def test_cart_item_changelist(admin_client, make_rows):
+    products = make_rows(3)
+    product = products[1]
+    url = f'/admin/store/cartitem/?product__id__exact={product.pk}'
+    # Сессия, пользователь, COUNT(*), строки и выбранный в фильтре продукт
+    assert len(changelist_queries(admin_client, url)) == 5
+    response = admin_client.get(url)
+    content = response.content.decode()
+    assert 'store/admin/autocomplete_filter.js' in content
+    assert 'data-filter-isnull="cart__user__isnull"' in content
+    assert f'<option value="{product.pk}" selected>' in content
+    # Фильтр не перечисляет остальные продукты и пользователей
+    assert products[0].name not in content
+    assert 'user0' not in content
+    # Стоимость элемента посчитана в запросе списка
+    [item] = response.context['cl'].result_list
+    assert item.annotated_total == product.price * 2
+
+
+@pytest.mark.django_db
+def test_cart_item_sorted_by_total(admin_client, make_rows):
+    make_rows(3)
+    response = admin_client.get('/admin/store/cartitem/?o=-4')
+    totals = [
+        item.annotated_total for item in response.context['cl'].result_list]
+    assert totals == sorted(totals, reverse=True)
+
+
+@pytest.mark.django_db
+def test_autocomplete_filter_search(admin_client, make_rows):
+    make_rows(3)
+    response = admin_client.get('/admin/autocomplete/', {
+        'app_label': 'store', 'model_name': 'cart',
+        'field_name': 'user', 'term': 'user1',
+    })
+    assert [result['text'] for result in response.json()['results']] == [
+        'user1']
+
+
+@pytest.mark.django_db
+def test_estimated_count(admin_client, settings, make_rows):
+    make_rows(10)
+    assert estimated_row_count(Product, 'default') is None
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    assert estimated_row_count(Product, 'default') == 10
+
+    settings.ADMIN_ESTIMATED_COUNT_MIN = 5
+    queries = changelist_queries(admin_client, '/admin/store/product/')
+    assert not any('COUNT(' in sql for sql in queries)
+    response = admin_client.get('/admin/store/product/')
+    assert response.context['cl'].result_count == 10
+    # Отфильтрованный список и небольшие таблицы считаются точно
+    queries = changelist_queries(admin_client, '/admin/store/product/?q=1')
+    assert sum('COUNT(' in sql for sql in queries) == 1
+    settings.ADMIN_ESTIMATED_COUNT_MIN = 100
+    queries = changelist_queries(admin_client, '/admin/store/product/')
+    assert sum('COUNT(' in sql for sql in queries) == 1